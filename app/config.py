@@ -38,12 +38,39 @@ class Settings(BaseSettings):
     # Google Drive configuration
     GOOGLE_CLIENT_SECRET_FILE: str = "client_secret.json"
     GOOGLE_TOKEN_FILE: str = "token.json"
+    GOOGLE_TOKEN_REFRESH_ENABLED: bool = True
+    GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS: float = 300.0
+    GOOGLE_TOKEN_REFRESH_INTERVAL_SECONDS: float = 60.0
+    DRIVE_SHARED_DRIVE_CACHE_TTL_SECONDS: int = 3600
+    DRIVE_FOLDER_CACHE_TTL_SECONDS: int = 300
+    DRIVE_FOLDER_CACHE_MAX_ENTRIES: int = 512
+    DRIVE_FOLDER_CACHE_MAX_ITEMS: int = 50000
+    DRIVE_PROJECT_ROOT_CACHE_TTL_SECONDS: int = 86400
+    DRIVE_PROJECT_ROOT_NEGATIVE_TTL_SECONDS: int = 120
+    DRIVE_PROJECT_ROOT_CACHE_MAX_ENTRIES: int = 2048
+    DRIVE_CLIENT_POOL_SIZE: int = 4
+    DRIVE_RETRY_MAX_ATTEMPTS: int = 5
+    DRIVE_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    DRIVE_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    DRIVE_RATE_LIMIT_QPS: float = 0.0
+    DRIVE_RATE_LIMIT_BURST: int = 10
+    DRIVE_RATE_LIMIT_STATE_FILE: str = ""
+    DRIVE_WARMUP_ENABLED: bool = False
+    DRIVE_WARMUP_TIMEOUT_SECONDS: float = 30.0
+    DRIVE_CHANGES_ENABLED: bool = False
+    DRIVE_CHANGES_POLL_INTERVAL_SECONDS: float = 30.0
+    DRIVE_CHANGES_FOLDER_CACHE_TTL_SECONDS: int = 86400
+    DRIVE_SNAPSHOT_PATH: str = ""
+    DRIVE_SNAPSHOT_INTERVAL_SECONDS: float = 300.0
 
     # Supabase configuration
     SUPABASE_PROJECT_ID: str
     SUPABASE_URL: str
     SUPABASE_KEY: str = ""
     SUPABASE_KEY_FILE: str = ""
+    # Resolver nombres/patentes con la funcion SQL resolver_drive_folder_ids
+    # (supabase/migrations); sin la funcion instalada se usan consultas por tabla.
+    SUPABASE_RPC_RESOLVER_ENABLED: bool = False
 
     # Internal API authentication
     ASIGNAR_FOLDER_API_TOKEN: str = ""
@@ -53,6 +80,11 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     LOG_LEVEL: str = "INFO"
     CORS_ORIGINS: str = "https://myma-acreditacion.onrender.com,http://localhost:3000,http://127.0.0.1:3000"
+    # Presupuesto de tiempo por request (menor al --timeout de gunicorn).
+    REQUEST_TIME_BUDGET_SECONDS: float = 50.0
+    # Circuit breakers por dependencia (Drive files.list/drives.list, tablas Supabase).
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_TIMEOUT_SECONDS: float = 30.0
 
     @model_validator(mode="after")
     def resolve_runtime_secrets(self):
@@ -1,10 +1,15 @@
 """Aplicación principal FastAPI."""
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.routers import asignar_folder
 from app.config import settings
+from app.services.drive_service import drive_service
+from app.services.retry import request_budget
+from app.services.supabase_service import supabase_service
 
 # Configurar logging
 logging.basicConfig(
@@ -14,11 +19,73 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+def _warm_up_drive_sync(timeout_seconds: float) -> None:
+    """Ejecuta el warm-up acotando tambien los reintentos al timeout."""
+    with request_budget(timeout_seconds):
+        drive_service.warm_up()
+
+
+async def _warm_up_drive() -> None:
+    """Warm-up en segundo plano: nunca bloquea ni hace fallar el arranque."""
+    timeout_seconds = settings.DRIVE_WARMUP_TIMEOUT_SECONDS
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(_warm_up_drive_sync, timeout_seconds),
+            timeout=timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Warm-up de Drive excedio %.0fs; se continua sin cache", timeout_seconds)
+    except asyncio.CancelledError:
+        raise
+    except Exception as error:
+        logger.warning("Warm-up de Drive fallo: %s", error)
+
+
+async def _save_drive_snapshot_periodically(interval_seconds: float) -> None:
+    """Persiste el snapshot de carpetas cada interval_seconds."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await asyncio.to_thread(drive_service.save_snapshot)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Ciclo de vida de los procesos de fondo de Drive."""
+    if settings.GOOGLE_TOKEN_REFRESH_ENABLED:
+        drive_service.start_credentials_refresher()
+    snapshot_task = None
+    if settings.DRIVE_SNAPSHOT_PATH:
+        # Antes del warm-up y del watcher: el snapshot evita consultas y aporta el cursor.
+        await asyncio.to_thread(drive_service.load_snapshot)
+        if settings.DRIVE_SNAPSHOT_INTERVAL_SECONDS > 0:
+            snapshot_task = asyncio.create_task(
+                _save_drive_snapshot_periodically(settings.DRIVE_SNAPSHOT_INTERVAL_SECONDS)
+            )
+    warmup_task = None
+    if settings.DRIVE_WARMUP_ENABLED:
+        warmup_task = asyncio.create_task(_warm_up_drive())
+    if settings.DRIVE_CHANGES_ENABLED:
+        # El cursor se obtiene en el thread del watcher, no bloquea el arranque.
+        drive_service.start_changes_watcher()
+    yield
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+    if settings.DRIVE_SNAPSHOT_PATH:
+        # Se guarda con el watcher aun activo para persistir tambien su cursor.
+        await asyncio.to_thread(drive_service.save_snapshot)
+    drive_service.stop_changes_watcher()
+    drive_service.stop_credentials_refresher()
+
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title="API Asignar Folder ID a Requerimiento",
     description="API para asignar drive_folder_id a registros en brg_acreditacion_solicitud_requerimiento",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS para frontend local y entornos configurados por variable de entorno.
@@ -54,10 +121,17 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """Endpoint de health check."""
+    """Endpoint de health check con el estado de los circuit breakers."""
+    circuit_breakers = {
+        **drive_service.circuit_breaker_states(),
+        **supabase_service.circuit_breaker_states(),
+    }
+    # Un circuito abierto degrada el servicio pero no lo saca de rotacion.
+    degraded = any(state["state"] == "open" for state in circuit_breakers.values())
     return JSONResponse(content={
-        "status": "healthy",
-        "environment": settings.ENVIRONMENT
+        "status": "degraded" if degraded else "healthy",
+        "environment": settings.ENVIRONMENT,
+        "circuit_breakers": circuit_breakers,
     })
 
 
@@ -139,6 +139,30 @@ class ResumenActualizacion(BaseModel):
     )
 
 
+class DiagnosticoOperacion(BaseModel):
+    """Llamadas a una dependencia durante el request."""
+
+    operacion: str = Field(
+        ...,
+        description="Metodo de Drive o tabla.operacion de Supabase",
+    )
+    llamadas: int = Field(..., description="Llamadas realizadas (sin contar reintentos)")
+    reintentos: int = Field(..., description="Reintentos por errores transitorios")
+    cache_hits: int = Field(..., description="Consultas resueltas desde cache")
+    errores: int = Field(..., description="Llamadas que terminaron en error")
+    duracion_ms: float = Field(..., description="Latencia acumulada de las llamadas")
+
+
+class Diagnostico(BaseModel):
+    """Desglose del tiempo del request por dependencia."""
+
+    duracion_total_ms: float = Field(..., description="Duracion total del request")
+    operaciones: List[DiagnosticoOperacion] = Field(
+        ...,
+        description="Llamadas por metodo de Drive y operacion de Supabase",
+    )
+
+
 class AsignarFolderResponse(BaseModel):
     """Modelo para el response de asignar folder ID."""
 
@@ -150,3 +174,7 @@ class AsignarFolderResponse(BaseModel):
     registros: List[RegistroResponse] = Field(..., description="Lista de registros procesados")
     resumen: ResumenActualizacion = Field(..., description="Resumen de actualizaciones")
     mensaje: str = Field(..., description="Mensaje del resultado")
+    diagnostico: Optional[Diagnostico] = Field(
+        None,
+        description="Llamadas a Drive/Supabase del request (solo con ?diagnostico=true)",
+    )
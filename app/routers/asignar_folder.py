@@ -1,19 +1,24 @@
 """Router para asignar folder ID a requerimiento."""
 import logging
 import time
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 
+from app.config import settings
 from app.dependencies import require_api_token
 from app.models import (
     AsignarFolderRequest,
     AsignarFolderResponse,
+    Diagnostico,
+    DiagnosticoOperacion,
     RegistroResponse,
     ResumenActualizacion,
     _is_categoria_vehiculo,
 )
 from app.services.drive_service import drive_service
+from app.services.request_metrics import RequestMetrics, collect_request_metrics
+from app.services.retry import request_budget
 from app.services.supabase_service import supabase_service
 
 logger = logging.getLogger(__name__)
@@ -34,6 +39,11 @@ def _es_categoria_vehiculo(value: str) -> bool:
 @router.post("", response_model=AsignarFolderResponse)
 def asignar_folder(
     request: AsignarFolderRequest,
+    response: Response,
+    diagnostico: bool = Query(
+        False,
+        description="Incluye en el response el desglose de llamadas a Drive/Supabase",
+    ),
     _: None = Depends(require_api_token),
 ):
     """
@@ -45,7 +55,47 @@ def asignar_folder(
       - otra empresa -> Externos/<empresa>/01 Empresa
     - categoria_requerimiento != Empresa:
       - flujo Supabase prioriza trabajador, conductor y luego vehiculo
+
+    El header Server-Timing desglosa el tiempo por dependencia.
     """
+    # Los reintentos se cortan cuando el tiempo restante del request no alcanza
+    # para otro intento, antes de que gunicorn mate el worker por timeout.
+    with request_budget(settings.REQUEST_TIME_BUDGET_SECONDS):
+        with collect_request_metrics() as metrics:
+            resultado = _procesar_asignacion(request)
+
+    server_timing = metrics.server_timing()
+    response.headers["Server-Timing"] = server_timing
+    logger.info(
+        "Llamadas a dependencias codigo_proyecto=%s: %s",
+        request.codigo_proyecto,
+        server_timing,
+    )
+    if diagnostico:
+        resultado.diagnostico = _diagnostico(metrics)
+    return resultado
+
+
+def _diagnostico(metrics: RequestMetrics) -> Diagnostico:
+    """Convierte las metricas del request al bloque diagnostico del response."""
+    return Diagnostico(
+        duracion_total_ms=round(metrics.elapsed_seconds() * 1000, 1),
+        operaciones=[
+            DiagnosticoOperacion(
+                operacion=operacion,
+                llamadas=stats.calls,
+                reintentos=stats.retries,
+                cache_hits=stats.cache_hits,
+                errores=stats.errors,
+                duracion_ms=round(stats.seconds * 1000, 1),
+            )
+            for operacion, stats in metrics.snapshot().items()
+        ],
+    )
+
+
+def _procesar_asignacion(request: AsignarFolderRequest) -> AsignarFolderResponse:
+    """Procesa los registros del payload y actualiza Supabase."""
     logger.info(
         "Procesando asignacion de folder para proyecto=%s registros=%s",
         request.codigo_proyecto,
@@ -53,12 +103,27 @@ def asignar_folder(
     )
 
     registros_procesados = []
+    registros_con_folder: List[Tuple[RegistroResponse, Optional[str]]] = []
+    registros_sin_folder: List[int] = []
     actualizados_exitosos = 0
     actualizados_fallidos = 0
     sin_drive_folder_id = 0
     started_at = time.perf_counter()
 
-    parent_ctx = drive_service.resolve_parent_drive_context(request.codigo_proyecto)
+    # Con el circuito de Drive abierto los registros Empresa van directo a
+    # sin_drive_folder_id en vez de esperar llamadas que fallarian.
+    drive_disponible = drive_service.drive_available()
+    if not drive_disponible:
+        logger.warning(
+            "Circuito de Drive abierto; se omite la resolucion en Drive para codigo_proyecto=%s",
+            request.codigo_proyecto,
+        )
+
+    parent_ctx = (
+        drive_service.resolve_parent_drive_context(request.codigo_proyecto)
+        if drive_disponible
+        else None
+    )
     parent_drive_id = parent_ctx["parent_drive_id"] if parent_ctx else None
     if parent_drive_id:
         logger.info(
@@ -80,6 +145,57 @@ def asignar_folder(
     conductor_folder_cache: Dict[str, Optional[str]] = {}
     vehiculo_folder_cache: Dict[Tuple[int, str], Optional[str]] = {}
 
+    # Empresas externas del payload: se resuelven juntas, nivel por nivel, en Drive.
+    # Nombres y patentes del payload: se resuelven juntos en Supabase (RPC o in_()).
+    empresas_externas: Dict[str, str] = {}
+    nombres_trabajadores: Dict[str, str] = {}
+    patentes: List[str] = []
+    patentes_respaldo: Dict[str, List[str]] = {}
+    for registro in request.registros:
+        if _normalize(registro.categoria_requerimiento) != "empresa":
+            if _es_categoria_vehiculo(registro.categoria_requerimiento):
+                patentes.append((registro.patente_vehiculo or "").strip())
+                continue
+            nombre_trabajador = registro.nombre_trabajador or ""
+            nombre_trabajador = nombres_trabajadores.setdefault(
+                _normalize(nombre_trabajador),
+                nombre_trabajador,
+            )
+            if registro.patente_vehiculo and request.id_proyecto is not None:
+                # Respaldo por patente solo si el nombre no resuelve trabajador ni conductor.
+                patentes_respaldo.setdefault(nombre_trabajador, []).append(
+                    registro.patente_vehiculo.strip()
+                )
+            continue
+        empresa_normalizada = _normalize(registro.empresa_acreditacion)
+        if empresa_normalizada != "myma":
+            empresas_externas.setdefault(
+                empresa_normalizada,
+                registro.empresa_acreditacion.strip(),
+            )
+    empresas_externas_resueltas: Dict[str, Optional[str]] = {}
+
+    if nombres_trabajadores or patentes:
+        resolucion = supabase_service.resolver_drive_folder_ids(
+            request.id_proyecto,
+            nombres_trabajadores.values(),
+            patentes=patentes,
+            patentes_respaldo=patentes_respaldo,
+        )
+        for nombre_cache_key, nombre_trabajador in nombres_trabajadores.items():
+            trabajador_folder_cache[nombre_cache_key] = resolucion.trabajadores.get(
+                nombre_trabajador
+            )
+            conductor_folder_cache[nombre_cache_key] = resolucion.conductores.get(
+                nombre_trabajador
+            )
+        vehiculo_folder_cache.update(
+            {
+                (request.id_proyecto, patente): drive_folder_id
+                for patente, drive_folder_id in resolucion.vehiculos.items()
+            }
+        )
+
     for registro in request.registros:
         categoria = _normalize(registro.categoria_requerimiento)
         es_categoria_vehiculo = _es_categoria_vehiculo(registro.categoria_requerimiento)
@@ -101,7 +217,7 @@ def asignar_folder(
         id_source = None
 
         if categoria == "empresa":
-            if not proyecto_drive_resuelto:
+            if not proyecto_drive_resuelto and drive_disponible:
                 proyecto_drive_ctx = drive_service.resolve_acreditacion_root(
                     request.codigo_proyecto,
                     parent_ctx=parent_ctx,
@@ -118,6 +234,16 @@ def asignar_folder(
                             request.codigo_proyecto,
                             parent_drive_id,
                         )
+                if proyecto_drive_ctx and empresas_externas:
+                    carpetas_por_empresa = drive_service.resolve_empresa_folders(
+                        list(empresas_externas.values()),
+                        proyecto_drive_ctx["id_carpeta_acreditacion"],
+                        proyecto_drive_ctx["drive_id"],
+                    )
+                    empresas_externas_resueltas = {
+                        empresa_key: carpetas_por_empresa.get(nombre_empresa)
+                        for empresa_key, nombre_empresa in empresas_externas.items()
+                    }
 
             if not proyecto_drive_ctx:
                 logger.warning(
@@ -153,37 +279,11 @@ def asignar_folder(
                             )
                             id_source = "drive_empresa"
                     else:
-                        carpeta_externos_id = drive_service.find_folder_exact_or_contains(
-                            "Externos",
-                            id_carpeta_proyecto,
-                            drive_id,
+                        drive_folder_id_final = empresas_externas_resueltas.get(
+                            empresa_normalizada
                         )
-
-                        if not carpeta_externos_id:
-                            logger.warning(
-                                "No se encontro carpeta 'Externos' para codigo_proyecto=%s",
-                                request.codigo_proyecto,
-                            )
-                        else:
-                            carpeta_empresa_id = drive_service.find_folder_exact_or_contains(
-                                empresa,
-                                carpeta_externos_id,
-                                drive_id,
-                            )
-                            if not carpeta_empresa_id:
-                                logger.warning(
-                                    "No se encontro carpeta de contratista '%s' en Externos para codigo_proyecto=%s",
-                                    empresa,
-                                    request.codigo_proyecto,
-                                )
-                            else:
-                                drive_folder_id_final = drive_service.find_folder_exact_or_contains(
-                                    "01 Empresa",
-                                    carpeta_empresa_id,
-                                    drive_id,
-                                    ignore_numeric_prefix=True,
-                                )
-                                id_source = "drive_empresa"
+                        if drive_folder_id_final:
+                            id_source = "drive_empresa"
 
                     empresa_folder_cache[empresa_normalizada] = drive_folder_id_final
 
@@ -196,17 +296,9 @@ def asignar_folder(
         else:
             if es_categoria_vehiculo:
                 patente_normalizada = (registro.patente_vehiculo or "").strip()
-                vehiculo_cache_key = (request.id_proyecto, patente_normalizada)
-                if vehiculo_cache_key in vehiculo_folder_cache:
-                    drive_folder_id_vehiculo = vehiculo_folder_cache[vehiculo_cache_key]
-                else:
-                    drive_folder_id_vehiculo = (
-                        supabase_service.buscar_drive_folder_id_vehiculo(
-                            request.id_proyecto,
-                            patente_normalizada,
-                        )
-                    )
-                    vehiculo_folder_cache[vehiculo_cache_key] = drive_folder_id_vehiculo
+                drive_folder_id_vehiculo = vehiculo_folder_cache.get(
+                    (request.id_proyecto, patente_normalizada)
+                )
                 drive_folder_id_final = drive_folder_id_vehiculo
                 if drive_folder_id_vehiculo:
                     id_source = "supabase_vehiculo"
@@ -214,27 +306,8 @@ def asignar_folder(
                 nombre_trabajador = registro.nombre_trabajador or ""
                 nombre_cache_key = _normalize(nombre_trabajador)
 
-                if nombre_cache_key in trabajador_folder_cache:
-                    drive_folder_id_trabajador = trabajador_folder_cache[nombre_cache_key]
-                else:
-                    drive_folder_id_trabajador = (
-                        supabase_service.buscar_drive_folder_id_trabajador(
-                            request.id_proyecto,
-                            nombre_trabajador,
-                        )
-                    )
-                    trabajador_folder_cache[nombre_cache_key] = drive_folder_id_trabajador
-
-                if nombre_cache_key in conductor_folder_cache:
-                    drive_folder_id_conductor = conductor_folder_cache[nombre_cache_key]
-                else:
-                    drive_folder_id_conductor = (
-                        supabase_service.buscar_drive_folder_id_conductor(
-                            request.id_proyecto,
-                            nombre_trabajador,
-                        )
-                    )
-                    conductor_folder_cache[nombre_cache_key] = drive_folder_id_conductor
+                drive_folder_id_trabajador = trabajador_folder_cache.get(nombre_cache_key)
+                drive_folder_id_conductor = conductor_folder_cache.get(nombre_cache_key)
 
                 drive_folder_id_final = (
                     drive_folder_id_trabajador or drive_folder_id_conductor
@@ -251,57 +324,31 @@ def asignar_folder(
                     and request.id_proyecto is not None
                 ):
                     patente_normalizada = registro.patente_vehiculo.strip()
-                    vehiculo_cache_key = (request.id_proyecto, patente_normalizada)
-                    if vehiculo_cache_key in vehiculo_folder_cache:
-                        drive_folder_id_vehiculo = vehiculo_folder_cache[vehiculo_cache_key]
-                    else:
-                        drive_folder_id_vehiculo = (
-                            supabase_service.buscar_drive_folder_id_vehiculo(
-                                request.id_proyecto,
-                                patente_normalizada,
-                            )
-                        )
-                        vehiculo_folder_cache[vehiculo_cache_key] = drive_folder_id_vehiculo
+                    drive_folder_id_vehiculo = vehiculo_folder_cache.get(
+                        (request.id_proyecto, patente_normalizada)
+                    )
                     if drive_folder_id_vehiculo:
                         drive_folder_id_final = drive_folder_id_vehiculo
                         id_source = "supabase_vehiculo"
 
-        actualizado = False
-        if drive_folder_id_final:
-            actualizado = supabase_service.actualizar_brg_acreditacion_solicitud_requerimiento(
-                registro.id,
-                drive_folder_id=drive_folder_id_final,
-                parent_drive_id=parent_drive_id,
-            )
-
-            if actualizado:
-                actualizados_exitosos += 1
-            else:
-                actualizados_fallidos += 1
-        else:
-            sin_drive_folder_id += 1
-            if parent_drive_id:
-                parent_actualizado = (
-                    supabase_service.actualizar_brg_acreditacion_solicitud_requerimiento(
-                        registro.id,
-                        parent_drive_id=parent_drive_id,
-                    )
-                )
-                if not parent_actualizado:
-                    logger.warning(
-                        "No se pudo actualizar parent_drive_id para registro id=%s",
-                        registro.id,
-                    )
+        registro_response = RegistroResponse(
+            id=registro.id,
+            nombre_trabajador=registro.nombre_trabajador,
+            drive_folder_id_trabajador=drive_folder_id_trabajador,
+            drive_folder_id_conductor=drive_folder_id_conductor,
+            drive_folder_id_vehiculo=drive_folder_id_vehiculo,
+            drive_folder_id_final=drive_folder_id_final,
+            actualizado=False,
+        )
+        registros_procesados.append(registro_response)
 
         if drive_folder_id_final:
-            logger.info(
-                "Registro id=%s actualizado=%s source=%s drive_folder_id=%s",
-                registro.id,
-                actualizado,
-                id_source,
-                drive_folder_id_final,
-            )
+            # Se escribe despues del loop, agrupado por payload identico.
+            registros_con_folder.append((registro_response, id_source))
         else:
+            sin_drive_folder_id += 1
+            # parent_drive_id se persiste despues del loop en un solo update.
+            registros_sin_folder.append(registro.id)
             logger.warning(
                 "Registro id=%s sin drive_folder_id categoria='%s' empresa='%s'",
                 registro.id,
@@ -309,16 +356,45 @@ def asignar_folder(
                 registro.empresa_acreditacion,
             )
 
-        registro_response = RegistroResponse(
-            id=registro.id,
-            nombre_trabajador=registro.nombre_trabajador,
-            drive_folder_id_trabajador=drive_folder_id_trabajador,
-            drive_folder_id_conductor=drive_folder_id_conductor,
-            drive_folder_id_vehiculo=drive_folder_id_vehiculo,
-            drive_folder_id_final=drive_folder_id_final,
-            actualizado=actualizado,
+    actualizaciones = [
+        (registro_response.id, registro_response.drive_folder_id_final, parent_drive_id)
+        for registro_response, _id_source in registros_con_folder
+    ]
+    if parent_drive_id:
+        # Todos los registros sin folder comparten el payload: un solo in_("id", ...).
+        actualizaciones.extend(
+            (registro_id, None, parent_drive_id) for registro_id in registros_sin_folder
         )
-        registros_procesados.append(registro_response)
+    if actualizaciones:
+        resultados_actualizacion = (
+            supabase_service.actualizar_brg_acreditacion_solicitud_requerimientos(actualizaciones)
+        )
+        parent_no_actualizados = [
+            registro_id
+            for registro_id in registros_sin_folder
+            if parent_drive_id and not resultados_actualizacion.get(registro_id, False)
+        ]
+        if parent_no_actualizados:
+            logger.warning(
+                "No se pudo actualizar parent_drive_id para registros id=%s",
+                parent_no_actualizados,
+            )
+        for registro_response, id_source in registros_con_folder:
+            registro_response.actualizado = resultados_actualizacion.get(
+                registro_response.id,
+                False,
+            )
+            if registro_response.actualizado:
+                actualizados_exitosos += 1
+            else:
+                actualizados_fallidos += 1
+            logger.info(
+                "Registro id=%s actualizado=%s source=%s drive_folder_id=%s",
+                registro_response.id,
+                registro_response.actualizado,
+                id_source,
+                registro_response.drive_folder_id_final,
+            )
 
     resumen = ResumenActualizacion(
         total_registros=len(request.registros),
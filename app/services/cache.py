@@ -0,0 +1,145 @@
+"""Caches en memoria compartidos entre requests del proceso."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Cache thread-safe con expiracion por TTL y contadores de hit/miss.
+
+    Opcionalmente se acota como LRU por cantidad de entradas (max_entries) y por
+    peso total (max_weight, calculado con weigher) para limitar memoria.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        max_entries: Optional[int] = None,
+        max_weight: Optional[int] = None,
+        weigher: Optional[Callable[[Any], int]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self._weigher = weigher or (lambda _value: 1)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retorna el valor vigente para key o default si no existe o expiro."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, _ = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Como get, pero sin contar hit/miss ni actualizar el orden LRU."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                return entry[0]
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Guarda value para key; un TTL <= 0 desactiva el almacenamiento."""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        if ttl <= 0:
+            return
+        weight = self._weigher(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            # Un valor que por si solo supera el limite nunca se cachea.
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, self._clock() + ttl, weight)
+            self._weight += weight
+            self._evict_overflow()
+
+    def _remove(self, key: Hashable) -> None:
+        """Elimina key asumiendo que el lock ya esta tomado."""
+        _, _, weight = self._entries.pop(key)
+        self._weight -= weight
+
+    def _evict_overflow(self) -> None:
+        """Expulsa entradas LRU mientras se excedan los limites configurados."""
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_weight is not None and self._weight > self.max_weight)
+        ):
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Elimina key del cache. Retorna True si existia."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            self.invalidations += 1
+            return True
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Elimina las entradas que cumplen predicate(key, value)."""
+        with self._lock:
+            keys = [
+                key
+                for key, (value, _, _) in self._entries.items()
+                if predicate(key, value)
+            ]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """Retorna (key, value, ttl_restante) de las entradas vigentes, sin contar hits."""
+        with self._lock:
+            now = self._clock()
+            return [
+                (key, value, expires_at - now)
+                for key, (value, expires_at, _) in self._entries.items()
+                if expires_at > now
+            ]
+
+    def clear(self) -> None:
+        """Vacia el cache sin reiniciar contadores."""
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Retorna contadores del cache para logs y diagnostico."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "weight": self._weight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
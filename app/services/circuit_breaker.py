@@ -0,0 +1,178 @@
+"""Circuit breakers por dependencia externa (Drive, tablas de Supabase)."""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """La dependencia tiene el circuito abierto: la llamada falla sin ejecutarse."""
+
+    def __init__(self, name: str, retry_in_seconds: float):
+        super().__init__(
+            f"Circuito '{name}' abierto; se reintenta en {max(retry_in_seconds, 0):.1f}s"
+        )
+        self.name = name
+        self.retry_in_seconds = retry_in_seconds
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker closed/open/half-open para una dependencia.
+
+    Tras failure_threshold fallas consecutivas el circuito se abre y las
+    llamadas fallan de inmediato con CircuitOpenError. Pasado
+    reset_timeout_seconds pasa a half-open y deja pasar una sola llamada de
+    prueba: si resulta bien se cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        """Estado considerando el paso a half-open por tiempo (lock tomado)."""
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout_seconds:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """Autoriza la llamada o lanza CircuitOpenError."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            retry_in = self.reset_timeout_seconds - (self._clock() - self._opened_at)
+        raise CircuitOpenError(self.name, retry_in)
+
+    def record_success(self) -> None:
+        """Registra una llamada exitosa; cierra el circuito si estaba en prueba."""
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuito '%s' cerrado tras llamada de prueba exitosa", self.name)
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Registra una falla; abre el circuito al superar el umbral o en half-open."""
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._trial_in_flight = False
+                self.times_opened += 1
+                logger.error(
+                    "Circuito '%s' abierto tras %s fallas consecutivas",
+                    self.name,
+                    self._consecutive_failures,
+                )
+
+    def call(
+        self,
+        call: Callable[[], Any],
+        is_failure: Callable[[Exception], bool] = lambda _error: True,
+    ) -> Any:
+        """Ejecuta call protegido por el circuito."""
+        self.before_call()
+        try:
+            result = call()
+        except Exception as error:
+            if is_failure(error):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado y contadores para /health."""
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers creados bajo demanda, uno por nombre de dependencia."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        """Retorna el breaker de name, creandolo cerrado si no existe."""
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=self.failure_threshold,
+                    reset_timeout_seconds=self.reset_timeout_seconds,
+                    clock=self._clock,
+                )
+                self._breakers[name] = breaker
+            return breaker
+
+    def is_open(self, name: str) -> bool:
+        """Indica si name rechazaria una llamada ahora (abierto, sin cupo de prueba)."""
+        with self._lock:
+            breaker: Optional[CircuitBreaker] = self._breakers.get(name)
+        return breaker is not None and breaker.state == OPEN
+
+    def reset(self) -> None:
+        """Descarta todos los breakers (vuelven a crearse cerrados)."""
+        with self._lock:
+            self._breakers.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Estado de cada breaker conocido."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.snapshot() for breaker in breakers}
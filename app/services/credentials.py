@@ -0,0 +1,277 @@
+"""Credenciales OAuth de Google Drive con refresco proactivo en segundo plano."""
+import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, TextIO
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock, solo el lock en memoria del proceso.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class CredentialsUnavailableError(RuntimeError):
+    """No hay token.json utilizable y el servidor no puede autorizar interactivamente."""
+
+
+def _utcnow() -> datetime.datetime:
+    """Hora UTC naive, el mismo formato que usa google-auth en expiry."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class CredentialManager:
+    """
+    Mantiene en memoria las credenciales OAuth compartidas por los clientes Drive.
+
+    Un thread refresca el token antes de que expire (refresh_margin_seconds), asi
+    los requests no pagan el refresco. Al refrescar toma un lock exclusivo sobre
+    token.json: si otro worker ya lo renovo, adopta ese token en vez de volver a
+    llamar a Google. El archivo se reescribe de forma atomica (archivo temporal +
+    rename) y, si el directorio no es escribible o token.json es un bind mount de
+    un solo archivo, se reescribe en el lugar bajo el mismo lock.
+
+    Nunca ejecuta el flujo interactivo de OAuth: sin token valido falla con
+    CredentialsUnavailableError (ver authorize_interactively para generarlo).
+    """
+
+    def __init__(
+        self,
+        token_file: str,
+        scopes: Iterable[str],
+        refresh_margin_seconds: float = 300.0,
+        check_interval_seconds: float = 60.0,
+        request_factory: Callable[[], Request] = Request,
+        clock: Callable[[], datetime.datetime] = _utcnow,
+    ):
+        self.token_file = token_file
+        self.scopes = list(scopes)
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._request_factory = request_factory
+        self._clock = clock
+        self._credentials: Optional[Credentials] = None
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.adopted = 0
+        self.failures = 0
+        self._unavailable_logged = False
+
+    def _load_from_file(self) -> Optional[Credentials]:
+        """Lee token.json o retorna None si no existe."""
+        if not os.path.exists(self.token_file):
+            return None
+        return Credentials.from_authorized_user_file(self.token_file, self.scopes)
+
+    def _expires_soon(self, creds: Optional[Credentials]) -> bool:
+        """Indica si creds no sirve o vence dentro del margen de refresco."""
+        if creds is None or not creds.token:
+            return True
+        if creds.expiry is None:
+            return False
+        margin = datetime.timedelta(seconds=self.refresh_margin_seconds)
+        return creds.expiry - margin <= self._clock()
+
+    def get(self) -> Credentials:
+        """
+        Retorna las credenciales en memoria.
+
+        Si aun no se cargaron o ya expiraron (el refresco en segundo plano fallo
+        o no esta activo), las carga/refresca en linea como ultimo recurso.
+        """
+        creds = self._credentials
+        if creds is not None and creds.valid:
+            return creds
+
+        with self._lock:
+            creds = self._credentials
+            if creds is not None and creds.valid:
+                return creds
+            if creds is None:
+                creds = self._load_from_file()
+                if creds is None:
+                    raise CredentialsUnavailableError(
+                        f"No existe {self.token_file}; generarlo con "
+                        "`python -m app.services.credentials` fuera del servidor"
+                    )
+                self._credentials = creds
+                if creds.valid:
+                    return creds
+            return self.refresh()
+
+    def refresh(self, force: bool = False) -> Credentials:
+        """
+        Refresca el token bajo lock de archivo y lo persiste.
+
+        Sin force, no hace nada si el token en memoria aun no entra al margen.
+        """
+        with self._lock:
+            creds = self._credentials or self._load_from_file()
+            if creds is None:
+                raise CredentialsUnavailableError(f"No existe {self.token_file}")
+            self._credentials = creds
+            if not force and not self._expires_soon(creds):
+                return creds
+
+            with self._locked_token_file() as token_handle:
+                # Otro worker pudo refrescar mientras se esperaba el lock.
+                file_creds = self._read_locked(token_handle)
+                if not force and file_creds is not None and not self._expires_soon(file_creds):
+                    creds.token = file_creds.token
+                    creds.expiry = file_creds.expiry
+                    self.adopted += 1
+                    logger.info("Token OAuth renovado por otro worker; se reutiliza")
+                    return creds
+
+                if not creds.refresh_token:
+                    raise CredentialsUnavailableError(
+                        f"{self.token_file} no tiene refresh_token; regenerarlo fuera del servidor"
+                    )
+                creds.refresh(self._request_factory())
+                self._write_token(token_handle, creds.to_json())
+                self.refreshes += 1
+                logger.info("Token OAuth refrescado; expira %s", creds.expiry)
+            return creds
+
+    @contextmanager
+    def _locked_token_file(self) -> Iterator[TextIO]:
+        """
+        Abre token.json con lock exclusivo (flock) mientras dura el bloque.
+
+        Si mientras se esperaba el lock otro worker reemplazo el archivo por
+        rename, el lock quedo sobre el inodo viejo y se vuelve a abrir la ruta.
+        Sin fcntl (Windows) solo protege el RLock: no coordina entre workers.
+        """
+        if fcntl is None:
+            with open(self.token_file, "r+", encoding="utf-8") as token_handle:
+                yield token_handle
+            return
+
+        while True:
+            token_handle = open(self.token_file, "r+", encoding="utf-8")
+            try:
+                fcntl.flock(token_handle.fileno(), fcntl.LOCK_EX)
+                if os.fstat(token_handle.fileno()).st_ino != os.stat(self.token_file).st_ino:
+                    continue
+                try:
+                    yield token_handle
+                finally:
+                    fcntl.flock(token_handle.fileno(), fcntl.LOCK_UN)
+                return
+            finally:
+                token_handle.close()
+
+    def _read_locked(self, token_handle: TextIO) -> Optional[Credentials]:
+        """Lee las credenciales del archivo ya bloqueado."""
+        token_handle.seek(0)
+        content = token_handle.read()
+        if not content.strip():
+            return None
+        try:
+            return Credentials.from_authorized_user_info(json.loads(content), self.scopes)
+        except ValueError as error:
+            logger.warning("token.json invalido, se ignora: %s", error)
+            return None
+
+    def _write_token(self, token_handle: TextIO, content: str) -> None:
+        """Reemplaza token.json de forma atomica o, si no se puede, en el lugar."""
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".token-", suffix=".json", dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                tmp_file.write(content)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, self.token_file)
+            return
+        except OSError as error:
+            # Filesystem de solo lectura o bind mount de un solo archivo (EBUSY/EXDEV).
+            logger.debug("Reemplazo atomico de token.json no disponible: %s", error)
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        token_handle.seek(0)
+        token_handle.write(content)
+        token_handle.truncate()
+        token_handle.flush()
+        os.fsync(token_handle.fileno())
+
+    def _run(self) -> None:
+        """
+        Loop del thread de refresco proactivo.
+
+        Sin token.json utilizable lo registra una sola vez y sigue esperando
+        a que aparezca, sin contarlo como falla de refresco.
+        """
+        while not self._stop_event.wait(self.check_interval_seconds):
+            try:
+                self.refresh()
+                self._unavailable_logged = False
+            except CredentialsUnavailableError as error:
+                if not self._unavailable_logged:
+                    self._unavailable_logged = True
+                    logger.warning("Refresco de token OAuth en espera: %s", error)
+            except Exception as error:
+                self.failures += 1
+                logger.error("Error refrescando token OAuth en segundo plano: %s", error)
+
+    def start(self) -> None:
+        """Inicia el refresco proactivo en un thread daemon."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="drive-credentials-refresher",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Detiene el refresco proactivo."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de refresco para diagnostico."""
+        creds = self._credentials
+        return {
+            "expiry": creds.expiry.isoformat() if creds is not None and creds.expiry else None,
+            "refreshes": self.refreshes,
+            "adopted": self.adopted,
+            "failures": self.failures,
+        }
+
+
+def authorize_interactively(client_secret_file: str, token_file: str, scopes: Iterable[str]) -> None:
+    """Ejecuta el flujo OAuth en el navegador y guarda token.json (solo uso local)."""
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
+    flow = InstalledAppFlow.from_client_secrets_file(client_secret_file, list(scopes))
+    creds = flow.run_local_server(port=0)
+    with open(token_file, "w", encoding="utf-8") as token:
+        token.write(creds.to_json())
+
+
+if __name__ == "__main__":
+    from app.config import settings
+    from app.services.drive_service import SCOPES
+
+    authorize_interactively(
+        settings.GOOGLE_CLIENT_SECRET_FILE,
+        settings.GOOGLE_TOKEN_FILE,
+        SCOPES,
+    )
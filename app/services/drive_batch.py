@@ -0,0 +1,176 @@
+"""Agrupacion de requests de Google Drive en llamadas batch multipart."""
+import logging
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.rate_limit import TokenBucket
+from app.services.request_metrics import track_call
+from app.services.retry import (
+    RETRYABLE_STATUS_CODES,
+    RetryPolicy,
+    is_retryable_error,
+    next_retry_delay,
+    remaining_budget,
+)
+
+logger = logging.getLogger(__name__)
+
+# Drive acepta hasta 100 llamadas por request batch.
+MAX_BATCH_SIZE = 100
+# Nombre con que se contabiliza cada request batch en las metricas del request.
+DRIVE_BATCH_OPERATION = "drive.batch"
+
+
+class DriveBatch:
+    """
+    Cola de requests independientes de Drive que se envian en un solo batch.
+
+    add() retorna un Future que se resuelve al ejecutar execute(). El batch
+    reserva un cliente del pool por cada envio y lo libera antes de esperar
+    entre reintentos. Cada sub-respuesta con
+    error transitorio se reintenta por separado en un batch posterior, sin
+    repetir las que ya respondieron correctamente.
+    """
+
+    def __init__(
+        self,
+        checkout,
+        execute_single,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._checkout = checkout
+        self._execute_single = execute_single
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._rate_limiter = rate_limiter
+        self._circuit_breaker = circuit_breaker
+        self._queue: List[Tuple[Any, Future]] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def add(self, request: Any) -> Future:
+        """Encola una request y retorna su Future."""
+        future: Future = Future()
+        self._queue.append((request, future))
+        return future
+
+    def execute(self) -> None:
+        """Envia las requests encoladas y resuelve sus Futures."""
+        pending = self._queue
+        self._queue = []
+
+        if len(pending) == 1:
+            # Una sola request no justifica el overhead multipart.
+            request, future = pending[0]
+            try:
+                with self._checkout() as service:
+                    future.set_result(self._execute_single(_bind_to_client(request, service)))
+            except Exception as error:
+                future.set_exception(error)
+            return
+
+        if self._circuit_breaker is not None:
+            try:
+                self._circuit_breaker.before_call()
+            except CircuitOpenError as error:
+                for _request, future in pending:
+                    future.set_exception(error)
+                return
+
+        for attempt in range(self.retry_policy.max_attempts):
+            retryable: List[Tuple[Any, Future, Exception]] = []
+            for start in range(0, len(pending), MAX_BATCH_SIZE):
+                group = pending[start:start + MAX_BATCH_SIZE]
+                retryable.extend(self._execute_group(group, is_retry=attempt > 0))
+
+            if not retryable:
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.record_success()
+                return
+
+            wait_time = next_retry_delay(
+                self.retry_policy,
+                retryable[0][2],
+                attempt,
+                f"Batch Google Drive ({len(retryable)} sub-requests)",
+            )
+            if wait_time is None:
+                # Todo el batch cuenta como una sola falla del circuito; errores
+                # que no son de Drive (timeouts locales, bugs) no lo abren.
+                if self._circuit_breaker is not None:
+                    if is_retryable_error(retryable[0][2]):
+                        self._circuit_breaker.record_failure()
+                    else:
+                        self._circuit_breaker.record_success()
+                for _request, future, error in retryable:
+                    future.set_exception(error)
+                return
+
+            time.sleep(wait_time)
+            pending = [(request, future) for request, future, _error in retryable]
+
+    def _execute_group(
+        self,
+        group: List[Tuple[Any, Future]],
+        is_retry: bool = False,
+    ) -> List[Tuple[Any, Future, Exception]]:
+        """Ejecuta un batch y retorna las sub-requests que conviene reintentar."""
+        entries: Dict[str, Tuple[Any, Future]] = {
+            str(position): entry for position, entry in enumerate(group)
+        }
+        retryable: List[Tuple[Any, Future, Exception]] = []
+
+        def callback(request_id: str, response: Any, exception: Optional[Exception]) -> None:
+            request, future = entries[request_id]
+            if exception is None:
+                future.set_result(response)
+            elif _is_retryable(exception):
+                retryable.append((request, future, exception))
+            else:
+                future.set_exception(exception)
+
+        try:
+            with track_call(DRIVE_BATCH_OPERATION) as tracker:
+                tracker.retries = int(is_retry)
+                if self._rate_limiter is not None:
+                    # Drive cuenta cada sub-request del batch contra la cuota.
+                    self._rate_limiter.acquire(len(group), timeout=remaining_budget())
+                with self._checkout() as service:
+                    batch = service.new_batch_http_request(callback=callback)
+                    for request_id, (request, _future) in entries.items():
+                        batch.add(_bind_to_client(request, service), request_id=request_id)
+                    batch.execute()
+        except Exception as error:
+            # Fallo de transporte del batch completo: se reintenta lo no resuelto.
+            resolved = {id(future) for _request, future, _error in retryable}
+            for request, future in group:
+                if not future.done() and id(future) not in resolved:
+                    retryable.append((request, future, error))
+        return retryable
+
+
+def _bind_to_client(request: Any, service: Any) -> Any:
+    """
+    Hace que request use la conexion del cliente reservado para este envio.
+
+    Las requests se arman con cualquier cliente del pool y ese cliente ya pudo
+    volver al pool; sin esto se ejecutarian sobre una conexion httplib2 que
+    otro thread puede estar usando.
+    """
+    http = getattr(service, "_http", None)
+    if http is not None and hasattr(request, "http"):
+        request.http = http
+    return request
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Indica si el error de una sub-respuesta es transitorio."""
+    if isinstance(error, HttpError):
+        return getattr(error.resp, "status", None) in RETRYABLE_STATUS_CODES
+    return False
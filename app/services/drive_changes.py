@@ -0,0 +1,175 @@
+"""Seguimiento del feed de cambios de Drive para mantener los caches consistentes."""
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker propio: un feed caido no debe abrir el de files.list.
+DRIVE_CHANGES_OPERATION = "drive.changes"
+
+CHANGES_FIELDS = (
+    "nextPageToken, newStartPageToken, "
+    "changes(fileId, removed, file(id, name, mimeType, parents, trashed))"
+)
+
+
+class DriveChangesWatcher:
+    """
+    Mantiene un cursor de changes().list para un Shared Drive.
+
+    Cada poll recorre los cambios desde el ultimo pageToken y pide al
+    DriveService invalidar solo los listados cuyos padres cambiaron. Mientras
+    el cursor esta sano, los listados cacheados pueden vivir con TTL largo.
+    """
+
+    def __init__(
+        self,
+        drive_service: Any,
+        drive_name: str,
+        drive_id: Optional[str] = None,
+        interval_seconds: float = 30.0,
+    ):
+        self._drive_service = drive_service
+        self.drive_name = drive_name
+        self.drive_id = drive_id
+        self.interval_seconds = interval_seconds
+        self.page_token: Optional[str] = None
+        self.healthy = False
+        self.changes_applied = 0
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def resume(self, drive_id: str, page_token: str) -> None:
+        """
+        Retoma un cursor persistido; el primer poll reprocesa los cambios desde alli.
+
+        Queda no sano hasta ese poll, asi los listados nuevos usan el TTL normal.
+        """
+        with self._lock:
+            self.drive_id = drive_id
+            self.page_token = page_token
+            self.healthy = False
+
+    def _list_params(self, page_token: str) -> Dict[str, Any]:
+        """Parametros de changes().list para el Shared Drive seguido."""
+        return {
+            "pageToken": page_token,
+            "driveId": self.drive_id,
+            "includeItemsFromAllDrives": True,
+            "supportsAllDrives": True,
+            "includeRemoved": True,
+            "pageSize": 1000,
+            "fields": CHANGES_FIELDS,
+        }
+
+    def initialize(self) -> bool:
+        """Obtiene el pageToken inicial; los cambios previos no se reprocesan."""
+        if not self.drive_id:
+            self.drive_id = self._drive_service.find_shared_drive_by_name(self.drive_name)
+            if not self.drive_id:
+                logger.warning("Feed de cambios: no se pudo resolver el Shared Drive")
+                return False
+
+        drive_id = self.drive_id
+        response = self._drive_service._execute_drive_call(
+            lambda service: service.changes().getStartPageToken(
+                driveId=drive_id,
+                supportsAllDrives=True,
+            ),
+            operation=DRIVE_CHANGES_OPERATION,
+        )
+        with self._lock:
+            self.page_token = response["startPageToken"]
+            self.healthy = True
+        logger.info(
+            "Feed de cambios iniciado para drive_id=%s token=%s",
+            self.drive_id,
+            self.page_token,
+        )
+        return True
+
+    def poll_once(self) -> int:
+        """Procesa los cambios pendientes y retorna cuantos se aplicaron."""
+        with self._lock:
+            if self.page_token is None and not self.initialize():
+                return 0
+
+            applied = 0
+            page_token = self.page_token
+            try:
+                while page_token:
+                    params = self._list_params(page_token)
+                    response = self._drive_service._execute_drive_call(
+                        lambda service: service.changes().list(**params),
+                        operation=DRIVE_CHANGES_OPERATION,
+                    )
+                    for change in response.get("changes", []):
+                        self._drive_service.apply_drive_change(self.drive_id, change)
+                        applied += 1
+
+                    if response.get("newStartPageToken"):
+                        self.page_token = response["newStartPageToken"]
+                        break
+                    page_token = response.get("nextPageToken")
+            except Exception as error:
+                # Sin cursor confiable no se pueden conservar listados con TTL largo.
+                logger.error("Error consultando feed de cambios de Drive: %s", error)
+                self._mark_unhealthy()
+                return applied
+
+            self.healthy = True
+            self.changes_applied += applied
+            return applied
+
+    def _mark_unhealthy(self) -> None:
+        """Descarta cursor y listados del drive para reconstruirlos desde cero."""
+        self.healthy = False
+        self.page_token = None
+        self._drive_service.invalidate_drive_listings(self.drive_id)
+
+    def _run(self) -> None:
+        """Loop del thread de polling; el primer poll ocurre sin esperar el intervalo."""
+        try:
+            self.poll_once()
+        except Exception as error:
+            logger.error("No se pudo iniciar el feed de cambios de Drive: %s", error)
+            with self._lock:
+                self._mark_unhealthy()
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.poll_once()
+            except Exception as error:
+                logger.error("Error inesperado en feed de cambios de Drive: %s", error)
+                with self._lock:
+                    self._mark_unhealthy()
+
+    def start(self) -> None:
+        """Inicia el polling en un thread daemon."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="drive-changes-watcher",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Detiene el polling."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self.healthy = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del cursor para diagnostico."""
+        return {
+            "drive_id": self.drive_id,
+            "healthy": self.healthy,
+            "changes_applied": self.changes_applied,
+        }
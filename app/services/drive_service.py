@@ -1,49 +1,352 @@
 """Servicio para resolver carpetas en Google Drive."""
 import logging
-import os
+import queue
 import re
+import threading
 import time
-import unicodedata
-from typing import Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from dataclasses import replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from google.auth.transport.requests import Request
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from app.config import settings
+from app.services.cache import TTLCache
+from app.services.circuit_breaker import CircuitBreakerRegistry
+from app.services.credentials import CredentialManager
+from app.services.drive_batch import DriveBatch
+from app.services.drive_changes import DriveChangesWatcher
+from app.services.drive_snapshot import FolderSnapshotStore
+from app.services.folder_index import (
+    FolderIndex,
+    normalize_base_folder_label,
+    normalize_name,
+)
+from app.services.rate_limit import RateLimitTimeout, TokenBucket
+from app.services.request_metrics import record_cache_hit, track_call
+from app.services.retry import (
+    RetryPolicy,
+    execute_with_retry,
+    is_retryable_error,
+    remaining_budget,
+)
+from app.services.single_flight import SingleFlight, SingleFlightTimeout
 
 logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 ACREDITACIONES_DRIVE_NAME = "Acreditaciones"
 ACREDITACIONES_ROOT_FOLDER_NAME = "Acreditaciones"
-NUMERIC_PREFIX_PATTERN = re.compile(r"^\s*\d+\s*[-_.]?\s*")
+EXTERNOS_FOLDER_NAME = "Externos"
+EMPRESA_FOLDER_NAME = "01 Empresa"
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+# Cantidad maxima de clausulas "'<id>' in parents" por consulta para no exceder
+# el largo de URL/query aceptado por Drive.
+MULTI_PARENT_QUERY_CHUNK_SIZE = 30
+# Circuit breakers por metodo de Drive.
+DRIVE_FILES_LIST = "drive.files.list"
+DRIVE_DRIVES_LIST = "drive.drives.list"
+# Ruta de acreditacion de un proyecto (solo se contabilizan sus cache hits).
+DRIVE_PROJECT_ROOT = "drive.acreditacion_root"
+# Marca de cache negativo para proyectos cuya carpeta aun no existe en Drive.
+PROJECT_ROOT_NOT_FOUND = object()
+
+
+class ClientPoolTimeout(RuntimeError):
+    """No se libero un cliente del pool dentro del tiempo disponible del request."""
 
 
 class DriveService:
     """Servicio para operaciones de lectura en Google Drive."""
 
     def __init__(self):
-        self.client_secret_file = settings.GOOGLE_CLIENT_SECRET_FILE
         self.token_file = settings.GOOGLE_TOKEN_FILE
+        self.credential_manager = CredentialManager(
+            self.token_file,
+            SCOPES,
+            refresh_margin_seconds=settings.GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS,
+            check_interval_seconds=settings.GOOGLE_TOKEN_REFRESH_INTERVAL_SECONDS,
+        )
+        # Cliente fijo opcional (inyeccion manual/tests); si existe, reemplaza al pool.
         self.service = None
+        # httplib2 no es thread-safe: cada thread reserva un cliente propio del pool.
+        self.pool_size = max(settings.DRIVE_CLIENT_POOL_SIZE, 1)
+        self._init_lock = threading.RLock()
+        self._client_pool: Optional["queue.Queue"] = None
+        self._checkout_local = threading.local()
+        self._pool_stats_lock = threading.Lock()
+        self._pool_checkouts = 0
+        self._pool_wait_seconds = 0.0
+        self._pool_max_wait_seconds = 0.0
+        self.changes_watcher: Optional[DriveChangesWatcher] = None
+        self._changes_generation = 0
+        # Cursor de cambios leido del snapshot, para retomarlo al iniciar el watcher.
+        self._snapshot_cursor: Optional[Tuple[str, str]] = None
+        self.retry_policy = RetryPolicy(
+            max_attempts=settings.DRIVE_RETRY_MAX_ATTEMPTS,
+            base_delay_seconds=settings.DRIVE_RETRY_BASE_DELAY_SECONDS,
+            max_delay_seconds=settings.DRIVE_RETRY_MAX_DELAY_SECONDS,
+        )
+        # Cupo de llamadas a Drive compartido por los threads (y workers, con archivo).
+        self.rate_limiter = TokenBucket(
+            settings.DRIVE_RATE_LIMIT_QPS,
+            burst=settings.DRIVE_RATE_LIMIT_BURST,
+            state_file=settings.DRIVE_RATE_LIMIT_STATE_FILE,
+        )
+        self.circuit_breakers = CircuitBreakerRegistry(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout_seconds=settings.CIRCUIT_BREAKER_RESET_TIMEOUT_SECONDS,
+        )
+        # Consultas identicas concurrentes (drive, padre, nombre) comparten una llamada.
+        self._single_flight = SingleFlight()
+        # Cache de proceso nombre normalizado de Shared Drive -> ID.
+        self._shared_drive_cache = TTLCache(settings.DRIVE_SHARED_DRIVE_CACHE_TTL_SECONDS)
+        # Cache LRU+TTL (drive_id, parent_id) -> FolderIndex del listado completo
+        # de subcarpetas. El peso de cada entrada es su cantidad de hijos.
+        self._folder_cache = TTLCache(
+            settings.DRIVE_FOLDER_CACHE_TTL_SECONDS,
+            max_entries=settings.DRIVE_FOLDER_CACHE_MAX_ENTRIES,
+            max_weight=settings.DRIVE_FOLDER_CACHE_MAX_ITEMS,
+            weigher=lambda index: max(len(index), 1),
+        )
+
+        # Cache (drive_id, codigo_proyecto) -> IDs de la ruta del proyecto. Los
+        # proyectos sin carpeta se cachean con PROJECT_ROOT_NOT_FOUND y TTL corto.
+        self._project_root_cache = TTLCache(
+            settings.DRIVE_PROJECT_ROOT_CACHE_TTL_SECONDS,
+            max_entries=settings.DRIVE_PROJECT_ROOT_CACHE_MAX_ENTRIES,
+        )
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Retorna contadores de los caches de proceso."""
+        return {
+            "shared_drives": self._shared_drive_cache.stats(),
+            "folders": self._folder_cache.stats(),
+            "project_roots": self._project_root_cache.stats(),
+            "single_flight": self._single_flight.stats(),
+        }
+
+    def clear_caches(self) -> None:
+        """Vacia los caches de proceso (util en tests y recargas manuales)."""
+        self._shared_drive_cache.clear()
+        self._folder_cache.clear()
+        self._project_root_cache.clear()
+
+    def _handle_not_found(self, drive_id: Optional[str], parent_ids: Iterable[str]) -> None:
+        """
+        Invalida caches que referencian IDs para los que Drive respondio 404.
+
+        Solo se descartan las entradas que referencian esos IDs; el Shared
+        Drive y todas sus rutas se invalidan solo si el 404 fue del drive.
+        """
+        stale_ids = set(parent_ids)
+        if drive_id and drive_id in stale_ids:
+            self._invalidate_shared_drive_id(drive_id)
+        for parent_id in stale_ids:
+            self._folder_cache.invalidate((drive_id, parent_id))
+        removed = self._project_root_cache.invalidate_where(
+            lambda _key, root: root is not PROJECT_ROOT_NOT_FOUND
+            and bool(stale_ids.intersection(root.values()))
+        )
+        if removed:
+            logger.warning(
+                "Se invalidaron %s rutas de proyecto cacheadas que referencian %s",
+                removed,
+                sorted(stale_ids),
+            )
+
+    def invalidate_project_root(self, codigo_proyecto: str) -> int:
+        """Descarta la ruta cacheada (positiva o negativa) de un proyecto."""
+        return self._project_root_cache.invalidate_where(
+            lambda key, _root: key[1] == codigo_proyecto
+        )
+
+    def _store_folder_listing(
+        self,
+        drive_id: Optional[str],
+        parent_id: str,
+        folders: List[Tuple[str, str]],
+        generation: int,
+    ) -> FolderIndex:
+        """
+        Indexa y cachea un listado completo; con feed de cambios activo usa TTL largo.
+
+        generation es el contador de cambios leido antes de consultar Drive: si
+        llego un cambio mientras tanto, el listado podria estar desactualizado y
+        se guarda solo con el TTL normal.
+        """
+        ttl_seconds = None
+        watcher = self.changes_watcher
+        if (
+            watcher is not None
+            and watcher.healthy
+            and watcher.drive_id == drive_id
+            and generation == self._changes_generation
+        ):
+            ttl_seconds = settings.DRIVE_CHANGES_FOLDER_CACHE_TTL_SECONDS
+        index = FolderIndex(folders)
+        self._folder_cache.set((drive_id, parent_id), index, ttl_seconds=ttl_seconds)
+        return index
+
+    def invalidate_drive_listings(self, drive_id: Optional[str]) -> int:
+        """Descarta todos los listados cacheados de un Shared Drive."""
+        return self._folder_cache.invalidate_where(lambda key, _index: key[0] == drive_id)
+
+    def apply_drive_change(self, drive_id: str, change: Dict[str, object]) -> None:
+        """
+        Invalida los listados afectados por un cambio del feed de Drive.
+
+        Se descartan los listados de los padres actuales del archivo y los que
+        lo contenian antes (movido, renombrado, eliminado o enviado a papelera).
+        """
+        file_id = change.get("fileId")
+        file_info = change.get("file") or {}
+        if file_info.get("mimeType") not in (None, FOLDER_MIME_TYPE):
+            return
+
+        self._changes_generation += 1
+        parent_ids = set(file_info.get("parents") or [])
+        self._folder_cache.invalidate_where(
+            lambda key, index: key[0] == drive_id
+            and (key[1] in parent_ids or key[1] == file_id or file_id in index.folder_ids)
+        )
+        if change.get("removed") or file_info.get("trashed"):
+            self._handle_not_found(None, [file_id])
+
+    def start_changes_watcher(self) -> DriveChangesWatcher:
+        """Inicia el polling del feed de cambios del Shared Drive de Acreditaciones."""
+        if self.changes_watcher is None:
+            self.changes_watcher = DriveChangesWatcher(
+                self,
+                ACREDITACIONES_DRIVE_NAME,
+                interval_seconds=settings.DRIVE_CHANGES_POLL_INTERVAL_SECONDS,
+            )
+            if self._snapshot_cursor is not None:
+                self.changes_watcher.resume(*self._snapshot_cursor)
+                self._snapshot_cursor = None
+        self.changes_watcher.start()
+        return self.changes_watcher
+
+    def stop_changes_watcher(self) -> None:
+        """Detiene el polling del feed de cambios."""
+        if self.changes_watcher is not None:
+            self.changes_watcher.stop(timeout=5)
+
+    def save_snapshot(self, path: Optional[str] = None) -> int:
+        """
+        Guarda en disco los listados y Shared Drives cacheados con su TTL restante.
+
+        El cursor de cambios se lee antes que los listados: cualquier listado
+        copiado es al menos tan reciente como ese cursor, y al retomarlo se
+        reprocesan los cambios posteriores.
+        """
+        path = path or settings.DRIVE_SNAPSHOT_PATH
+        if not path:
+            return 0
+
+        page_tokens: Dict[str, str] = {}
+        watcher = self.changes_watcher
+        if watcher is not None and watcher.healthy and watcher.drive_id and watcher.page_token:
+            page_tokens[watcher.drive_id] = watcher.page_token
+
+        listings = [
+            (drive_id, parent_id, index.folders, ttl_remaining)
+            for (drive_id, parent_id), index, ttl_remaining in self._folder_cache.items()
+        ]
+        try:
+            saved = FolderSnapshotStore(path).save(
+                listings,
+                shared_drives=self._shared_drive_cache.items(),
+                page_tokens=page_tokens,
+            )
+        except Exception as error:
+            logger.warning("No se pudo guardar snapshot de carpetas en %s: %s", path, error)
+            return 0
+        logger.info("Snapshot de carpetas guardado en %s (%s listados)", path, saved)
+        return saved
+
+    def load_snapshot(self, path: Optional[str] = None) -> int:
+        """
+        Carga en los caches un snapshot guardado por save_snapshot.
+
+        Si el snapshot trae cursor de cambios y el feed esta habilitado, los
+        listados conservan su TTL restante y el primer poll del watcher los
+        valida (o descarta si el cursor ya no sirve). Sin cursor, cada listado
+        se acota al TTL normal de listados.
+        """
+        path = path or settings.DRIVE_SNAPSHOT_PATH
+        if not path:
+            return 0
+
+        try:
+            snapshot = FolderSnapshotStore(path).load()
+        except Exception as error:
+            logger.warning("No se pudo leer snapshot de carpetas en %s: %s", path, error)
+            return 0
+        if snapshot is None:
+            return 0
+
+        validated_drive_id = None
+        if settings.DRIVE_CHANGES_ENABLED and snapshot.page_tokens:
+            validated_drive_id, page_token = next(iter(snapshot.page_tokens.items()))
+            self._snapshot_cursor = (validated_drive_id, page_token)
+
+        for name_key, drive_id, ttl_remaining in snapshot.shared_drives:
+            self._shared_drive_cache.set(name_key, drive_id, ttl_seconds=ttl_remaining)
+
+        for drive_id, parent_id, folders, ttl_remaining in snapshot.listings:
+            if drive_id != validated_drive_id:
+                ttl_remaining = min(ttl_remaining, settings.DRIVE_FOLDER_CACHE_TTL_SECONDS)
+            self._folder_cache.set(
+                (drive_id, parent_id),
+                FolderIndex(folders),
+                ttl_seconds=ttl_remaining,
+            )
+
+        logger.info(
+            "Snapshot de carpetas cargado desde %s (%s listados)",
+            path,
+            len(snapshot.listings),
+        )
+        return len(snapshot.listings)
+
+    def invalidate_folder_listing(self, parent_id: str, drive_id: Optional[str] = None) -> bool:
+        """Descarta el listado cacheado de parent_id para forzar una nueva consulta."""
+        return self._folder_cache.invalidate((drive_id, parent_id))
+
+    @staticmethod
+    def _is_not_found_error(error: Exception) -> bool:
+        """Indica si el error corresponde a un 404 de Google Drive."""
+        return (
+            isinstance(error, HttpError)
+            and getattr(error.resp, "status", None) == 404
+        )
+
+    def _invalidate_shared_drive_id(self, drive_id: Optional[str]) -> None:
+        """Descarta un Shared Drive cacheado cuyo ID ya no existe."""
+        if not drive_id:
+            return
+        removed = self._shared_drive_cache.invalidate_where(
+            lambda _key, cached_id: cached_id == drive_id
+        )
+        if removed:
+            logger.warning(
+                "Shared Drive cacheado drive_id=%s respondio 404; se invalida el cache",
+                drive_id,
+            )
 
     @staticmethod
     def _normalize_name(value: str) -> str:
         """Normaliza texto para comparaciones case-insensitive y sin tildes."""
-        normalized = unicodedata.normalize("NFD", value or "")
-        without_accents = "".join(
-            ch for ch in normalized if unicodedata.category(ch) != "Mn"
-        )
-        collapsed_spaces = " ".join(without_accents.strip().split())
-        return collapsed_spaces.casefold()
+        return normalize_name(value)
 
     def _normalize_base_folder_label(self, value: str) -> str:
         """Normaliza etiqueta base ignorando prefijos numericos (01, 02, ...)."""
-        normalized = self._normalize_name(value)
-        return NUMERIC_PREFIX_PATTERN.sub("", normalized)
+        return normalize_base_folder_label(value)
 
     def _match_folder_name(
         self,
@@ -59,75 +362,199 @@ class DriveService:
             )
         return self._normalize_name(actual_name) == self._normalize_name(expected_name)
 
-    def get_service(self):
-        """Obtiene un cliente autenticado de Google Drive API."""
+    def get_credentials(self) -> Credentials:
+        """Obtiene credenciales OAuth validas, compartidas entre clientes."""
+        return self.credential_manager.get()
+
+    def start_credentials_refresher(self) -> None:
+        """Inicia el refresco proactivo del token OAuth en segundo plano."""
+        self.credential_manager.start()
+
+    def stop_credentials_refresher(self) -> None:
+        """Detiene el refresco proactivo del token OAuth."""
+        self.credential_manager.stop(timeout=5)
+
+    def _build_client(self):
+        """Construye un cliente Drive con su propia conexion httplib2."""
+        authorized_http = AuthorizedHttp(self.get_credentials(), http=httplib2.Http())
+        return build("drive", "v3", http=authorized_http, cache_discovery=False)
+
+    def _get_client_pool(self) -> "queue.Queue":
+        """Inicializa una sola vez el pool de clientes autorizados."""
+        if self._client_pool is not None:
+            return self._client_pool
+
+        with self._init_lock:
+            if self._client_pool is None:
+                client_pool: "queue.Queue" = queue.Queue(maxsize=self.pool_size)
+                for _ in range(self.pool_size):
+                    client_pool.put(self._build_client())
+                self._client_pool = client_pool
+                logger.info("Pool de clientes Google Drive inicializado size=%s", self.pool_size)
+        return self._client_pool
+
+    @contextmanager
+    def _checkout_service(self) -> Iterator:
+        """
+        Reserva un cliente Drive para el thread actual mientras dura el bloque.
+
+        Es reentrante: llamadas anidadas del mismo thread reutilizan el cliente
+        ya reservado para no agotar el pool. La espera por un cliente libre se
+        acota al presupuesto del request (ClientPoolTimeout si se agota).
+        """
         if self.service is not None:
-            return self.service
+            yield self.service
+            return
 
-        creds = None
+        held_client = getattr(self._checkout_local, "client", None)
+        if held_client is not None:
+            yield held_client
+            return
 
-        if os.path.exists(self.token_file):
-            creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
+        client_pool = self._get_client_pool()
+        started_at = time.perf_counter()
+        timeout = remaining_budget()
+        try:
+            client = client_pool.get(timeout=None if timeout is None else max(timeout, 0.0))
+        except queue.Empty:
+            raise ClientPoolTimeout(
+                f"No hubo cliente Drive libre en el pool (size={self.pool_size}) "
+                "dentro del tiempo disponible del request"
+            ) from None
+        waited = time.perf_counter() - started_at
+        with self._pool_stats_lock:
+            self._pool_checkouts += 1
+            self._pool_wait_seconds += waited
+            self._pool_max_wait_seconds = max(self._pool_max_wait_seconds, waited)
 
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.client_secret_file,
-                    SCOPES,
-                )
-                creds = flow.run_local_server(port=0)
+        self._checkout_local.client = client
+        try:
+            yield client
+        finally:
+            self._checkout_local.client = None
+            client_pool.put(client)
+
+    def _execute_drive_call(self, build_request, operation: str = DRIVE_FILES_LIST):
+        """Reserva un cliente, arma la request con build_request y la ejecuta."""
+        with self._checkout_service() as service:
+            return self._execute_with_retry(build_request(service), operation=operation)
 
-            with open(self.token_file, "w", encoding="utf-8") as token:
-                token.write(creds.to_json())
+    @staticmethod
+    def _is_drive_outage(error: Exception) -> bool:
+        """Errores que cuentan como falla de Drive para el circuit breaker."""
+        return not isinstance(error, RateLimitTimeout) and is_retryable_error(error)
+
+    def drive_available(self) -> bool:
+        """Indica si los circuitos de listados de Drive aceptan llamadas."""
+        return not (
+            self.circuit_breakers.is_open(DRIVE_FILES_LIST)
+            or self.circuit_breakers.is_open(DRIVE_DRIVES_LIST)
+        )
 
-        self.service = build("drive", "v3", credentials=creds, cache_discovery=False)
-        return self.service
+    def circuit_breaker_states(self) -> Dict[str, Dict[str, object]]:
+        """Estado de los circuit breakers de Drive."""
+        return self.circuit_breakers.snapshot()
+
+    def pool_stats(self) -> Dict[str, float]:
+        """Retorna metricas del pool de clientes Drive."""
+        available = self._client_pool.qsize() if self._client_pool is not None else 0
+        with self._pool_stats_lock:
+            return {
+                "size": self.pool_size,
+                "available": available,
+                "checkouts": self._pool_checkouts,
+                "wait_seconds_total": round(self._pool_wait_seconds, 6),
+                "wait_seconds_max": round(self._pool_max_wait_seconds, 6),
+            }
 
-    def _execute_with_retry(self, request, max_retries: int = 5):
-        """Ejecuta una request con backoff para errores transitorios."""
-        for attempt in range(max_retries):
+    def _execute_with_retry(
+        self,
+        request,
+        max_retries: Optional[int] = None,
+        operation: str = DRIVE_FILES_LIST,
+    ):
+        """
+        Ejecuta una request con backoff para errores transitorios.
+
+        Con el circuito de operation abierto falla de inmediato; agotar los
+        reintentos cuenta como una falla del circuito. La llamada y sus
+        reintentos se contabilizan en las metricas del request.
+        """
+        attempts: List[None] = []
+
+        def attempt():
+            # Cada intento consume cupo: los reintentos tambien cuentan en la cuota.
+            self.rate_limiter.acquire(timeout=remaining_budget())
             try:
                 return request.execute()
-            except HttpError as error:
-                status = getattr(error.resp, "status", None)
-                if status in [429, 500, 503] and attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    logger.warning(
-                        "Google Drive API status %s. Reintentando en %ss (intento %s/%s)",
-                        status,
-                        wait_time,
-                        attempt + 1,
-                        max_retries,
-                    )
-                    time.sleep(wait_time)
-                    continue
-                raise
-            except Exception as error:
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    logger.warning(
-                        "Google Drive API error transitorio: %s. Reintentando en %ss "
-                        "(intento %s/%s)",
-                        error,
-                        wait_time,
-                        attempt + 1,
-                        max_retries,
-                    )
-                    time.sleep(wait_time)
-                    continue
-                raise
+            finally:
+                attempts.append(None)
+
+        with track_call(operation) as tracker:
+            try:
+                return self.circuit_breakers.get(operation).call(
+                    lambda: execute_with_retry(attempt, self._retry_policy(max_retries)),
+                    is_failure=self._is_drive_outage,
+                )
+            finally:
+                tracker.retries = max(len(attempts) - 1, 0)
+
+    def rate_limit_stats(self) -> Dict[str, float]:
+        """Retorna saldo de tokens y esperas del rate limiter de Drive."""
+        return self.rate_limiter.stats()
+
+    def _retry_policy(self, max_retries: Optional[int] = None) -> RetryPolicy:
+        """Retorna la politica de reintentos, opcionalmente con otro maximo."""
+        if max_retries is None:
+            return self.retry_policy
+        return replace(self.retry_policy, max_attempts=max_retries)
+
+    def new_batch(self) -> DriveBatch:
+        """Crea un batch de requests independientes con API de Futures."""
+        return DriveBatch(
+            self._checkout_service,
+            self._execute_with_retry,
+            retry_policy=self.retry_policy,
+            rate_limiter=self.rate_limiter,
+            circuit_breaker=self.circuit_breakers.get(DRIVE_FILES_LIST),
+        )
+
+    def _coalesce(self, key: Tuple, call, fallback):
+        """
+        Ejecuta call via single-flight; fallback si la espera excede el presupuesto.
+
+        fallback es el mismo resultado degradado que call retorna ante un error
+        de Drive (None o un listado incompleto).
+        """
+        try:
+            return self._single_flight.do(key, call)
+        except SingleFlightTimeout as error:
+            logger.warning("%s", error)
+            return fallback
 
     def find_shared_drive_by_name(self, drive_name: str) -> Optional[str]:
-        """Busca un Shared Drive por nombre y retorna su ID."""
-        service = self.get_service()
+        """Busca un Shared Drive por nombre y retorna su ID (cacheado con TTL)."""
+        cache_key = self._normalize_name(drive_name)
+        cached_id = self._shared_drive_cache.get(cache_key)
+        if cached_id:
+            record_cache_hit(DRIVE_DRIVES_LIST)
+            return cached_id
+
+        return self._coalesce(
+            ("shared_drive", cache_key),
+            lambda: self._fetch_shared_drive_id(drive_name, cache_key),
+            None,
+        )
+
+    def _fetch_shared_drive_id(self, drive_name: str, cache_key: str) -> Optional[str]:
+        """Recorre drives().list buscando drive_name y cachea el ID encontrado."""
         page_token = None
 
         while True:
             try:
-                results = self._execute_with_retry(
-                    service.drives().list(pageSize=100, pageToken=page_token)
+                results = self._execute_drive_call(
+                    lambda service: service.drives().list(pageSize=100, pageToken=page_token),
+                    operation=DRIVE_DRIVES_LIST,
                 )
             except Exception as error:
                 logger.error("Error buscando Shared Drive '%s': %s", drive_name, error)
@@ -135,7 +562,10 @@ class DriveService:
 
             for drive in results.get("drives", []):
                 if self._match_folder_name(drive.get("name", ""), drive_name):
-                    return drive.get("id")
+                    drive_id = drive.get("id")
+                    if drive_id:
+                        self._shared_drive_cache.set(cache_key, drive_id)
+                    return drive_id
 
             page_token = results.get("nextPageToken")
             if not page_token:
@@ -143,60 +573,331 @@ class DriveService:
 
         return None
 
+    @staticmethod
+    def _folder_list_params(
+        parent_id: str,
+        drive_id: Optional[str],
+        page_token: Optional[str],
+    ) -> Dict[str, object]:
+        """Arma los parametros de files().list para las subcarpetas de parent_id."""
+        params = {
+            "q": (
+                f"mimeType = '{FOLDER_MIME_TYPE}' and "
+                f"'{parent_id}' in parents and trashed = false"
+            ),
+            "spaces": "drive",
+            "fields": "nextPageToken, files(id, name, parents)",
+            "pageToken": page_token,
+            "pageSize": 100,
+            "orderBy": "name",
+            "supportsAllDrives": True,
+            "includeItemsFromAllDrives": True,
+        }
+
+        if drive_id:
+            params["driveId"] = drive_id
+            params["corpora"] = "drive"
+        return params
+
     def list_folders_in_directory(
         self,
         parent_id: str,
         drive_id: Optional[str] = None,
-        max_results: int = 1000,
+        max_results: Optional[int] = 1000,
+        force_refresh: bool = False,
     ) -> List[Tuple[str, str]]:
-        """Lista carpetas dentro de un directorio."""
-        service = self.get_service()
+        """
+        Lista carpetas dentro de un directorio.
+
+        El listado completo se cachea entre requests por (drive_id, parent_id);
+        force_refresh=True ignora el cache y lo reemplaza con la respuesta nueva.
+        max_results=None lista sin tope.
+        """
+        index = self._list_folder_index(parent_id, drive_id, max_results, force_refresh)
+        return index.folders[:max_results]
+
+    def get_folder_index(self, parent_id: str, drive_id: Optional[str] = None) -> FolderIndex:
+        """
+        Retorna el listado del directorio como FolderIndex.
+
+        Lista via list_folders_in_directory y reutiliza el indice guardado junto
+        al listado cacheado, cuyas claves normalizadas ya estan calculadas. Lista
+        sin tope: un listado truncado no se cachea y ocultaria carpetas.
+        """
+        folders = self.list_folders_in_directory(parent_id, drive_id, None)
+        return self._cached_folder_index(drive_id, parent_id, folders)
+
+    def _cached_folder_index(
+        self,
+        drive_id: Optional[str],
+        parent_id: str,
+        folders: List[Tuple[str, str]],
+    ) -> FolderIndex:
+        """
+        Indice guardado con el listado cacheado, o uno nuevo si no se cacheo.
+
+        Los listados completos siempre se cachean, asi que uno sin cache se
+        marca incompleto (fallo o quedo truncado).
+        """
+        index = self._folder_cache.peek((drive_id, parent_id))
+        return index if index is not None else FolderIndex(folders, complete=False)
+
+    def _listing_complete(self, drive_id: Optional[str], parent_id: str) -> bool:
+        """True si el directorio tiene un listado completo en cache."""
+        index = self._folder_cache.peek((drive_id, parent_id))
+        return index is not None and index.complete
+
+    def _list_folder_index(
+        self,
+        parent_id: str,
+        drive_id: Optional[str] = None,
+        max_results: Optional[int] = 1000,
+        force_refresh: bool = False,
+    ) -> FolderIndex:
+        """Retorna el FolderIndex cacheado del directorio, listandolo si falta."""
+        cache_key = (drive_id, parent_id)
+        if not force_refresh:
+            cached_index = self._folder_cache.get(cache_key)
+            if cached_index is not None:
+                record_cache_hit(DRIVE_FILES_LIST)
+                return cached_index
+
+        return self._coalesce(
+            ("listing", drive_id, parent_id, max_results),
+            lambda: self._fetch_folder_index(parent_id, drive_id, max_results),
+            FolderIndex([], complete=False),
+        )
+
+    def _fetch_folder_index(
+        self,
+        parent_id: str,
+        drive_id: Optional[str],
+        max_results: Optional[int],
+    ) -> FolderIndex:
+        """Lista el directorio en Drive y cachea el listado si quedo completo."""
+        generation = self._changes_generation
         folders: List[Tuple[str, str]] = []
         page_token = None
 
-        if drive_id and parent_id == drive_id:
-            query = (
-                "mimeType = 'application/vnd.google-apps.folder' and "
-                f"'{drive_id}' in parents and trashed = false"
-            )
-        else:
-            query = (
-                "mimeType = 'application/vnd.google-apps.folder' and "
-                f"'{parent_id}' in parents and trashed = false"
-            )
-
         while True:
-            params = {
-                "q": query,
-                "spaces": "drive",
-                "fields": "nextPageToken, files(id, name, parents)",
-                "pageToken": page_token,
-                "pageSize": 100,
-                "orderBy": "name",
-                "supportsAllDrives": True,
-                "includeItemsFromAllDrives": True,
-            }
-
-            if drive_id:
-                params["driveId"] = drive_id
-                params["corpora"] = "drive"
+            params = self._folder_list_params(parent_id, drive_id, page_token)
 
             try:
-                results = self._execute_with_retry(service.files().list(**params))
+                results = self._execute_drive_call(
+                    lambda service: service.files().list(**params)
+                )
             except Exception as error:
+                if self._is_not_found_error(error):
+                    self._handle_not_found(drive_id, [parent_id])
                 logger.error("Error listando carpetas en parent_id=%s: %s", parent_id, error)
-                return folders
+                return FolderIndex(folders, complete=False)
 
             for item in results.get("files", []):
                 folders.append((item["name"], item["id"]))
-                if len(folders) >= max_results:
-                    return folders
+                if max_results is not None and len(folders) >= max_results:
+                    # Listado truncado: no se cachea para no ocultar carpetas.
+                    return FolderIndex(folders, complete=False)
 
             page_token = results.get("nextPageToken")
             if not page_token:
                 break
 
-        return folders
+        return self._store_folder_listing(drive_id, parent_id, folders, generation)
+
+    def list_folders_in_directories(
+        self,
+        parent_ids: Iterable[str],
+        drive_id: Optional[str] = None,
+    ) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Lista subcarpetas de varios directorios con consultas agrupadas.
+
+        Usa el cache de listados cuando existe y, para los padres faltantes,
+        emite un files().list por bloque con clausulas OR "'<id>' in parents".
+        Los bloques se envian juntos en un batch, asi cada nivel del arbol
+        cuesta un solo round trip. Los listados completos quedan cacheados.
+        """
+        return {
+            parent_id: list(index.folders)
+            for parent_id, index in self._list_folder_indexes(parent_ids, drive_id).items()
+        }
+
+    def get_folder_indexes(
+        self,
+        parent_ids: Iterable[str],
+        drive_id: Optional[str] = None,
+    ) -> Dict[str, FolderIndex]:
+        """Variante de get_folder_index para varios directorios (consultas agrupadas)."""
+        listings = self.list_folders_in_directories(parent_ids, drive_id)
+        return {
+            parent_id: self._cached_folder_index(drive_id, parent_id, folders)
+            for parent_id, folders in listings.items()
+        }
+
+    def _list_folder_indexes(
+        self,
+        parent_ids: Iterable[str],
+        drive_id: Optional[str] = None,
+    ) -> Dict[str, FolderIndex]:
+        """Lista varios directorios y retorna sus FolderIndex (cacheados o nuevos)."""
+        listings: Dict[str, FolderIndex] = {}
+        pending: List[str] = []
+        for parent_id in dict.fromkeys(parent_ids):
+            cached_index = self._folder_cache.get((drive_id, parent_id))
+            if cached_index is not None:
+                record_cache_hit(DRIVE_FILES_LIST)
+                listings[parent_id] = cached_index
+            else:
+                pending.append(parent_id)
+
+        if not pending:
+            return listings
+
+        generation = self._changes_generation
+        # Estado por bloque de padres: query, pageToken siguiente y listados parciales.
+        chunks = []
+        for start in range(0, len(pending), MULTI_PARENT_QUERY_CHUNK_SIZE):
+            chunk = pending[start:start + MULTI_PARENT_QUERY_CHUNK_SIZE]
+            parents_clause = " or ".join(f"'{parent_id}' in parents" for parent_id in chunk)
+            chunks.append(
+                {
+                    "query": (
+                        f"mimeType = '{FOLDER_MIME_TYPE}' and trashed = false and "
+                        f"({parents_clause})"
+                    ),
+                    "page_token": None,
+                    "complete": True,
+                    "listings": {parent_id: [] for parent_id in chunk},
+                }
+            )
+
+        # Cada ronda envia la pagina siguiente de todos los bloques en un solo batch.
+        active = list(chunks)
+        while active:
+            batch = self.new_batch()
+            futures = []
+            # El cliente solo arma las requests; el batch reserva uno por envio.
+            try:
+                with self._checkout_service() as service:
+                    for chunk_state in active:
+                        params = {
+                            "q": chunk_state["query"],
+                            "spaces": "drive",
+                            "fields": "nextPageToken, files(id, name, parents)",
+                            "pageToken": chunk_state["page_token"],
+                            "pageSize": 1000,
+                            "orderBy": "name",
+                            "supportsAllDrives": True,
+                            "includeItemsFromAllDrives": True,
+                        }
+
+                        if drive_id:
+                            params["driveId"] = drive_id
+                            params["corpora"] = "drive"
+
+                        request = service.files().list(**params)
+                        futures.append((chunk_state, batch.add(request)))
+            except ClientPoolTimeout as error:
+                logger.error(
+                    "Error listando carpetas en %s bloques de parent_ids: %s",
+                    len(active),
+                    error,
+                )
+                for chunk_state in active:
+                    chunk_state["complete"] = False
+                break
+            batch.execute()
+
+            active = []
+            for chunk_state, future in futures:
+                try:
+                    results = future.result()
+                except Exception as error:
+                    if self._is_not_found_error(error):
+                        self._handle_not_found(drive_id, chunk_state["listings"].keys())
+                    logger.error(
+                        "Error listando carpetas en %s parent_ids: %s",
+                        len(chunk_state["listings"]),
+                        error,
+                    )
+                    chunk_state["complete"] = False
+                    continue
+
+                chunk_listings = chunk_state["listings"]
+                for item in results.get("files", []):
+                    for item_parent in item.get("parents", []):
+                        if item_parent in chunk_listings:
+                            chunk_listings[item_parent].append((item["name"], item["id"]))
+
+                chunk_state["page_token"] = results.get("nextPageToken")
+                if chunk_state["page_token"]:
+                    active.append(chunk_state)
+
+        for chunk_state in chunks:
+            for parent_id, folders in chunk_state["listings"].items():
+                if chunk_state["complete"]:
+                    listings[parent_id] = self._store_folder_listing(
+                        drive_id,
+                        parent_id,
+                        folders,
+                        generation,
+                    )
+                else:
+                    listings[parent_id] = FolderIndex(folders, complete=False)
+
+        return listings
+
+    def resolve_empresa_folders(
+        self,
+        empresas: Iterable[str],
+        id_carpeta_proyecto: str,
+        drive_id: str,
+    ) -> Dict[str, Optional[str]]:
+        """
+        Resuelve Externos/<empresa>/01 Empresa para varias empresas a la vez.
+
+        Recorre el arbol por nivel: un listado de Externos para todas las
+        empresas y una consulta multi-padre para todas las carpetas 01 Empresa.
+        Retorna un dict empresa -> folder_id (None si no se encontro).
+        """
+        nombres = list(dict.fromkeys(empresas))
+        resultado: Dict[str, Optional[str]] = {nombre: None for nombre in nombres}
+        if not nombres:
+            return resultado
+
+        carpeta_externos_id = self.find_folder_exact_or_contains(
+            EXTERNOS_FOLDER_NAME,
+            id_carpeta_proyecto,
+            drive_id,
+        )
+        if not carpeta_externos_id:
+            logger.warning(
+                "No se encontro carpeta '%s' dentro de parent_id=%s",
+                EXTERNOS_FOLDER_NAME,
+                id_carpeta_proyecto,
+            )
+            return resultado
+
+        externos_index = self.get_folder_index(carpeta_externos_id, drive_id)
+        carpetas_empresa: Dict[str, str] = {}
+        for nombre in nombres:
+            carpeta_empresa_id = externos_index.find(nombre)
+            if carpeta_empresa_id:
+                carpetas_empresa[nombre] = carpeta_empresa_id
+            else:
+                logger.warning(
+                    "No se encontro carpeta de contratista '%s' en Externos parent_id=%s",
+                    nombre,
+                    carpeta_externos_id,
+                )
+
+        indexes = self.get_folder_indexes(carpetas_empresa.values(), drive_id)
+        for nombre, carpeta_empresa_id in carpetas_empresa.items():
+            resultado[nombre] = indexes[carpeta_empresa_id].find(
+                EMPRESA_FOLDER_NAME,
+                ignore_numeric_prefix=True,
+            )
+        return resultado
 
     def find_folder_by_name_in_directory(
         self,
@@ -206,7 +907,25 @@ class DriveService:
         ignore_numeric_prefix: bool = False,
     ) -> Optional[str]:
         """Busca una carpeta por nombre exacto dentro de un directorio."""
-        service = self.get_service()
+        return self._coalesce(
+            ("name", drive_id, parent_id, folder_name, ignore_numeric_prefix),
+            lambda: self._query_folder_by_name(
+                folder_name,
+                parent_id,
+                drive_id,
+                ignore_numeric_prefix,
+            ),
+            None,
+        )
+
+    def _query_folder_by_name(
+        self,
+        folder_name: str,
+        parent_id: str,
+        drive_id: Optional[str],
+        ignore_numeric_prefix: bool,
+    ) -> Optional[str]:
+        """Consulta en Drive una carpeta por nombre exacto (files().list con name =)."""
         escaped_name = folder_name.replace("'", "\\'")
 
         if drive_id and parent_id == drive_id:
@@ -239,8 +958,12 @@ class DriveService:
                 params["corpora"] = "drive"
 
             try:
-                results = self._execute_with_retry(service.files().list(**params))
+                results = self._execute_drive_call(
+                    lambda service: service.files().list(**params)
+                )
             except Exception as error:
+                if self._is_not_found_error(error):
+                    self._handle_not_found(drive_id, [parent_id])
                 logger.error(
                     "Error buscando carpeta '%s' en parent_id=%s: %s",
                     folder_name,
@@ -269,17 +992,13 @@ class DriveService:
         parent_id: str,
         drive_id: Optional[str] = None,
         ignore_numeric_prefix: bool = False,
+        force_refresh: bool = False,
     ) -> Optional[str]:
         """Busca carpeta por normalizacion (sin tildes, case-insensitive)."""
-        folders = self.list_folders_in_directory(parent_id, drive_id)
-        for name, folder_id in folders:
-            if self._match_folder_name(
-                name,
-                folder_name,
-                ignore_numeric_prefix=ignore_numeric_prefix,
-            ):
-                return folder_id
-        return None
+        if force_refresh:
+            self.invalidate_folder_listing(parent_id, drive_id)
+        index = self.get_folder_index(parent_id, drive_id)
+        return index.find_normalized(folder_name, ignore_numeric_prefix)
 
     def find_folder_containing_name(
         self,
@@ -287,21 +1006,13 @@ class DriveService:
         parent_id: str,
         drive_id: Optional[str] = None,
         ignore_numeric_prefix: bool = False,
+        force_refresh: bool = False,
     ) -> Optional[str]:
         """Busca una carpeta por coincidencia parcial normalizada."""
-        folders = self.list_folders_in_directory(parent_id, drive_id)
-        if ignore_numeric_prefix:
-            search = self._normalize_base_folder_label(folder_name_part)
-        else:
-            search = self._normalize_name(folder_name_part)
-        for name, folder_id in folders:
-            if ignore_numeric_prefix:
-                candidate = self._normalize_base_folder_label(name)
-            else:
-                candidate = self._normalize_name(name)
-            if search in candidate:
-                return folder_id
-        return None
+        if force_refresh:
+            self.invalidate_folder_listing(parent_id, drive_id)
+        index = self.get_folder_index(parent_id, drive_id)
+        return index.find_containing(folder_name_part, ignore_numeric_prefix)
 
     def find_folder_exact_or_contains(
         self,
@@ -310,36 +1021,73 @@ class DriveService:
         drive_id: Optional[str] = None,
         ignore_numeric_prefix: bool = False,
     ) -> Optional[str]:
-        """Busca carpeta: exacto, luego normalizado y finalmente contains."""
-        exact_id = self.find_folder_by_name_in_directory(
-            folder_name,
-            parent_id,
-            drive_id,
-            ignore_numeric_prefix=ignore_numeric_prefix,
-        )
-        if exact_id:
-            return exact_id
+        """
+        Busca carpeta: exacto, luego normalizado y finalmente contains.
+
+        Usa un solo listado del directorio padre (cacheado) y resuelve las tres
+        prioridades contra el mismo indice en memoria.
+        """
+        index = self.get_folder_index(parent_id, drive_id)
+        return index.find(folder_name, ignore_numeric_prefix=ignore_numeric_prefix)
+
+    def warm_up(self, years: Optional[Iterable[str]] = None) -> Dict[str, object]:
+        """
+        Precalienta cliente, credenciales y caches de la jerarquia de Drive.
+
+        Resuelve el Shared Drive de Acreditaciones, la carpeta raiz y las
+        carpetas Proyectos <anio> (por defecto anio actual y anterior), dejando
+        en el cache los listados de proyectos de cada anio.
+        """
+        if years is None:
+            current_year = time.localtime().tm_year
+            years = [str(current_year), str(current_year - 1)]
+
+        summary: Dict[str, object] = {"drive_id": None, "proyectos": {}}
+        if self.service is None:
+            # Solo inicializa el pool: reservar un cliente durante todo el warm-up
+            # bloquearia a los threads que esperan el single-flight con pool chico.
+            self._get_client_pool()
+        drive_id = self.find_shared_drive_by_name(ACREDITACIONES_DRIVE_NAME)
+        if not drive_id:
+            logger.warning(
+                "Warm-up: no se encontro Shared Drive '%s'",
+                ACREDITACIONES_DRIVE_NAME,
+            )
+            return summary
+        summary["drive_id"] = drive_id
 
-        normalized_id = self.find_folder_by_normalized_name_in_directory(
-            folder_name,
-            parent_id,
+        root_id = self.find_folder_exact_or_contains(
+            ACREDITACIONES_ROOT_FOLDER_NAME,
+            drive_id,
             drive_id,
-            ignore_numeric_prefix=ignore_numeric_prefix,
         )
-        if normalized_id:
-            return normalized_id
+        if not root_id:
+            logger.warning(
+                "Warm-up: no se encontro carpeta '%s' en drive_id=%s",
+                ACREDITACIONES_ROOT_FOLDER_NAME,
+                drive_id,
+            )
+            return summary
 
-        return self.find_folder_containing_name(
-            folder_name,
-            parent_id,
+        proyectos_ids: Dict[str, Optional[str]] = {
+            year: self.find_folder_exact_or_contains(f"Proyectos {year}", root_id, drive_id)
+            for year in years
+        }
+        listings = self.list_folders_in_directories(
+            [folder_id for folder_id in proyectos_ids.values() if folder_id],
             drive_id,
-            ignore_numeric_prefix=ignore_numeric_prefix,
         )
+        summary["proyectos"] = {
+            year: len(listings.get(folder_id, [])) if folder_id else None
+            for year, folder_id in proyectos_ids.items()
+        }
 
-    def resolve_parent_drive_context(self, codigo_proyecto: str) -> Optional[Dict[str, str]]:
-        """
-        Resuelve contexto base desde el Shared Drive central de Acreditaciones.
-        """
+        logger.info("Warm-up de Drive completado: %s", summary)
+        return summary
+
+    @staticmethod
+    def _parse_project_year(codigo_proyecto: str) -> Optional[str]:
+        """Extrae el anio YYYY de un codigo MY-XXX-YYYY."""
         match = re.match(r"^MY-\d{3}-(\d{4})$", codigo_proyecto)
         if not match:
             logger.warning(
@@ -347,8 +1095,16 @@ class DriveService:
                 codigo_proyecto,
             )
             return None
+        return match.group(1)
+
+    def resolve_parent_drive_context(self, codigo_proyecto: str) -> Optional[Dict[str, str]]:
+        """
+        Resuelve contexto base desde el Shared Drive central de Acreditaciones.
+        """
+        year = self._parse_project_year(codigo_proyecto)
+        if not year:
+            return None
 
-        year = match.group(1)
         drive_name = ACREDITACIONES_DRIVE_NAME
         parent_drive_id = self.find_shared_drive_by_name(drive_name)
         if not parent_drive_id:
@@ -372,12 +1128,43 @@ class DriveService:
 
         Si se recibe parent_ctx, reutiliza ese contexto anual ya resuelto para evitar
         consultas duplicadas al resolver el Shared Drive de Acreditaciones.
+
+        El resultado se cachea entre requests por codigo_proyecto (TTL largo) y
+        los proyectos sin carpeta se cachean como negativos con TTL corto.
         """
         resolved_parent_ctx = parent_ctx or self.resolve_parent_drive_context(codigo_proyecto)
         if not resolved_parent_ctx:
             return None
 
         drive_id = resolved_parent_ctx["parent_drive_id"]
+        cache_key = (drive_id, codigo_proyecto)
+        cached_root = self._project_root_cache.get(cache_key)
+        if cached_root is not None:
+            record_cache_hit(DRIVE_PROJECT_ROOT)
+        if cached_root is PROJECT_ROOT_NOT_FOUND:
+            logger.info(
+                "Ruta de codigo_proyecto=%s cacheada como inexistente",
+                codigo_proyecto,
+            )
+            return None
+        if cached_root is not None:
+            return dict(cached_root)
+
+        project_root = self._coalesce(
+            ("acreditacion_root", drive_id, codigo_proyecto),
+            lambda: self._resolve_project_route(codigo_proyecto, resolved_parent_ctx),
+            None,
+        )
+        return dict(project_root) if project_root else None
+
+    def _resolve_project_route(
+        self,
+        codigo_proyecto: str,
+        resolved_parent_ctx: Dict[str, str],
+    ) -> Optional[Dict[str, str]]:
+        """Recorre la ruta del proyecto en Drive y cachea el resultado (o su ausencia)."""
+        drive_id = resolved_parent_ctx["parent_drive_id"]
+        cache_key = (drive_id, codigo_proyecto)
         year = resolved_parent_ctx["year"]
         drive_name = resolved_parent_ctx["drive_name"]
         current_parent = drive_id
@@ -406,13 +1193,25 @@ class DriveService:
                     current_parent,
                     drive_id,
                 )
+                if not self.drive_available() or not self._listing_complete(
+                    drive_id,
+                    current_parent,
+                ):
+                    # Con Drive caido o un listado fallido/truncado la ausencia
+                    # no es confiable: no se cachea.
+                    return None
+                self._project_root_cache.set(
+                    cache_key,
+                    PROJECT_ROOT_NOT_FOUND,
+                    ttl_seconds=settings.DRIVE_PROJECT_ROOT_NEGATIVE_TTL_SECONDS,
+                )
                 return None
             current_parent = folder_id
             resolved_ids.append(folder_id)
 
         carpeta_acreditaciones_id, carpeta_proyectos_anio_id, carpeta_proyecto_id = resolved_ids
 
-        return {
+        project_root = {
             "drive_id": drive_id,
             "id_carpeta_acreditaciones": carpeta_acreditaciones_id,
             "id_carpeta_proyectos_anio": carpeta_proyectos_anio_id,
@@ -423,6 +1222,9 @@ class DriveService:
             "year": year,
             "drive_name": drive_name,
         }
+        self._project_root_cache.set(cache_key, project_root)
+        return project_root
+
 
 drive_service = DriveService()
 
@@ -0,0 +1,177 @@
+"""Snapshot en disco (SQLite) del indice de carpetas Drive para arranques en frio."""
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.folder_index import normalize_name
+
+SNAPSHOT_SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS listings (
+    drive_id TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (drive_id, parent_id)
+);
+CREATE TABLE IF NOT EXISTS folders (
+    drive_id TEXT NOT NULL,
+    parent_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    folder_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    normalized_name TEXT NOT NULL,
+    PRIMARY KEY (drive_id, parent_id, position)
+);
+CREATE TABLE IF NOT EXISTS shared_drives (
+    name_key TEXT PRIMARY KEY,
+    drive_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS change_cursors (
+    drive_id TEXT PRIMARY KEY,
+    page_token TEXT NOT NULL
+);
+"""
+
+# (drive_id, parent_id, [(name, folder_id), ...], segundos de TTL restantes)
+SnapshotListing = Tuple[Optional[str], str, List[Tuple[str, str]], float]
+
+
+@dataclass
+class FolderSnapshot:
+    """Contenido vigente de un snapshot leido desde disco."""
+
+    saved_at: float
+    listings: List[SnapshotListing] = field(default_factory=list)
+    shared_drives: List[Tuple[str, str, float]] = field(default_factory=list)
+    page_tokens: Dict[str, str] = field(default_factory=dict)
+
+
+class FolderSnapshotStore:
+    """
+    Persiste listados de carpetas (id, nombre, nombre normalizado, padre) en SQLite.
+
+    Los vencimientos se guardan en tiempo de reloj (time.time) para que el TTL
+    restante siga siendo valido tras reiniciar el proceso. Cada escritura
+    reemplaza el snapshot completo en una transaccion, asi varios workers pueden
+    compartir el archivo sin leer estados a medio escribir.
+    """
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+        self._clock = clock
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def save(
+        self,
+        listings: Iterable[SnapshotListing],
+        shared_drives: Iterable[Tuple[str, str, float]] = (),
+        page_tokens: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """Reemplaza el snapshot y retorna la cantidad de listados guardados."""
+        now = self._clock()
+        listing_rows = []
+        folder_rows = []
+        for drive_id, parent_id, folders, ttl_remaining in listings:
+            drive_key = drive_id or ""
+            listing_rows.append((drive_key, parent_id, now + ttl_remaining))
+            folder_rows.extend(
+                (drive_key, parent_id, position, folder_id, name, normalize_name(name))
+                for position, (name, folder_id) in enumerate(folders)
+            )
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM listings")
+                connection.execute("DELETE FROM folders")
+                connection.execute("DELETE FROM shared_drives")
+                connection.execute("DELETE FROM change_cursors")
+                connection.execute("DELETE FROM meta")
+                connection.executemany("INSERT INTO listings VALUES (?, ?, ?)", listing_rows)
+                connection.executemany(
+                    "INSERT INTO folders VALUES (?, ?, ?, ?, ?, ?)",
+                    folder_rows,
+                )
+                connection.executemany(
+                    "INSERT INTO shared_drives VALUES (?, ?, ?)",
+                    [
+                        (name_key, drive_id, now + ttl_remaining)
+                        for name_key, drive_id, ttl_remaining in shared_drives
+                    ],
+                )
+                connection.executemany(
+                    "INSERT INTO change_cursors VALUES (?, ?)",
+                    list((page_tokens or {}).items()),
+                )
+                connection.executemany(
+                    "INSERT INTO meta VALUES (?, ?)",
+                    [("schema_version", SNAPSHOT_SCHEMA_VERSION), ("saved_at", str(now))],
+                )
+        finally:
+            connection.close()
+        return len(listing_rows)
+
+    def load(self) -> Optional[FolderSnapshot]:
+        """Lee las entradas no vencidas; retorna None si no hay snapshot compatible."""
+        if not os.path.exists(self.path):
+            return None
+
+        connection = self._connect()
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+            if meta.get("schema_version") != SNAPSHOT_SCHEMA_VERSION:
+                return None
+
+            now = self._clock()
+            snapshot = FolderSnapshot(saved_at=float(meta.get("saved_at", 0)))
+            children: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+            for drive_key, parent_id, folder_id, name in connection.execute(
+                "SELECT drive_id, parent_id, folder_id, name FROM folders "
+                "ORDER BY drive_id, parent_id, position"
+            ):
+                children.setdefault((drive_key, parent_id), []).append((name, folder_id))
+
+            for drive_key, parent_id, expires_at in connection.execute(
+                "SELECT drive_id, parent_id, expires_at FROM listings "
+                "WHERE expires_at > ? ORDER BY rowid",
+                (now,),
+            ):
+                snapshot.listings.append(
+                    (
+                        drive_key or None,
+                        parent_id,
+                        children.get((drive_key, parent_id), []),
+                        expires_at - now,
+                    )
+                )
+
+            snapshot.shared_drives = [
+                (name_key, drive_id, expires_at - now)
+                for name_key, drive_id, expires_at in connection.execute(
+                    "SELECT name_key, drive_id, expires_at FROM shared_drives "
+                    "WHERE expires_at > ?",
+                    (now,),
+                )
+            ]
+            snapshot.page_tokens = dict(
+                connection.execute("SELECT drive_id, page_token FROM change_cursors")
+            )
+            return snapshot
+        finally:
+            connection.close()
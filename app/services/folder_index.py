@@ -0,0 +1,156 @@
+"""Normalizacion de nombres e indice en memoria para listados de carpetas Drive."""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+NUMERIC_PREFIX_PATTERN = re.compile(r"^\s*\d+\s*[-_.]?\s*")
+# Nombres distintos memoizados por proceso; acota memoria ante listados grandes.
+NORMALIZE_CACHE_MAX_ENTRIES = 8192
+# Largo de los n-gramas del indice de substrings; textos mas cortos se recorren.
+NGRAM_SIZE = 3
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_MAX_ENTRIES)
+def normalize_name(value: str) -> str:
+    """Normaliza texto para comparaciones case-insensitive y sin tildes."""
+    normalized = unicodedata.normalize("NFD", value or "")
+    without_accents = "".join(
+        ch for ch in normalized if unicodedata.category(ch) != "Mn"
+    )
+    collapsed_spaces = " ".join(without_accents.strip().split())
+    return collapsed_spaces.casefold()
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_MAX_ENTRIES)
+def normalize_base_folder_label(value: str) -> str:
+    """Normaliza etiqueta base ignorando prefijos numericos (01, 02, ...)."""
+    return NUMERIC_PREFIX_PATTERN.sub("", normalize_name(value))
+
+
+def _ngrams(value: str) -> Set[str]:
+    """Retorna los n-gramas distintos de value."""
+    return {value[start:start + NGRAM_SIZE] for start in range(len(value) - NGRAM_SIZE + 1)}
+
+
+def build_ngram_index(candidates: List[str]) -> Dict[str, List[int]]:
+    """Mapea cada trigrama a las posiciones (ascendentes) de los candidatos que lo contienen."""
+    index: Dict[str, List[int]] = {}
+    for position, candidate in enumerate(candidates):
+        for gram in _ngrams(candidate):
+            index.setdefault(gram, []).append(position)
+    return index
+
+
+class FolderIndex:
+    """
+    Indice de un listado de carpetas para resolver nombres sin volver a Drive.
+
+    Conserva el orden del listado (orderBy=name) para que todas las busquedas
+    retornen la primera coincidencia, igual que el recorrido lineal original.
+    Las claves normalizadas se calculan una vez al construir el indice, que es
+    lo que se guarda en el cache de listados. El indice de trigramas para
+    busquedas "contains" se arma en la primera busqueda de ese tipo.
+
+    complete=False marca listados truncados o cortados por un error: que un
+    nombre no aparezca en ellos no prueba que la carpeta no exista.
+    """
+
+    def __init__(self, folders: Iterable[Tuple[str, str]], complete: bool = True):
+        self.folders: List[Tuple[str, str]] = list(folders)
+        self.complete = complete
+        self.normalized_names: List[str] = []
+        self.base_labels: List[str] = []
+        self._by_name: Dict[str, str] = {}
+        self._by_normalized: Dict[str, str] = {}
+        self._by_base: Dict[str, str] = {}
+        self.folder_ids = frozenset(folder_id for _name, folder_id in self.folders)
+        self._ngrams_by_normalized: Optional[Dict[str, List[int]]] = None
+        self._ngrams_by_base: Optional[Dict[str, List[int]]] = None
+
+        for name, folder_id in self.folders:
+            normalized = normalize_name(name)
+            base_label = NUMERIC_PREFIX_PATTERN.sub("", normalized)
+            self.normalized_names.append(normalized)
+            self.base_labels.append(base_label)
+            self._by_name.setdefault(name, folder_id)
+            self._by_normalized.setdefault(normalized, folder_id)
+            self._by_base.setdefault(base_label, folder_id)
+
+    def __len__(self) -> int:
+        return len(self.folders)
+
+    def find_exact(self, folder_name: str) -> Optional[str]:
+        """Retorna la primera carpeta cuyo nombre coincide literalmente."""
+        return self._by_name.get(folder_name)
+
+    def find_normalized(
+        self,
+        folder_name: str,
+        ignore_numeric_prefix: bool = False,
+    ) -> Optional[str]:
+        """Retorna la primera carpeta con el mismo nombre normalizado."""
+        if ignore_numeric_prefix:
+            return self._by_base.get(normalize_base_folder_label(folder_name))
+        return self._by_normalized.get(normalize_name(folder_name))
+
+    def find_containing(
+        self,
+        folder_name_part: str,
+        ignore_numeric_prefix: bool = False,
+    ) -> Optional[str]:
+        """Retorna la primera carpeta cuyo nombre normalizado contiene el texto."""
+        if ignore_numeric_prefix:
+            search = normalize_base_folder_label(folder_name_part)
+            candidates = self.base_labels
+        else:
+            search = normalize_name(folder_name_part)
+            candidates = self.normalized_names
+
+        if len(search) < NGRAM_SIZE:
+            for position, candidate in enumerate(candidates):
+                if search in candidate:
+                    return self.folders[position][1]
+            return None
+
+        for position in self._candidate_positions(search, ignore_numeric_prefix):
+            if search in candidates[position]:
+                return self.folders[position][1]
+        return None
+
+    def _candidate_positions(self, search: str, ignore_numeric_prefix: bool) -> List[int]:
+        """
+        Posiciones que contienen todos los trigramas de search, en orden del listado.
+
+        Es un filtro necesario pero no suficiente: el llamador confirma con "in".
+        """
+        if ignore_numeric_prefix:
+            if self._ngrams_by_base is None:
+                self._ngrams_by_base = build_ngram_index(self.base_labels)
+            ngram_index = self._ngrams_by_base
+        else:
+            if self._ngrams_by_normalized is None:
+                self._ngrams_by_normalized = build_ngram_index(self.normalized_names)
+            ngram_index = self._ngrams_by_normalized
+
+        postings = []
+        for gram in _ngrams(search):
+            positions = ngram_index.get(gram)
+            if not positions:
+                return []
+            postings.append(positions)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for positions in postings[1:]:
+            candidates.intersection_update(positions)
+            if not candidates:
+                return []
+        return sorted(candidates)
+
+    def find(self, folder_name: str, ignore_numeric_prefix: bool = False) -> Optional[str]:
+        """Resuelve con prioridad: exacto, normalizado y finalmente contains."""
+        return (
+            self.find_exact(folder_name)
+            or self.find_normalized(folder_name, ignore_numeric_prefix)
+            or self.find_containing(folder_name, ignore_numeric_prefix)
+        )
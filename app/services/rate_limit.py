@@ -0,0 +1,146 @@
+"""Rate limiter token bucket para las llamadas a Google Drive."""
+import json
+import logging
+import os
+import threading
+import time
+from types import ModuleType
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(RuntimeError):
+    """La espera por cupo excede el tiempo disponible del request."""
+
+
+class TokenBucket:
+    """
+    Token bucket con reserva: cada llamada descuenta sus tokens y espera lo necesario.
+
+    rate_per_second <= 0 desactiva el limite. El saldo puede quedar negativo
+    (reservas futuras), asi los callers concurrentes se ordenan sin reintentar.
+    Con state_file el saldo se guarda en un archivo protegido con flock y el
+    limite se comparte entre los workers que usan el mismo archivo. fcntl se
+    importa solo en ese caso; sin el (Windows) el limite queda en el proceso.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: float = 1.0,
+        state_file: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = max(burst, 1.0)
+        self.state_file = state_file or None
+        self._fcntl: Optional[ModuleType] = None
+        if self.state_file:
+            try:
+                import fcntl
+
+                self._fcntl = fcntl
+            except ImportError:
+                logger.warning(
+                    "flock no disponible; el rate limit de Drive no se comparte via %s",
+                    self.state_file,
+                )
+                self.state_file = None
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = clock()
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_second > 0
+
+    def _refill(self, tokens: float, updated_at: float, now: float) -> float:
+        """Saldo tras acumular tokens desde updated_at, acotado a burst."""
+        elapsed = max(now - updated_at, 0.0)
+        return min(self.burst, tokens + elapsed * self.rate_per_second)
+
+    def _update(self, delta: float) -> float:
+        """Aplica delta al saldo (negativo = consumo) y retorna el saldo resultante."""
+        with self._lock:
+            if self.state_file:
+                return self._update_shared(delta)
+            now = self._clock()
+            self._tokens = self._refill(self._tokens, self._updated_at, now) + delta
+            self._updated_at = now
+            return self._tokens
+
+    def _update_shared(self, delta: float) -> float:
+        """Como _update, pero leyendo y escribiendo el saldo en state_file."""
+        fcntl = self._fcntl
+        fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "r+", encoding="utf-8") as state:
+            fcntl.flock(state.fileno(), fcntl.LOCK_EX)
+            try:
+                now = self._clock()
+                tokens, updated_at = self._read_state(state.read(), now)
+                tokens = self._refill(tokens, updated_at, now) + delta
+                state.seek(0)
+                state.write(json.dumps({"tokens": tokens, "updated_at": now}))
+                state.truncate()
+                state.flush()
+                return tokens
+            finally:
+                fcntl.flock(state.fileno(), fcntl.LOCK_UN)
+
+    def _read_state(self, content: str, now: float) -> Tuple[float, float]:
+        """Parsea el estado compartido; un archivo nuevo o corrupto parte lleno."""
+        try:
+            data = json.loads(content)
+            return float(data["tokens"]), float(data["updated_at"])
+        except (TypeError, ValueError, KeyError):
+            return self.burst, now
+
+    def _reserve(self, tokens: float, timeout: Optional[float]) -> float:
+        """Reserva tokens y retorna cuantos segundos esperar antes de usarlos."""
+        balance = self._update(-tokens)
+        wait_seconds = max(-balance / self.rate_per_second, 0.0)
+        if timeout is not None and wait_seconds > timeout:
+            self._update(tokens)
+            raise RateLimitTimeout(
+                f"Rate limit de Drive: espera de {wait_seconds:.2f}s excede {timeout:.2f}s"
+            )
+        with self._lock:
+            self.acquired += 1
+            if wait_seconds > 0:
+                self.waits += 1
+                self.wait_seconds_total += wait_seconds
+                self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+        return wait_seconds
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> float:
+        """Bloquea hasta tener cupo para tokens llamadas; retorna los segundos esperados."""
+        if not self.enabled:
+            return 0.0
+        wait_seconds = self._reserve(tokens, timeout)
+        if wait_seconds > 0:
+            self._sleep(wait_seconds)
+        return wait_seconds
+
+    def stats(self) -> Dict[str, float]:
+        """Saldo actual de tokens y tiempo de espera acumulado de los callers."""
+        tokens = self._update(0.0) if self.enabled else self.burst
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "rate_per_second": self.rate_per_second,
+                "burst": self.burst,
+                "shared": self.state_file is not None,
+                "tokens": round(tokens, 3),
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
@@ -0,0 +1,138 @@
+"""Contabilidad por request de las llamadas a dependencias (Drive, Supabase)."""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+# Metricas del request en curso; None = fuera de un request (warm-up, watcher).
+_request_metrics: contextvars.ContextVar[Optional["RequestMetrics"]] = contextvars.ContextVar(
+    "request_metrics",
+    default=None,
+)
+
+
+@dataclass
+class OperationStats:
+    """Contadores acumulados de una operacion dentro del request."""
+
+    calls: int = 0
+    retries: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class CallTracker:
+    """Resultado de una llamada medida; el caller completa retries."""
+
+    retries: int = 0
+
+
+class RequestMetrics:
+    """Llamadas, reintentos, cache hits y latencia por operacion de un request."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._operations: Dict[str, OperationStats] = {}
+
+    def _stats(self, operation: str) -> OperationStats:
+        """Retorna los contadores de operation (lock tomado)."""
+        stats = self._operations.get(operation)
+        if stats is None:
+            stats = self._operations[operation] = OperationStats()
+        return stats
+
+    def record_call(
+        self,
+        operation: str,
+        seconds: float,
+        retries: int = 0,
+        error: bool = False,
+    ) -> None:
+        """Registra una llamada (con sus reintentos) y su latencia total."""
+        with self._lock:
+            stats = self._stats(operation)
+            stats.calls += 1
+            stats.retries += retries
+            stats.errors += int(error)
+            stats.seconds += seconds
+
+    def record_cache_hit(self, operation: str) -> None:
+        """Registra una consulta resuelta desde cache sin llamar a la dependencia."""
+        with self._lock:
+            self._stats(operation).cache_hits += 1
+
+    def elapsed_seconds(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def snapshot(self) -> Dict[str, OperationStats]:
+        """Copia de los contadores por operacion, ordenados por nombre."""
+        with self._lock:
+            return {
+                operation: OperationStats(**asdict(stats))
+                for operation, stats in sorted(self._operations.items())
+            }
+
+    def server_timing(self) -> str:
+        """Valor del header Server-Timing: una metrica por operacion mas el total."""
+        entries: List[str] = []
+        for operation, stats in self.snapshot().items():
+            description = f"{stats.calls} llamadas"
+            if stats.retries:
+                description += f", {stats.retries} reintentos"
+            if stats.cache_hits:
+                description += f", {stats.cache_hits} cache"
+            entries.append(
+                f'{operation};dur={stats.seconds * 1000:.1f};desc="{description}"'
+            )
+        entries.append(f"total;dur={self.elapsed_seconds() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def collect_request_metrics() -> Iterator[RequestMetrics]:
+    """Activa la contabilidad de dependencias para el bloque."""
+    metrics = RequestMetrics()
+    token = _request_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _request_metrics.reset(token)
+
+
+def current_request_metrics() -> Optional[RequestMetrics]:
+    """Metricas del request en curso, o None fuera de un request."""
+    return _request_metrics.get()
+
+
+@contextmanager
+def track_call(operation: str) -> Iterator[CallTracker]:
+    """Mide una llamada a operation; una excepcion la cuenta como error."""
+    tracker = CallTracker()
+    metrics = _request_metrics.get()
+    started_at = time.perf_counter()
+    error = False
+    try:
+        yield tracker
+    except BaseException:
+        error = True
+        raise
+    finally:
+        if metrics is not None:
+            metrics.record_call(
+                operation,
+                time.perf_counter() - started_at,
+                retries=tracker.retries,
+                error=error,
+            )
+
+
+def record_cache_hit(operation: str) -> None:
+    """Registra un cache hit de operation en el request en curso (si hay)."""
+    metrics = _request_metrics.get()
+    if metrics is not None:
+        metrics.record_cache_hit(operation)
@@ -0,0 +1,153 @@
+"""Reintentos con backoff exponencial, jitter y presupuesto de tiempo por request."""
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Iterator, Optional
+
+import httplib2
+from google.auth.exceptions import TransportError
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = (429, 500, 503)
+# Fallas de transporte que se reintentan (OSError cubre socket.timeout y
+# errores de conexion/SSL); otros errores son bugs y no se reintentan.
+RETRYABLE_TRANSPORT_ERRORS = (OSError, httplib2.HttpLib2Error, TransportError)
+
+# Deadline (time.monotonic) del request en curso; None = sin presupuesto.
+_request_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline",
+    default=None,
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Parametros de reintento para llamadas a APIs externas."""
+
+    max_attempts: int = 5
+    base_delay_seconds: float = 0.5
+    max_delay_seconds: float = 8.0
+    min_attempt_seconds: float = 1.0
+    # Tope de Retry-After sin presupuesto (threads de fondo): evita dormir
+    # lo que pida el servidor sin limite.
+    max_unbudgeted_retry_after_seconds: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        """Espera con full jitter: uniforme entre 0 y min(max, base * 2^attempt)."""
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def delay_for(self, error: Exception, attempt: int) -> float:
+        """
+        Retorna la espera antes del siguiente intento respetando Retry-After.
+
+        Retry-After no se acota a max_delay_seconds: lo limita el presupuesto
+        del request (next_retry_delay no reintenta si no alcanza). Sin
+        presupuesto se acota a max_unbudgeted_retry_after_seconds.
+        """
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            if remaining_budget() is None:
+                return min(retry_after, self.max_unbudgeted_retry_after_seconds)
+            return retry_after
+        return self.backoff(attempt)
+
+
+@contextmanager
+def request_budget(seconds: Optional[float]) -> Iterator[None]:
+    """Define un presupuesto de tiempo para los reintentos del bloque."""
+    deadline = time.monotonic() + seconds if seconds and seconds > 0 else None
+    token = _request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Segundos restantes del presupuesto actual, o None si no hay limite."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Lee el header Retry-After (segundos o fecha HTTP) de un HttpError."""
+    if not isinstance(error, HttpError):
+        return None
+    resp = getattr(error, "resp", None)
+    value = resp.get("retry-after") if hasattr(resp, "get") else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Errores HTTP transitorios o fallas de transporte."""
+    if isinstance(error, HttpError):
+        return getattr(error.resp, "status", None) in RETRYABLE_STATUS_CODES
+    return isinstance(error, RETRYABLE_TRANSPORT_ERRORS)
+
+
+def next_retry_delay(
+    policy: RetryPolicy,
+    error: Exception,
+    attempt: int,
+    description: str,
+) -> Optional[float]:
+    """Calcula la espera siguiente o None si no corresponde reintentar."""
+    if not is_retryable_error(error) or attempt >= policy.max_attempts - 1:
+        return None
+
+    delay = policy.delay_for(error, attempt)
+    remaining = remaining_budget()
+    if remaining is not None and remaining < delay + policy.min_attempt_seconds:
+        logger.warning(
+            "%s: presupuesto del request agotado (restante=%.2fs), no se reintenta: %s",
+            description,
+            remaining,
+            error,
+        )
+        return None
+
+    logger.warning(
+        "%s error transitorio: %s. Reintentando en %.2fs (intento %s/%s)",
+        description,
+        error,
+        delay,
+        attempt + 1,
+        policy.max_attempts,
+    )
+    return delay
+
+
+def execute_with_retry(
+    call: Callable[[], Any],
+    policy: RetryPolicy,
+    description: str = "Google Drive API",
+) -> Any:
+    """Ejecuta call reintentando errores transitorios dentro del presupuesto."""
+    for attempt in range(policy.max_attempts):
+        try:
+            return call()
+        except Exception as error:
+            delay = next_retry_delay(policy, error, attempt, description)
+            if delay is None:
+                raise
+            time.sleep(delay)
+
@@ -0,0 +1,71 @@
+"""Coalescencia de llamadas concurrentes identicas (single-flight)."""
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, Hashable
+
+from app.services.retry import remaining_budget
+
+
+class SingleFlightTimeout(RuntimeError):
+    """La ejecucion en curso no termino dentro del tiempo disponible del request."""
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez las llamadas concurrentes con la misma clave.
+
+    El primer thread que pide una clave ejecuta la funcion; los que llegan
+    mientras esta en curso esperan su Future y comparten el resultado (o la
+    excepcion). Al terminar la clave se libera, asi no actua como cache.
+    Cada seguidor espera a lo sumo su propio presupuesto de request: el lider
+    puede ser un thread de fondo sin presupuesto.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, call: Callable[[], Any]) -> Any:
+        """Retorna call() o el resultado de la ejecucion en curso para key."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            timeout = remaining_budget()
+            done, _pending = wait([future], timeout=None if timeout is None else max(timeout, 0.0))
+            if not done:
+                raise SingleFlightTimeout(
+                    f"La ejecucion en curso de {key!r} excede el tiempo disponible del request"
+                )
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Retorna contadores de ejecuciones reales y llamadas coalescidas."""
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
@@ -1,13 +1,43 @@
 """Servicio para interactuar con Supabase."""
 import logging
-from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
+import httpx
+from postgrest import APIError
 from supabase import Client, create_client
 
 from app.config import settings
+from app.services.circuit_breaker import CircuitBreakerRegistry
+from app.services.request_metrics import track_call
 
 logger = logging.getLogger(__name__)
 
+# Valores por filtro in_(): acota el largo de la URL de PostgREST.
+IN_QUERY_CHUNK_SIZE = 100
+# Filas por pagina en lecturas paginadas; no debe superar max-rows de PostgREST
+# (1000 por defecto en Supabase), que trunca la respuesta sin avisar.
+POSTGREST_PAGE_SIZE = 1000
+# Funcion SQL opcional (supabase/migrations) que resuelve nombres y patentes juntos.
+RESOLVER_DRIVE_FOLDER_IDS_RPC = "resolver_drive_folder_ids"
+# Codigo PostgREST cuando la funcion no existe en el schema cache.
+PGRST_FUNCTION_NOT_FOUND = "PGRST202"
+# Codigos PostgREST de conexion/pool con la base (responden 503/504).
+PGRST_SERVER_ERROR_CODES = frozenset({"PGRST000", "PGRST001", "PGRST002", "PGRST003"})
+# Clases SQLSTATE que indican problemas del servidor y no de la consulta:
+# conexion, recursos insuficientes, intervencion del operador (timeouts,
+# shutdown), error de sistema y error interno.
+SQLSTATE_SERVER_ERROR_CLASSES = frozenset({"08", "53", "57", "58", "XX"})
+
+
+@dataclass
+class ResolucionDriveFolderIds:
+    """drive_folder_id resueltos por tabla de origen."""
+
+    trabajadores: Dict[str, str] = field(default_factory=dict)
+    conductores: Dict[str, str] = field(default_factory=dict)
+    vehiculos: Dict[str, str] = field(default_factory=dict)
+
 
 class SupabaseService:
     """Servicio para operaciones con Supabase."""
@@ -15,11 +45,70 @@ class SupabaseService:
     def __init__(self):
         """Inicializa el cliente de Supabase."""
         self.client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        # Un circuit breaker por tabla: una tabla caida no bloquea a las demas.
+        self.circuit_breakers = CircuitBreakerRegistry(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout_seconds=settings.CIRCUIT_BREAKER_RESET_TIMEOUT_SECONDS,
+        )
+        # Se desactiva al primer PGRST202 (funcion no instalada) y se usan las tablas.
+        self.rpc_resolver_enabled = settings.SUPABASE_RPC_RESOLVER_ENABLED
         logger.info(
             "Cliente Supabase inicializado para proyecto: %s",
             settings.SUPABASE_PROJECT_ID,
         )
 
+    @staticmethod
+    def _is_supabase_outage(error: Exception) -> bool:
+        """
+        Errores que cuentan como falla de Supabase para el circuit breaker.
+
+        Solo errores de transporte y 5xx; los rechazos de PostgREST a la
+        consulta (4xx, PGRST202, constraints) no abren el circuito.
+        """
+        if isinstance(error, httpx.TransportError):
+            return True
+        if not isinstance(error, APIError):
+            return False
+        code = str(error.code or "")
+        if code.isdigit() and len(code) == 3:
+            # Respuesta sin JSON (p. ej. el gateway): code es el status HTTP.
+            return code.startswith("5")
+        return code in PGRST_SERVER_ERROR_CODES or code[:2] in SQLSTATE_SERVER_ERROR_CLASSES
+
+    def _execute(self, table: str, query: Any, operation: str = "select") -> Any:
+        """Ejecuta query protegido por el circuit breaker de la tabla y lo contabiliza."""
+        with track_call(f"supabase.{table}.{operation}"):
+            return self.circuit_breakers.get(f"supabase.{table}").call(
+                query.execute,
+                is_failure=self._is_supabase_outage,
+            )
+
+    def _execute_paginado(
+        self,
+        table: str,
+        build_query: Callable[[], Any],
+        operation: str = "select",
+    ) -> List[Dict[str, Any]]:
+        """
+        Ejecuta build_query() por paginas de POSTGREST_PAGE_SIZE filas.
+
+        build_query debe ordenar el resultado para que las paginas no se
+        solapen; la lectura termina con la primera pagina incompleta.
+        """
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            query = build_query().limit(POSTGREST_PAGE_SIZE).offset(offset)
+            page = self._execute(table, query, operation=operation).data or []
+            rows.extend(page)
+            if len(page) < POSTGREST_PAGE_SIZE:
+                return rows
+            offset += POSTGREST_PAGE_SIZE
+
+    def circuit_breaker_states(self) -> Dict[str, Dict[str, Any]]:
+        """Estado de los circuit breakers de Supabase."""
+        return self.circuit_breakers.snapshot()
+
     def buscar_drive_folder_id_trabajador(
         self,
         id_proyecto: int,
@@ -36,15 +125,15 @@ class SupabaseService:
             drive_folder_id si se encuentra, None si no
         """
         try:
-            response = (
+            query = (
                 self.client.table("fct_acreditacion_solicitud_trabajador_manual")
                 .select("drive_folder_id")
                 .eq("id_proyecto", id_proyecto)
                 .eq("nombre_trabajador", nombre_trabajador)
                 .not_.is_("drive_folder_id", "null")
                 .limit(1)
-                .execute()
             )
+            response = self._execute("fct_acreditacion_solicitud_trabajador_manual", query)
 
             if response.data and len(response.data) > 0:
                 drive_folder_id = response.data[0].get("drive_folder_id")
@@ -69,6 +158,256 @@ class SupabaseService:
             )
             return None
 
+    def resolver_drive_folder_ids(
+        self,
+        id_proyecto: int,
+        nombres: Iterable[str],
+        patentes: Iterable[str] = (),
+        patentes_respaldo: Optional[Dict[str, List[str]]] = None,
+    ) -> ResolucionDriveFolderIds:
+        """
+        Resuelve drive_folder_id por nombre (trabajador -> conductor) y por patente.
+
+        Con rpc_resolver_enabled usa la funcion resolver_drive_folder_ids en un solo
+        round trip; si no esta instalada o falla, usa las consultas in_() por tabla.
+
+        Args:
+            id_proyecto: ID del proyecto
+            nombres: Nombres a resolver como trabajador y luego conductor
+            patentes: Patentes a resolver siempre (categorias vehiculo)
+            patentes_respaldo: nombre -> patentes, solo para nombres sin resolver
+
+        Returns:
+            ResolucionDriveFolderIds con los encontrados en cada tabla
+        """
+        nombres = list(dict.fromkeys(nombres))
+        patentes = [patente.strip() for patente in patentes]
+        patentes_respaldo = patentes_respaldo or {}
+
+        if self.rpc_resolver_enabled:
+            resolucion = self._resolver_drive_folder_ids_rpc(
+                id_proyecto,
+                nombres,
+                patentes
+                + [patente for respaldo in patentes_respaldo.values() for patente in respaldo],
+            )
+            if resolucion is not None:
+                return resolucion
+
+        resolucion = ResolucionDriveFolderIds()
+        if nombres:
+            resolucion.trabajadores = self.buscar_drive_folder_ids_trabajadores(
+                id_proyecto,
+                nombres,
+            )
+            # Conductor solo para los nombres que no resolvio la tabla de trabajadores.
+            nombres_conductores = [
+                nombre for nombre in nombres if nombre not in resolucion.trabajadores
+            ]
+            if nombres_conductores:
+                resolucion.conductores = self.buscar_drive_folder_ids_conductores(
+                    id_proyecto,
+                    nombres_conductores,
+                )
+
+        patentes_consulta = list(patentes)
+        for nombre, respaldo in patentes_respaldo.items():
+            if nombre not in resolucion.trabajadores and nombre not in resolucion.conductores:
+                patentes_consulta.extend(respaldo)
+        if patentes_consulta:
+            resolucion.vehiculos = self.buscar_drive_folder_ids_vehiculos(
+                id_proyecto,
+                patentes_consulta,
+            )
+        return resolucion
+
+    def _resolver_drive_folder_ids_rpc(
+        self,
+        id_proyecto: int,
+        nombres: List[str],
+        patentes: List[str],
+    ) -> Optional[ResolucionDriveFolderIds]:
+        """Llama a la funcion SQL; retorna None si hay que usar las tablas."""
+        nombres_unicos = list(dict.fromkeys(nombre for nombre in nombres if nombre))
+        patentes_unicas = list(dict.fromkeys(patente for patente in patentes if patente))
+        # La funcion retorna a lo mas una fila por clave: con bloques de hasta
+        # POSTGREST_PAGE_SIZE claves, max-rows no trunca la respuesta.
+        bloque = max(POSTGREST_PAGE_SIZE // 2, 1)
+        rows: List[Dict[str, Any]] = []
+        try:
+            for start in range(0, max(len(nombres_unicos), len(patentes_unicas), 1), bloque):
+                query = self.client.rpc(
+                    RESOLVER_DRIVE_FOLDER_IDS_RPC,
+                    {
+                        "p_id_proyecto": id_proyecto,
+                        "p_nombres": nombres_unicos[start:start + bloque],
+                        "p_patentes": patentes_unicas[start:start + bloque],
+                    },
+                )
+                response = self._execute(RESOLVER_DRIVE_FOLDER_IDS_RPC, query, operation="rpc")
+                rows.extend(response.data or [])
+        except APIError as e:
+            if e.code == PGRST_FUNCTION_NOT_FOUND:
+                logger.warning(
+                    "Funcion %s no instalada en Supabase; se usan consultas por tabla",
+                    RESOLVER_DRIVE_FOLDER_IDS_RPC,
+                )
+                self.rpc_resolver_enabled = False
+            else:
+                logger.error("Error en RPC %s: %s", RESOLVER_DRIVE_FOLDER_IDS_RPC, e)
+            return None
+        except Exception as e:
+            logger.error("Error en RPC %s: %s", RESOLVER_DRIVE_FOLDER_IDS_RPC, e)
+            return None
+
+        resolucion = ResolucionDriveFolderIds()
+        por_fuente = {
+            "supabase_trabajador": resolucion.trabajadores,
+            "supabase_conductor": resolucion.conductores,
+            "supabase_vehiculo": resolucion.vehiculos,
+        }
+        for row in rows:
+            destino = por_fuente.get(row.get("fuente"))
+            clave = row.get("clave")
+            drive_folder_id = row.get("drive_folder_id")
+            if destino is not None and clave and drive_folder_id:
+                destino.setdefault(clave, drive_folder_id)
+
+        logger.info(
+            "RPC %s resolvio trabajadores=%s conductores=%s vehiculos=%s (proyecto=%s)",
+            RESOLVER_DRIVE_FOLDER_IDS_RPC,
+            len(resolucion.trabajadores),
+            len(resolucion.conductores),
+            len(resolucion.vehiculos),
+            id_proyecto,
+        )
+        return resolucion
+
+    def buscar_drive_folder_ids_trabajadores(
+        self,
+        id_proyecto: int,
+        nombres_trabajadores: Iterable[str],
+    ) -> Dict[str, str]:
+        """
+        Busca en bloque drive_folder_id en fct_acreditacion_solicitud_trabajador_manual.
+
+        Args:
+            id_proyecto: ID del proyecto
+            nombres_trabajadores: Nombres de trabajadores a resolver
+
+        Returns:
+            Dict nombre_trabajador -> drive_folder_id, solo con los encontrados
+        """
+        return self._buscar_drive_folder_ids_por_columna(
+            "fct_acreditacion_solicitud_trabajador_manual",
+            "nombre_trabajador",
+            id_proyecto,
+            nombres_trabajadores,
+        )
+
+    def buscar_drive_folder_ids_conductores(
+        self,
+        id_proyecto: int,
+        nombres_conductores: Iterable[str],
+    ) -> Dict[str, str]:
+        """
+        Busca en bloque drive_folder_id en fct_acreditacion_solicitud_conductor_manual.
+
+        Args:
+            id_proyecto: ID del proyecto
+            nombres_conductores: Nombres a resolver como nombre_conductor
+
+        Returns:
+            Dict nombre_conductor -> drive_folder_id, solo con los encontrados
+        """
+        return self._buscar_drive_folder_ids_por_columna(
+            "fct_acreditacion_solicitud_conductor_manual",
+            "nombre_conductor",
+            id_proyecto,
+            nombres_conductores,
+        )
+
+    def buscar_drive_folder_ids_vehiculos(
+        self,
+        id_proyecto: int,
+        patentes_vehiculos: Iterable[str],
+    ) -> Dict[str, str]:
+        """
+        Busca en bloque drive_folder_id en fct_acreditacion_solicitud_vehiculos.
+
+        Args:
+            id_proyecto: ID del proyecto
+            patentes_vehiculos: Patentes a resolver (se aplica trim como en la busqueda individual)
+
+        Returns:
+            Dict patente (con trim) -> drive_folder_id, solo con las encontradas
+        """
+        return self._buscar_drive_folder_ids_por_columna(
+            "fct_acreditacion_solicitud_vehiculos",
+            "patente",
+            id_proyecto,
+            (patente.strip() for patente in patentes_vehiculos),
+        )
+
+    def _buscar_drive_folder_ids_por_columna(
+        self,
+        table: str,
+        column: str,
+        id_proyecto: int,
+        values: Iterable[str],
+    ) -> Dict[str, str]:
+        """
+        Resuelve drive_folder_id para varios valores de column con consultas in_().
+
+        Los valores se consultan en bloques de IN_QUERY_CHUNK_SIZE y cada bloque
+        se lee paginado (un valor puede tener muchas filas). Igual que la
+        busqueda individual, por cada valor se toma la primera fila con
+        drive_folder_id no nulo. Un bloque que falla se registra y sus valores
+        quedan sin resolver.
+        """
+        pendientes: List[str] = list(dict.fromkeys(value for value in values if value))
+        encontrados: Dict[str, str] = {}
+
+        for start in range(0, len(pendientes), IN_QUERY_CHUNK_SIZE):
+            chunk = pendientes[start:start + IN_QUERY_CHUNK_SIZE]
+            try:
+                rows = self._execute_paginado(
+                    table,
+                    lambda: (
+                        self.client.table(table)
+                        .select(f"{column}, drive_folder_id")
+                        .eq("id_proyecto", id_proyecto)
+                        .in_(column, chunk)
+                        .not_.is_("drive_folder_id", "null")
+                        .order(column)
+                    ),
+                )
+            except Exception as e:
+                logger.error(
+                    "Error buscando drive_folder_id en %s para %s valores de %s: %s",
+                    table,
+                    len(chunk),
+                    column,
+                    e,
+                )
+                continue
+
+            chunk_values = set(chunk)
+            for row in rows:
+                value = row.get(column)
+                drive_folder_id = row.get("drive_folder_id")
+                if value in chunk_values and drive_folder_id and value not in encontrados:
+                    encontrados[value] = drive_folder_id
+
+        logger.info(
+            "drive_folder_id resueltos en %s: %s de %s (proyecto=%s)",
+            table,
+            len(encontrados),
+            len(pendientes),
+            id_proyecto,
+        )
+        return encontrados
+
     def buscar_drive_folder_id_conductor(
         self,
         id_proyecto: int,
@@ -85,15 +424,15 @@ class SupabaseService:
             drive_folder_id si se encuentra, None si no
         """
         try:
-            response = (
+            query = (
                 self.client.table("fct_acreditacion_solicitud_conductor_manual")
                 .select("drive_folder_id")
                 .eq("id_proyecto", id_proyecto)
                 .eq("nombre_conductor", nombre_trabajador)
                 .not_.is_("drive_folder_id", "null")
                 .limit(1)
-                .execute()
             )
+            response = self._execute("fct_acreditacion_solicitud_conductor_manual", query)
 
             if response.data and len(response.data) > 0:
                 drive_folder_id = response.data[0].get("drive_folder_id")
@@ -135,15 +474,15 @@ class SupabaseService:
         """
         patente_normalizada = patente_vehiculo.strip()
         try:
-            response = (
+            query = (
                 self.client.table("fct_acreditacion_solicitud_vehiculos")
                 .select("drive_folder_id")
                 .eq("id_proyecto", id_proyecto)
                 .eq("patente", patente_normalizada)
                 .not_.is_("drive_folder_id", "null")
                 .limit(1)
-                .execute()
             )
+            response = self._execute("fct_acreditacion_solicitud_vehiculos", query)
 
             if response.data and len(response.data) > 0:
                 drive_folder_id = response.data[0].get("drive_folder_id")
@@ -201,11 +540,15 @@ class SupabaseService:
             return False
 
         try:
-            response = (
+            query = (
                 self.client.table("brg_acreditacion_solicitud_requerimiento")
                 .update(update_payload)
                 .eq("id", registro_id)
-                .execute()
+            )
+            response = self._execute(
+                "brg_acreditacion_solicitud_requerimiento",
+                query,
+                operation="update",
             )
 
             if response.data and len(response.data) > 0:
@@ -230,6 +573,82 @@ class SupabaseService:
             )
             return False
 
+    def actualizar_brg_acreditacion_solicitud_requerimientos(
+        self,
+        actualizaciones: Iterable[Tuple[int, Optional[str], Optional[str]]],
+    ) -> Dict[int, bool]:
+        """
+        Actualiza en bloque columnas de Drive en brg_acreditacion_solicitud_requerimiento.
+
+        Agrupa los registros con el mismo payload (drive_folder_id, parent_drive_id)
+        y envia un update().in_("id", ids) por grupo, en bloques de
+        IN_QUERY_CHUNK_SIZE. El exito de cada ID se deriva de las filas retornadas.
+
+        Args:
+            actualizaciones: Tuplas (registro_id, drive_folder_id, parent_drive_id)
+
+        Returns:
+            Dict registro_id -> True si se actualizo, False si no
+        """
+        grupos: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for registro_id, drive_folder_id, parent_drive_id in actualizaciones:
+            ids = grupos.setdefault((drive_folder_id, parent_drive_id), [])
+            if registro_id not in ids:
+                ids.append(registro_id)
+
+        resultados: Dict[int, bool] = {}
+        for (drive_folder_id, parent_drive_id), ids in grupos.items():
+            update_payload: Dict[str, Any] = {}
+            if drive_folder_id is not None:
+                update_payload["drive_folder_id"] = drive_folder_id
+            if parent_drive_id is not None:
+                update_payload["parent_drive_id"] = parent_drive_id
+
+            if not update_payload:
+                logger.warning(
+                    "No hay columnas para actualizar en registros %s (payload vacio)",
+                    ids,
+                )
+                resultados.update({registro_id: False for registro_id in ids})
+                continue
+
+            for start in range(0, len(ids), IN_QUERY_CHUNK_SIZE):
+                chunk = ids[start:start + IN_QUERY_CHUNK_SIZE]
+                actualizados: Set[int] = set()
+                try:
+                    query = (
+                        self.client.table("brg_acreditacion_solicitud_requerimiento")
+                        .update(update_payload)
+                        .in_("id", chunk)
+                    )
+                    response = self._execute(
+                        "brg_acreditacion_solicitud_requerimiento",
+                        query,
+                        operation="update",
+                    )
+                    actualizados = {row.get("id") for row in response.data or []}
+                except Exception as e:
+                    logger.error(
+                        "Error actualizando %s registros con payload=%s: %s",
+                        len(chunk),
+                        update_payload,
+                        e,
+                    )
+
+                for registro_id in chunk:
+                    resultados[registro_id] = registro_id in actualizados
+                faltantes = [registro_id for registro_id in chunk if registro_id not in actualizados]
+                logger.info(
+                    "Actualizados %s de %s registros con payload=%s",
+                    len(chunk) - len(faltantes),
+                    len(chunk),
+                    update_payload,
+                )
+                if faltantes:
+                    logger.warning("No se actualizaron los registros con id %s", faltantes)
+
+        return resultados
+
 
 # Instancia global del servicio
 supabase_service = SupabaseService()
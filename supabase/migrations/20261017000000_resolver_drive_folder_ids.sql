@@ -0,0 +1,80 @@
+-- Resuelve en un solo round trip los drive_folder_id de trabajadores, conductores y
+-- vehiculos de un proyecto, con la misma prioridad que aplica la API:
+-- trabajador -> conductor por nombre, y vehiculo por patente.
+--
+-- Retorna una fila por clave resuelta:
+--   tipo = 'nombre'  -> clave es el nombre, fuente 'supabase_trabajador' o 'supabase_conductor'
+--   tipo = 'patente' -> clave es la patente, fuente 'supabase_vehiculo'
+-- Las claves sin drive_folder_id no se retornan. Como en las busquedas por tabla,
+-- por cada clave se toma la primera fila con drive_folder_id no nulo.
+--
+-- Uso desde la API: SUPABASE_RPC_RESOLVER_ENABLED=true. Si la funcion no esta
+-- instalada, la API vuelve a las consultas por tabla.
+
+create or replace function public.resolver_drive_folder_ids(
+    p_id_proyecto bigint,
+    p_nombres text[] default '{}',
+    p_patentes text[] default '{}'
+)
+returns table (clave text, tipo text, drive_folder_id text, fuente text)
+language sql
+stable
+as $$
+    with nombres as (
+        select distinct nombre
+        from unnest(p_nombres) as nombre
+        where nombre is not null and nombre <> ''
+    ),
+    trabajadores as (
+        select distinct on (t.nombre_trabajador)
+            t.nombre_trabajador as nombre,
+            t.drive_folder_id::text as drive_folder_id
+        from public.fct_acreditacion_solicitud_trabajador_manual t
+        where t.id_proyecto = p_id_proyecto
+          and t.nombre_trabajador = any(p_nombres)
+          and t.drive_folder_id is not null
+        order by t.nombre_trabajador
+    ),
+    conductores as (
+        select distinct on (c.nombre_conductor)
+            c.nombre_conductor as nombre,
+            c.drive_folder_id::text as drive_folder_id
+        from public.fct_acreditacion_solicitud_conductor_manual c
+        where c.id_proyecto = p_id_proyecto
+          and c.nombre_conductor = any(p_nombres)
+          and c.drive_folder_id is not null
+        order by c.nombre_conductor
+    ),
+    vehiculos as (
+        select distinct on (v.patente)
+            v.patente as patente,
+            v.drive_folder_id::text as drive_folder_id
+        from public.fct_acreditacion_solicitud_vehiculos v
+        where v.id_proyecto = p_id_proyecto
+          and v.patente = any(p_patentes)
+          and v.drive_folder_id is not null
+        order by v.patente
+    )
+    select
+        n.nombre as clave,
+        'nombre' as tipo,
+        coalesce(tr.drive_folder_id, co.drive_folder_id) as drive_folder_id,
+        case
+            when tr.drive_folder_id is not null then 'supabase_trabajador'
+            else 'supabase_conductor'
+        end as fuente
+    from nombres n
+    left join trabajadores tr on tr.nombre = n.nombre
+    left join conductores co on co.nombre = n.nombre
+    where coalesce(tr.drive_folder_id, co.drive_folder_id) is not null
+    union all
+    select
+        v.patente as clave,
+        'patente' as tipo,
+        v.drive_folder_id,
+        'supabase_vehiculo' as fuente
+    from vehiculos v;
+$$;
+
+grant execute on function public.resolver_drive_folder_ids(bigint, text[], text[])
+    to service_role;
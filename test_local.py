@@ -1,9 +1,20 @@
 """Tests locales para la API con pytest."""
+import datetime
+import json
+import logging
 import os
+import sys
+import threading
+import time
 from typing import Any, Dict, List, Optional
 
+import httplib2
+import httpx
 import pytest
 from fastapi.testclient import TestClient
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+from postgrest import APIError
 
 # Variables requeridas por app.config al importar la aplicacion.
 os.environ.setdefault("SUPABASE_PROJECT_ID", "local-test")
@@ -18,9 +29,36 @@ os.environ.setdefault(
 )
 os.environ.setdefault("ASIGNAR_FOLDER_API_TOKEN", "test-api-token")
 
-from app.config import Settings  # noqa: E402
+from app.config import Settings, settings  # noqa: E402
 from app.main import app  # noqa: E402
-from app.services.drive_service import drive_service  # noqa: E402
+from app.services.cache import TTLCache  # noqa: E402
+from app.services.circuit_breaker import (  # noqa: E402
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    CircuitOpenError,
+)
+from app.services.credentials import (  # noqa: E402
+    CredentialManager,
+    CredentialsUnavailableError,
+)
+from app.services.drive_changes import DriveChangesWatcher  # noqa: E402
+from app.services.drive_service import (  # noqa: E402
+    ClientPoolTimeout,
+    DriveService,
+    drive_service,
+)
+from app.services.folder_index import (  # noqa: E402
+    FolderIndex,
+    normalize_base_folder_label,
+    normalize_name,
+)
+from app.services.rate_limit import RateLimitTimeout, TokenBucket  # noqa: E402
+from app.services.request_metrics import collect_request_metrics  # noqa: E402
+from app.services.retry import (  # noqa: E402
+    RetryPolicy,
+    execute_with_retry,
+    request_budget,
+)
 from app.services.supabase_service import SupabaseService, supabase_service  # noqa: E402
 
 client = TestClient(
@@ -42,12 +80,55 @@ def mock_resolve_parent_drive_context(codigo_proyecto: str) -> Dict[str, str]:
     return DEFAULT_PARENT_CTX
 
 
+def bulk_lookup(single_lookup):
+    """Adapta un mock de busqueda individual a la firma de la busqueda en bloque."""
+
+    def lookup(id_proyecto: int, values) -> Dict[str, str]:
+        found = {value: single_lookup(id_proyecto, value) for value in values}
+        return {value: folder_id for value, folder_id in found.items() if folder_id}
+
+    return lookup
+
+
+def bulk_update(single_update):
+    """Adapta un mock de actualizacion individual a la firma del update en bloque."""
+
+    def update(actualizaciones) -> Dict[int, bool]:
+        return {
+            registro_id: single_update(
+                registro_id,
+                drive_folder_id=drive_folder_id,
+                parent_drive_id=parent_drive_id,
+            )
+            for registro_id, drive_folder_id, parent_drive_id in actualizaciones
+        }
+
+    return update
+
+
+def lookup_no_consultado(motivo: str):
+    """Busqueda en bloque que hace fallar el test si se consulta."""
+
+    def lookup(_id_proyecto: int, _values) -> Dict[str, str]:
+        raise AssertionError(motivo)
+
+    return lookup
+
+
+@pytest.fixture(autouse=True)
+def limpiar_caches_drive():
+    drive_service.clear_caches()
+    yield
+    drive_service.clear_caches()
+
+
 def test_health_endpoint() -> None:
     response = client.get("/health")
     assert response.status_code == 200
     body = response.json()
     assert body["status"] == "healthy"
     assert "environment" in body
+    assert "circuit_breakers" in body
 
 
 def test_root_endpoint() -> None:
@@ -166,8 +247,8 @@ def test_asignar_folder_empresa_myma(monkeypatch) -> None:
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -208,26 +289,15 @@ def test_asignar_folder_empresa_externa_busca_01_empresa(monkeypatch) -> None:
             "drive_name": "Acreditaciones",
         }
 
-    def mock_find_folder_exact_or_contains(
-        folder_name: str,
-        parent_id: str,
-        drive_id: Optional[str] = None,
-        ignore_numeric_prefix: bool = False,
-    ) -> Optional[str]:
-        if folder_name == "Externos":
-            assert parent_id == "proyecto-456"
-            assert drive_id == "drive-123"
-            return "externos-001"
-        if folder_name == "NLT":
-            assert parent_id == "externos-001"
-            assert drive_id == "drive-123"
-            return "empresa-nlt-001"
-        if folder_name == "01 Empresa":
-            assert parent_id == "empresa-nlt-001"
-            assert drive_id == "drive-123"
-            assert ignore_numeric_prefix is True
-            return "folder-nlt-empresa-001"
-        return None
+    def mock_resolve_empresa_folders(
+        empresas: List[str],
+        id_carpeta_proyecto: str,
+        drive_id: str,
+    ) -> Dict[str, Optional[str]]:
+        assert empresas == ["NLT"]
+        assert id_carpeta_proyecto == "proyecto-456"
+        assert drive_id == "drive-123"
+        return {"NLT": "folder-nlt-empresa-001"}
 
     def mock_actualizar(
         registro_id: int,
@@ -251,13 +321,13 @@ def test_asignar_folder_empresa_externa_busca_01_empresa(monkeypatch) -> None:
     )
     monkeypatch.setattr(
         drive_service,
-        "find_folder_exact_or_contains",
-        mock_find_folder_exact_or_contains,
+        "resolve_empresa_folders",
+        mock_resolve_empresa_folders,
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -347,15 +417,6 @@ def test_drive_service_resolve_acreditacion_root_con_ruta_nueva(monkeypatch) ->
 
 
 def test_drive_service_find_folder_normaliza_y_ignora_prefijo_numerico(monkeypatch) -> None:
-    def mock_find_folder_by_name_in_directory(
-        _folder_name: str,
-        _parent_id: str,
-        _drive_id: Optional[str] = None,
-        ignore_numeric_prefix: bool = False,
-    ) -> Optional[str]:
-        _ = ignore_numeric_prefix
-        return None
-
     def mock_list_folders_in_directory(
         _parent_id: str,
         _drive_id: Optional[str] = None,
@@ -366,11 +427,6 @@ def test_drive_service_find_folder_normaliza_y_ignora_prefijo_numerico(monkeypat
             ("nlt", "folder-nlt-001"),
         ]
 
-    monkeypatch.setattr(
-        drive_service,
-        "find_folder_by_name_in_directory",
-        mock_find_folder_by_name_in_directory,
-    )
     monkeypatch.setattr(
         drive_service,
         "list_folders_in_directory",
@@ -399,11 +455,6 @@ def test_asignar_folder_no_empresa_prioriza_trabajador(monkeypatch) -> None:
         assert nombre_trabajador == "Diego Soto"
         return "folder-trab-123"
 
-    def mock_buscar_conductor(id_proyecto: int, nombre_trabajador: str) -> Optional[str]:
-        assert id_proyecto == 123
-        assert nombre_trabajador == "Diego Soto"
-        return "folder-cond-999"
-
     def mock_actualizar(
         registro_id: int,
         drive_folder_id: Optional[str] = None,
@@ -422,18 +473,18 @@ def test_asignar_folder_no_empresa_prioriza_trabajador(monkeypatch) -> None:
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        lookup_no_consultado("No debe consultar conductor si ya encontro trabajador"),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -455,7 +506,8 @@ def test_asignar_folder_no_empresa_prioriza_trabajador(monkeypatch) -> None:
     assert body["parent_drive_id"] == "drive-123"
     assert body["resumen"]["actualizados_exitosos"] == 1
     assert body["registros"][0]["drive_folder_id_trabajador"] == "folder-trab-123"
-    assert body["registros"][0]["drive_folder_id_conductor"] == "folder-cond-999"
+    # Resuelto como trabajador, no se consulta la tabla de conductores.
+    assert body["registros"][0]["drive_folder_id_conductor"] is None
     assert body["registros"][0]["drive_folder_id_final"] == "folder-trab-123"
 
 
@@ -492,18 +544,18 @@ def test_asignar_folder_sin_drive_folder_id_actualiza_solo_parent(monkeypatch) -
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        bulk_lookup(mock_buscar_conductor),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -540,9 +592,6 @@ def test_asignar_folder_parent_no_resoluble_continua(monkeypatch) -> None:
         assert nombre_trabajador == "Diego Soto"
         return "folder-trab-123"
 
-    def mock_buscar_conductor(_codigo_proyecto: str, _nombre_trabajador: str) -> Optional[str]:
-        return None
-
     def mock_actualizar(
         registro_id: int,
         drive_folder_id: Optional[str] = None,
@@ -560,18 +609,18 @@ def test_asignar_folder_parent_no_resoluble_continua(monkeypatch) -> None:
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        lookup_no_consultado("No debe consultar conductor si ya encontro trabajador"),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -640,9 +689,6 @@ def test_asignar_folder_request_mixto_comparte_parent(monkeypatch) -> None:
             return "folder-trab-123"
         return None
 
-    def mock_buscar_conductor(_codigo_proyecto: str, _nombre_trabajador: str) -> Optional[str]:
-        return None
-
     def mock_actualizar(
         registro_id: int,
         drive_folder_id: Optional[str] = None,
@@ -674,18 +720,18 @@ def test_asignar_folder_request_mixto_comparte_parent(monkeypatch) -> None:
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        lookup_no_consultado("No debe consultar conductor si ya encontro trabajador"),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -728,8 +774,8 @@ def test_asignar_folder_cachea_lookups_repetidos(monkeypatch) -> None:
     parent_calls = {"count": 0}
     acreditacion_calls = {"count": 0}
     find_folder_calls: List[Dict[str, Any]] = []
+    empresa_folder_calls: List[List[str]] = []
     trabajador_calls: List[str] = []
-    conductor_calls: List[str] = []
 
     def mock_resolve_parent(codigo_proyecto: str) -> Dict[str, str]:
         parent_calls["count"] += 1
@@ -767,16 +813,20 @@ def test_asignar_folder_cachea_lookups_repetidos(monkeypatch) -> None:
         )
         if folder_name == "MYMA":
             return "myma-789"
-        if folder_name == "Externos":
-            return "externos-111"
-        if folder_name == "Econsult Ambiental":
-            return "econsult-222"
         if folder_name == "01 Empresa" and parent_id == "myma-789":
             return "folder-myma-001"
-        if folder_name == "01 Empresa" and parent_id == "econsult-222":
-            return "folder-econsult-001"
         return None
 
+    def mock_resolve_empresa_folders(
+        empresas: List[str],
+        id_carpeta_proyecto: str,
+        drive_id: str,
+    ) -> Dict[str, Optional[str]]:
+        empresa_folder_calls.append(list(empresas))
+        assert id_carpeta_proyecto == "proyecto-456"
+        assert drive_id == "drive-123"
+        return {"Econsult Ambiental": "folder-econsult-001"}
+
     def mock_buscar_trabajador(_codigo_proyecto: str, nombre_trabajador: str) -> Optional[str]:
         trabajador_calls.append(nombre_trabajador)
         if nombre_trabajador == "Ailan Villalon Cueto":
@@ -785,10 +835,6 @@ def test_asignar_folder_cachea_lookups_repetidos(monkeypatch) -> None:
             return "folder-trab-alan"
         return None
 
-    def mock_buscar_conductor(_codigo_proyecto: str, nombre_trabajador: str) -> Optional[str]:
-        conductor_calls.append(nombre_trabajador)
-        return None
-
     def mock_actualizar(
         _registro_id: int,
         drive_folder_id: Optional[str] = None,
@@ -813,20 +859,25 @@ def test_asignar_folder_cachea_lookups_repetidos(monkeypatch) -> None:
         "find_folder_exact_or_contains",
         mock_find_folder_exact_or_contains,
     )
+    monkeypatch.setattr(
+        drive_service,
+        "resolve_empresa_folders",
+        mock_resolve_empresa_folders,
+    )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        lookup_no_consultado("No debe consultar conductor si ya encontro trabajador"),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -885,9 +936,9 @@ def test_asignar_folder_cachea_lookups_repetidos(monkeypatch) -> None:
     assert body["resumen"]["actualizados_exitosos"] == 7
     assert parent_calls["count"] == 1
     assert acreditacion_calls["count"] == 1
-    assert len(find_folder_calls) == 5
+    assert len(find_folder_calls) == 2
+    assert empresa_folder_calls == [["Econsult Ambiental"]]
     assert sorted(trabajador_calls) == ["Ailan Villalon Cueto", "Alan Flores"]
-    assert sorted(conductor_calls) == ["Ailan Villalon Cueto", "Alan Flores"]
 
 
 def test_asignar_folder_recupera_parent_desde_acreditacion(monkeypatch) -> None:
@@ -936,9 +987,6 @@ def test_asignar_folder_recupera_parent_desde_acreditacion(monkeypatch) -> None:
     def mock_buscar_trabajador(_codigo_proyecto: str, _nombre_trabajador: str) -> Optional[str]:
         return "folder-trab-123"
 
-    def mock_buscar_conductor(_codigo_proyecto: str, _nombre_trabajador: str) -> Optional[str]:
-        return None
-
     def mock_actualizar(
         registro_id: int,
         drive_folder_id: Optional[str] = None,
@@ -970,18 +1018,18 @@ def test_asignar_folder_recupera_parent_desde_acreditacion(monkeypatch) -> None:
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        lookup_no_consultado("No debe consultar conductor si ya encontro trabajador"),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -1036,13 +1084,13 @@ def test_asignar_folder_categoria_vehiculos_busca_por_patente(monkeypatch) -> No
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_vehiculo",
-        mock_buscar_vehiculo,
+        "buscar_drive_folder_ids_vehiculos",
+        bulk_lookup(mock_buscar_vehiculo),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -1149,23 +1197,23 @@ def test_asignar_folder_fallback_a_vehiculo_si_no_hay_trabajador_ni_conductor(mo
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        bulk_lookup(mock_buscar_conductor),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_vehiculo",
-        mock_buscar_vehiculo,
+        "buscar_drive_folder_ids_vehiculos",
+        bulk_lookup(mock_buscar_vehiculo),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -1196,12 +1244,6 @@ def test_asignar_folder_prioriza_trabajador_sobre_vehiculo(monkeypatch) -> None:
         assert nombre_trabajador == "Diego Soto"
         return "folder-trab-priority"
 
-    def mock_buscar_conductor(_codigo_proyecto: str, _nombre_trabajador: str) -> Optional[str]:
-        return None
-
-    def mock_buscar_vehiculo(_id_proyecto: int, _patente_vehiculo: str) -> Optional[str]:
-        raise AssertionError("No debe consultar vehiculo si ya encontro trabajador")
-
     def mock_actualizar(
         registro_id: int,
         drive_folder_id: Optional[str] = None,
@@ -1219,23 +1261,23 @@ def test_asignar_folder_prioriza_trabajador_sobre_vehiculo(monkeypatch) -> None:
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_trabajador",
-        mock_buscar_trabajador,
+        "buscar_drive_folder_ids_trabajadores",
+        bulk_lookup(mock_buscar_trabajador),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_conductor",
-        mock_buscar_conductor,
+        "buscar_drive_folder_ids_conductores",
+        lookup_no_consultado("No debe consultar conductor si ya encontro trabajador"),
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_vehiculo",
-        mock_buscar_vehiculo,
+        "buscar_drive_folder_ids_vehiculos",
+        lookup_no_consultado("No debe consultar vehiculo si ya encontro trabajador"),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -1292,13 +1334,13 @@ def test_asignar_folder_vehiculo_sin_match_actualiza_solo_parent(monkeypatch) ->
     )
     monkeypatch.setattr(
         supabase_service,
-        "buscar_drive_folder_id_vehiculo",
-        mock_buscar_vehiculo,
+        "buscar_drive_folder_ids_vehiculos",
+        bulk_lookup(mock_buscar_vehiculo),
     )
     monkeypatch.setattr(
         supabase_service,
-        "actualizar_brg_acreditacion_solicitud_requerimiento",
-        mock_actualizar,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(mock_actualizar),
     )
 
     payload = {
@@ -1344,6 +1386,10 @@ class FakeSupabaseQuery:
         self.data = data
         self.calls: List[tuple] = []
         self.not_ = FakeNotFilter(self)
+        # Filas que retorna cada execute, como el max-rows de PostgREST.
+        self.max_rows: Optional[int] = None
+        self._limit: Optional[int] = None
+        self._offset = 0
 
     def select(self, columns: str) -> "FakeSupabaseQuery":
         self.calls.append(("select", columns))
@@ -1355,11 +1401,35 @@ class FakeSupabaseQuery:
 
     def limit(self, value: int) -> "FakeSupabaseQuery":
         self.calls.append(("limit", value))
+        self._limit = value
+        return self
+
+    def offset(self, value: int) -> "FakeSupabaseQuery":
+        self.calls.append(("offset", value))
+        self._offset = value
+        return self
+
+    def order(self, column: str) -> "FakeSupabaseQuery":
+        self.calls.append(("order", column))
+        return self
+
+    def in_(self, column: str, values: List[Any]) -> "FakeSupabaseQuery":
+        self.calls.append(("in", column, list(values)))
+        return self
+
+    def update(self, payload: Dict[str, Any]) -> "FakeSupabaseQuery":
+        self.calls.append(("update", payload))
         return self
 
     def execute(self) -> FakeSupabaseResponse:
         self.calls.append(("execute",))
-        return FakeSupabaseResponse(self.data)
+        page_size = min(
+            size for size in (self._limit, self.max_rows, len(self.data)) if size is not None
+        )
+        data = self.data[self._offset:self._offset + page_size]
+        self._limit = None
+        self._offset = 0
+        return FakeSupabaseResponse(data)
 
 
 class FakeSupabaseClient:
@@ -1378,6 +1448,8 @@ def make_supabase_service_with_fake_client(
     service = SupabaseService.__new__(SupabaseService)
     fake_client = FakeSupabaseClient(data)
     service.client = fake_client
+    service.circuit_breakers = CircuitBreakerRegistry()
+    service.rpc_resolver_enabled = False
     return service, fake_client
 
 
@@ -1395,6 +1467,151 @@ def test_buscar_drive_folder_id_trabajador_filtra_drive_folder_id_nulo() -> None
     assert ("not_is", "drive_folder_id", "null") in fake_client.query.calls
 
 
+def test_buscar_drive_folder_ids_pagina_respuestas_truncadas(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.supabase_service.POSTGREST_PAGE_SIZE", 2)
+    service, fake_client = make_supabase_service_with_fake_client(
+        [
+            {"nombre_trabajador": "Persona Uno", "drive_folder_id": "folder-uno"},
+            {"nombre_trabajador": "Persona Uno", "drive_folder_id": "folder-uno-bis"},
+            {"nombre_trabajador": "Persona Uno", "drive_folder_id": "folder-uno-ter"},
+            {"nombre_trabajador": "Persona Dos", "drive_folder_id": "folder-dos"},
+        ]
+    )
+    fake_client.query.max_rows = 2
+
+    result = service.buscar_drive_folder_ids_trabajadores(
+        314,
+        ["Persona Uno", "Persona Dos"],
+    )
+
+    assert result == {"Persona Uno": "folder-uno", "Persona Dos": "folder-dos"}
+    assert fake_client.query.calls.count(("execute",)) == 3
+    assert ("order", "nombre_trabajador") in fake_client.query.calls
+    assert ("offset", 2) in fake_client.query.calls
+
+
+def test_buscar_drive_folder_ids_trabajadores_consulta_en_bloques(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.supabase_service.IN_QUERY_CHUNK_SIZE", 2)
+    service, fake_client = make_supabase_service_with_fake_client(
+        [
+            {"nombre_trabajador": "Persona Uno", "drive_folder_id": "folder-uno"},
+            {"nombre_trabajador": "Persona Uno", "drive_folder_id": "folder-uno-bis"},
+            {"nombre_trabajador": "Persona Tres", "drive_folder_id": "folder-tres"},
+        ]
+    )
+
+    result = service.buscar_drive_folder_ids_trabajadores(
+        314,
+        ["Persona Uno", "Persona Dos", "Persona Uno", "Persona Tres"],
+    )
+
+    assert result == {"Persona Uno": "folder-uno", "Persona Tres": "folder-tres"}
+    in_calls = [call for call in fake_client.query.calls if call[0] == "in"]
+    assert in_calls == [
+        ("in", "nombre_trabajador", ["Persona Uno", "Persona Dos"]),
+        ("in", "nombre_trabajador", ["Persona Tres"]),
+    ]
+    assert ("not_is", "drive_folder_id", "null") in fake_client.query.calls
+
+
+def test_buscar_drive_folder_ids_vehiculos_aplica_trim_y_un_solo_in() -> None:
+    service, fake_client = make_supabase_service_with_fake_client(
+        [
+            {"patente": "ABCD12", "drive_folder_id": "folder-abcd"},
+            {"patente": "ABCD12", "drive_folder_id": "folder-abcd-bis"},
+        ]
+    )
+
+    result = service.buscar_drive_folder_ids_vehiculos(123, [" ABCD12 ", "EFGH34", "ABCD12"])
+
+    assert result == {"ABCD12": "folder-abcd"}
+    assert fake_client.tables == ["fct_acreditacion_solicitud_vehiculos"]
+    assert ("in", "patente", ["ABCD12", "EFGH34"]) in fake_client.query.calls
+
+
+def test_actualizar_requerimientos_agrupa_por_payload_y_deriva_exito_por_fila() -> None:
+    service, fake_client = make_supabase_service_with_fake_client([{"id": 1}, {"id": 2}])
+
+    result = service.actualizar_brg_acreditacion_solicitud_requerimientos(
+        [
+            (1, "folder-a", "drive-123"),
+            (2, "folder-a", "drive-123"),
+            (3, "folder-b", "drive-123"),
+        ]
+    )
+
+    assert result == {1: True, 2: True, 3: False}
+    assert [call for call in fake_client.query.calls if call[0] in ("update", "in")] == [
+        ("update", {"drive_folder_id": "folder-a", "parent_drive_id": "drive-123"}),
+        ("in", "id", [1, 2]),
+        ("update", {"drive_folder_id": "folder-b", "parent_drive_id": "drive-123"}),
+        ("in", "id", [3]),
+    ]
+
+
+class FakeRpcRequest:
+    def __init__(self, result: Any):
+        self.result = result
+
+    def execute(self) -> Any:
+        if isinstance(self.result, Exception):
+            raise self.result
+        return FakeSupabaseResponse(self.result)
+
+
+def test_resolver_drive_folder_ids_usa_rpc_y_vuelve_a_tablas_sin_funcion() -> None:
+    service, fake_client = make_supabase_service_with_fake_client(
+        [{"nombre_trabajador": "Persona Uno", "drive_folder_id": "folder-tabla"}]
+    )
+    service.rpc_resolver_enabled = True
+    rpc_calls: List[tuple] = []
+    rpc_results: List[Any] = [
+        [
+            {"clave": clave, "tipo": tipo, "drive_folder_id": folder_id, "fuente": fuente}
+            for clave, tipo, folder_id, fuente in [
+                ("Persona Uno", "nombre", "f-1", "supabase_trabajador"),
+                ("Persona Dos", "nombre", "f-2", "supabase_conductor"),
+                ("ABCD12", "patente", "f-3", "supabase_vehiculo"),
+            ]
+        ],
+        APIError({"code": "PGRST202", "message": "Could not find the function"}),
+    ]
+
+    def rpc(fn: str, params: Dict[str, Any]) -> FakeRpcRequest:
+        rpc_calls.append((fn, params))
+        return FakeRpcRequest(rpc_results.pop(0))
+
+    fake_client.rpc = rpc  # type: ignore[attr-defined]
+
+    resolucion = service.resolver_drive_folder_ids(
+        314,
+        ["Persona Uno", "Persona Dos"],
+        patentes=[" ABCD12 "],
+        patentes_respaldo={"Persona Dos": ["EFGH34"]},
+    )
+    assert resolucion.trabajadores == {"Persona Uno": "f-1"}
+    assert resolucion.conductores == {"Persona Dos": "f-2"}
+    assert resolucion.vehiculos == {"ABCD12": "f-3"}
+    assert rpc_calls == [
+        (
+            "resolver_drive_folder_ids",
+            {
+                "p_id_proyecto": 314,
+                "p_nombres": ["Persona Uno", "Persona Dos"],
+                "p_patentes": ["ABCD12", "EFGH34"],
+            },
+        )
+    ]
+    assert fake_client.tables == []
+
+    # Funcion no instalada: se usan las tablas y no se vuelve a intentar la RPC.
+    resolucion = service.resolver_drive_folder_ids(314, ["Persona Uno"])
+    assert resolucion.trabajadores == {"Persona Uno": "folder-tabla"}
+    assert service.rpc_resolver_enabled is False
+    service.resolver_drive_folder_ids(314, ["Persona Uno"])
+    assert len(rpc_calls) == 2
+
+
 def test_buscar_drive_folder_id_conductor_filtra_drive_folder_id_nulo() -> None:
     service, fake_client = make_supabase_service_with_fake_client(
         [{"drive_folder_id": "folder-conductor"}]
@@ -1419,3 +1636,1406 @@ def test_buscar_drive_folder_id_vehiculo_filtra_drive_folder_id_nulo() -> None:
     assert result == "folder-vehiculo"
     assert fake_client.tables == ["fct_acreditacion_solicitud_vehiculos"]
     assert ("not_is", "drive_folder_id", "null") in fake_client.query.calls
+
+
+class FakeDriveRequest:
+    def __init__(self, result: Any):
+        self.result = result
+
+    def execute(self) -> Any:
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class FakeDriveResource:
+    def __init__(self, name: str, pages: List[Any], calls: List[tuple]):
+        self.name = name
+        self.pages = pages
+        self.calls = calls
+
+    def list(self, **kwargs: Any) -> FakeDriveRequest:
+        self.calls.append((self.name, kwargs))
+        return FakeDriveRequest(self.pages.pop(0))
+
+
+class FakeDriveApi:
+    def __init__(
+        self,
+        drives_pages: Optional[List[Any]] = None,
+        files_pages: Optional[List[Any]] = None,
+    ):
+        self.calls: List[tuple] = []
+        self.drives_resource = FakeDriveResource("drives", drives_pages or [], self.calls)
+        self.files_resource = FakeDriveResource("files", files_pages or [], self.calls)
+
+    def drives(self) -> FakeDriveResource:
+        return self.drives_resource
+
+    def files(self) -> FakeDriveResource:
+        return self.files_resource
+
+
+def make_http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), b"{}")
+
+
+def make_drive_service_with_fake_api(fake_api: FakeDriveApi) -> DriveService:
+    service = DriveService()
+    service.service = fake_api
+    return service
+
+
+def test_find_shared_drive_by_name_cachea_id_entre_llamadas() -> None:
+    fake_api = FakeDriveApi(
+        drives_pages=[
+            {"drives": [{"id": "drive-otro", "name": "Otro"}], "nextPageToken": "p2"},
+            {"drives": [{"id": "drive-acreditaciones", "name": "Acreditaciones"}]},
+        ]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+
+    assert service.find_shared_drive_by_name("Acreditaciones") == "drive-acreditaciones"
+    assert service.find_shared_drive_by_name("acreditaciones") == "drive-acreditaciones"
+
+    assert len(fake_api.calls) == 2
+    stats = service.cache_stats()["shared_drives"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_find_shared_drive_by_name_invalida_cache_ante_404() -> None:
+    fake_api = FakeDriveApi(
+        drives_pages=[
+            {"drives": [{"id": "drive-viejo", "name": "Acreditaciones"}]},
+            {"drives": [{"id": "drive-nuevo", "name": "Acreditaciones"}]},
+        ],
+        files_pages=[make_http_error(404)],
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+
+    assert service.find_shared_drive_by_name("Acreditaciones") == "drive-viejo"
+    assert service.list_folders_in_directory("drive-viejo", "drive-viejo") == []
+    assert service.find_shared_drive_by_name("Acreditaciones") == "drive-nuevo"
+    assert service.cache_stats()["shared_drives"]["invalidations"] == 1
+
+
+def test_list_folders_in_directory_cachea_listado_entre_busquedas() -> None:
+    fake_api = FakeDriveApi(
+        files_pages=[
+            {
+                "files": [
+                    {"id": "folder-externos", "name": "Externos"},
+                    {"id": "folder-myma", "name": "MYMA"},
+                ]
+            },
+            {"files": [{"id": "folder-externos-2", "name": "Externos"}]},
+        ]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+
+    assert (
+        service.find_folder_by_normalized_name_in_directory("externos", "proyecto", "drive")
+        == "folder-externos"
+    )
+    assert service.find_folder_containing_name("mym", "proyecto", "drive") == "folder-myma"
+    assert len(fake_api.calls) == 1
+
+    assert (
+        service.find_folder_by_normalized_name_in_directory(
+            "externos",
+            "proyecto",
+            "drive",
+            force_refresh=True,
+        )
+        == "folder-externos-2"
+    )
+    assert len(fake_api.calls) == 2
+    assert service.cache_stats()["folders"]["hits"] == 1
+
+
+def test_folder_cache_expulsa_lru_al_superar_limite_de_items() -> None:
+    cache = TTLCache(60, max_entries=10, max_weight=3, weigher=len)
+
+    cache.set(("drive", "a"), (("A", "a1"), ("B", "b1")))
+    cache.set(("drive", "b"), (("C", "c1"),))
+    assert cache.get(("drive", "a")) is not None
+    cache.set(("drive", "c"), (("D", "d1"),))
+
+    assert cache.get(("drive", "b")) is None
+    assert cache.get(("drive", "a")) is not None
+    assert cache.get(("drive", "c")) is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["weight"] == 3
+
+
+def test_find_folder_exact_or_contains_resuelve_con_un_solo_listado() -> None:
+    fake_api = FakeDriveApi(
+        files_pages=[
+            {
+                "files": [
+                    {"id": "folder-externos-antiguos", "name": "Externos Antiguos"},
+                    {"id": "folder-externos-minuscula", "name": "externos"},
+                    {"id": "folder-externos", "name": "Externos"},
+                    {"id": "folder-nlt-ingenieria", "name": "NLT Ingenieria"},
+                    {"id": "folder-nlt", "name": "nlt"},
+                ]
+            },
+        ]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+
+    assert service.find_folder_exact_or_contains("Externos", "proyecto", "drive") == (
+        "folder-externos"
+    )
+    assert service.find_folder_exact_or_contains("NLT", "proyecto", "drive") == "folder-nlt"
+    assert service.find_folder_exact_or_contains("Ingenieria", "proyecto", "drive") == (
+        "folder-nlt-ingenieria"
+    )
+    assert service.find_folder_exact_or_contains("AGQ", "proyecto", "drive") is None
+    assert len(fake_api.calls) == 1
+
+
+def test_find_folder_exact_or_contains_lista_padres_grandes_sin_tope() -> None:
+    fake_api = FakeDriveApi(
+        files_pages=[
+            {
+                "files": [
+                    {"id": f"folder-{position:04d}", "name": f"Carpeta {position:04d}"}
+                    for position in range(1000)
+                ],
+                "nextPageToken": "page-2",
+            },
+            {"files": [{"id": "folder-zeta", "name": "Zeta"}]},
+        ]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+
+    assert service.find_folder_exact_or_contains("Zeta", "proyecto", "drive") == "folder-zeta"
+    assert service.find_folder_exact_or_contains("Carpeta 0999", "proyecto", "drive") == (
+        "folder-0999"
+    )
+    assert len(fake_api.calls) == 2
+    assert len(service.list_folders_in_directory("proyecto", "drive")) == 1000
+
+
+def test_resolve_empresa_folders_consulta_multiples_padres_por_nivel() -> None:
+    fake_api = FakeDriveApi(
+        files_pages=[
+            {"files": [{"id": "externos-001", "name": "Externos", "parents": ["proyecto"]}]},
+            {
+                "files": [
+                    {"id": "empresa-agq", "name": "AGQ", "parents": ["externos-001"]},
+                    {"id": "empresa-nlt", "name": "NLT Ingenieria", "parents": ["externos-001"]},
+                ]
+            },
+            {
+                "files": [
+                    {"id": "agq-01", "name": "01 Empresa", "parents": ["empresa-agq"]},
+                    {"id": "agq-02", "name": "02 Trabajadores", "parents": ["empresa-agq"]},
+                    {"id": "nlt-01", "name": "01 - Empresa", "parents": ["empresa-nlt"]},
+                ]
+            },
+        ]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+
+    result = service.resolve_empresa_folders(["AGQ", "NLT", "Sin Carpeta"], "proyecto", "drive")
+
+    assert result == {"AGQ": "agq-01", "NLT": "nlt-01", "Sin Carpeta": None}
+    assert len(fake_api.calls) == 3
+    multi_parent_query = fake_api.calls[2][1]["q"]
+    assert "'empresa-agq' in parents or 'empresa-nlt' in parents" in multi_parent_query
+    assert service.list_folders_in_directory("empresa-nlt", "drive") == [
+        ("01 - Empresa", "nlt-01")
+    ]
+    assert len(fake_api.calls) == 3
+
+
+class FakeSequenceRequest:
+    def __init__(self, *results: Any):
+        self.results = list(results)
+
+    def execute(self) -> Any:
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class FakeBatchHttpRequest:
+    def __init__(self, callback, executions: List["FakeBatchHttpRequest"]):
+        self.callback = callback
+        self.requests: List[tuple] = []
+        executions.append(self)
+
+    def add(self, request: Any, request_id: str) -> None:
+        self.requests.append((request_id, request))
+
+    def execute(self) -> None:
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request.execute(), None)
+            except HttpError as error:
+                self.callback(request_id, None, error)
+
+
+class FakeBatchDriveApi(FakeDriveApi):
+    def __init__(self):
+        super().__init__()
+        self.batches: List[FakeBatchHttpRequest] = []
+
+    def new_batch_http_request(self, callback) -> FakeBatchHttpRequest:
+        return FakeBatchHttpRequest(callback, self.batches)
+
+
+def test_drive_batch_reintenta_solo_sub_respuestas_transitorias(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.drive_batch.time.sleep", lambda _seconds: None)
+    fake_api = FakeBatchDriveApi()
+    service = make_drive_service_with_fake_api(fake_api)
+
+    ok_request = FakeSequenceRequest({"files": [{"id": "a"}]})
+    transient_request = FakeSequenceRequest(make_http_error(503), {"files": [{"id": "b"}]})
+    missing_request = FakeSequenceRequest(make_http_error(404))
+
+    batch = service.new_batch()
+    ok_future = batch.add(ok_request)
+    transient_future = batch.add(transient_request)
+    missing_future = batch.add(missing_request)
+    batch.execute()
+
+    assert ok_future.result() == {"files": [{"id": "a"}]}
+    assert transient_future.result() == {"files": [{"id": "b"}]}
+    with pytest.raises(HttpError):
+        missing_future.result()
+    assert len(fake_api.batches) == 2
+    assert len(fake_api.batches[1].requests) == 1
+
+
+def test_list_folders_in_directories_libera_el_cliente_entre_reintentos(monkeypatch) -> None:
+    fake_api = FakeBatchDriveApi()
+    requests = [
+        FakeSequenceRequest(
+            make_http_error(503),
+            {"files": [{"id": "folder-0", "name": "01 Empresa", "parents": ["empresa-0"]}]},
+        ),
+        FakeSequenceRequest({"files": []}),
+    ]
+    monkeypatch.setattr(fake_api.files_resource, "list", lambda **_kwargs: requests.pop(0))
+    service = DriveService()
+    service.pool_size = 1
+    monkeypatch.setattr(service, "_build_client", lambda: fake_api)
+    available_while_sleeping: List[int] = []
+    monkeypatch.setattr(
+        "app.services.drive_batch.time.sleep",
+        lambda _seconds: available_while_sleeping.append(service.pool_stats()["available"]),
+    )
+
+    listings = service.list_folders_in_directories(
+        [f"empresa-{numero}" for numero in range(31)],
+        "drive",
+    )
+
+    assert listings["empresa-0"] == [("01 Empresa", "folder-0")]
+    assert available_while_sleeping == [1]
+
+
+def test_list_folders_in_directories_degrada_sin_cliente_libre(monkeypatch) -> None:
+    service = DriveService()
+    service.pool_size = 1
+    monkeypatch.setattr(service, "_build_client", FakeBatchDriveApi)
+    held = threading.Event()
+    release = threading.Event()
+
+    def holder() -> None:
+        with service._checkout_service():
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait(5)
+    parent_ids = [f"empresa-{numero}" for numero in range(31)]
+    try:
+        with request_budget(0.1):
+            listings = service.list_folders_in_directories(parent_ids, "drive")
+            indexes = service.get_folder_indexes(parent_ids, "drive")
+    finally:
+        release.set()
+        thread.join()
+
+    assert listings == {parent_id: [] for parent_id in parent_ids}
+    assert not any(index.complete for index in indexes.values())
+
+
+def test_list_folders_in_directories_envia_bloques_en_un_solo_batch() -> None:
+    fake_api = FakeBatchDriveApi()
+    parent_ids = [f"empresa-{numero}" for numero in range(31)]
+    fake_api.files_resource.pages = [
+        {"files": [{"id": "folder-0", "name": "01 Empresa", "parents": ["empresa-0"]}]},
+        {"files": [{"id": "folder-30", "name": "01 Empresa", "parents": ["empresa-30"]}]},
+    ]
+    service = make_drive_service_with_fake_api(fake_api)
+
+    listings = service.list_folders_in_directories(parent_ids, "drive")
+
+    assert len(fake_api.batches) == 1
+    assert len(fake_api.batches[0].requests) == 2
+    assert listings["empresa-0"] == [("01 Empresa", "folder-0")]
+    assert listings["empresa-30"] == [("01 Empresa", "folder-30")]
+    assert listings["empresa-15"] == []
+
+
+def test_drive_client_pool_inicializa_una_vez_y_no_comparte_clientes(monkeypatch) -> None:
+    service = DriveService()
+    service.pool_size = 2
+    built_clients: List[object] = []
+    build_lock = threading.Lock()
+
+    def fake_build_client() -> object:
+        with build_lock:
+            client = object()
+            built_clients.append(client)
+        time.sleep(0.01)
+        return client
+
+    monkeypatch.setattr(service, "_build_client", fake_build_client)
+    in_use: set = set()
+    overlaps: List[object] = []
+    in_use_lock = threading.Lock()
+
+    def worker() -> None:
+        with service._checkout_service() as client:
+            with in_use_lock:
+                if id(client) in in_use:
+                    overlaps.append(client)
+                in_use.add(id(client))
+            with service._checkout_service() as nested_client:
+                assert nested_client is client
+            time.sleep(0.005)
+            with in_use_lock:
+                in_use.discard(id(client))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(built_clients) == 2
+    assert overlaps == []
+    stats = service.pool_stats()
+    assert stats["checkouts"] == 8
+    assert stats["available"] == 2
+    assert stats["wait_seconds_max"] > 0
+
+
+def test_drive_client_pool_acota_espera_al_presupuesto(monkeypatch) -> None:
+    service = DriveService()
+    service.pool_size = 1
+    monkeypatch.setattr(service, "_build_client", object)
+    held = threading.Event()
+    release = threading.Event()
+
+    def holder() -> None:
+        with service._checkout_service():
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait(5)
+    try:
+        with request_budget(0.05):
+            with pytest.raises(ClientPoolTimeout):
+                with service._checkout_service():
+                    pass
+    finally:
+        release.set()
+        thread.join()
+
+    assert service.pool_stats()["available"] == 1
+
+
+def make_http_error_with_headers(status: int, headers: Dict[str, str]) -> HttpError:
+    return HttpError(httplib2.Response({"status": status, **headers}), b"{}")
+
+
+def test_execute_with_retry_respeta_retry_after(monkeypatch) -> None:
+    sleeps: List[float] = []
+    monkeypatch.setattr("app.services.retry.time.sleep", sleeps.append)
+    request = FakeSequenceRequest(
+        make_http_error_with_headers(429, {"retry-after": "3"}),
+        make_http_error(503),
+        {"ok": True},
+    )
+    policy = RetryPolicy(max_attempts=5, base_delay_seconds=0.5, max_delay_seconds=8)
+
+    assert execute_with_retry(request.execute, policy) == {"ok": True}
+    assert sleeps[0] == 3
+    assert 0 <= sleeps[1] <= 1.0
+
+
+def test_execute_with_retry_no_acota_retry_after_a_max_delay(monkeypatch) -> None:
+    sleeps: List[float] = []
+    monkeypatch.setattr("app.services.retry.time.sleep", sleeps.append)
+    request = FakeSequenceRequest(
+        make_http_error_with_headers(429, {"retry-after": "20"}),
+        {"ok": True},
+    )
+    policy = RetryPolicy(max_attempts=3, base_delay_seconds=0.5, max_delay_seconds=8)
+
+    with request_budget(30):
+        assert execute_with_retry(request.execute, policy) == {"ok": True}
+    assert sleeps == [20]
+
+
+def test_execute_with_retry_acota_retry_after_sin_presupuesto(monkeypatch) -> None:
+    sleeps: List[float] = []
+    monkeypatch.setattr("app.services.retry.time.sleep", sleeps.append)
+    request = FakeSequenceRequest(
+        make_http_error_with_headers(429, {"retry-after": "3600"}),
+        {"ok": True},
+    )
+    policy = RetryPolicy(max_unbudgeted_retry_after_seconds=30)
+
+    assert execute_with_retry(request.execute, policy) == {"ok": True}
+    assert sleeps == [30]
+
+
+def test_execute_with_retry_no_reintenta_errores_de_programacion(monkeypatch) -> None:
+    sleeps: List[float] = []
+    monkeypatch.setattr("app.services.retry.time.sleep", sleeps.append)
+    request = FakeSequenceRequest(KeyError("files"), {"ok": True})
+
+    with pytest.raises(KeyError):
+        execute_with_retry(request.execute, RetryPolicy())
+    assert sleeps == []
+
+    transport_request = FakeSequenceRequest(TimeoutError("timed out"), {"ok": True})
+    assert execute_with_retry(transport_request.execute, RetryPolicy()) == {"ok": True}
+
+
+def test_execute_with_retry_corta_cuando_no_alcanza_el_presupuesto(monkeypatch) -> None:
+    sleeps: List[float] = []
+    monkeypatch.setattr("app.services.retry.time.sleep", sleeps.append)
+    request = FakeSequenceRequest(
+        make_http_error_with_headers(503, {"retry-after": "5"}),
+        {"ok": True},
+    )
+
+    with request_budget(2):
+        with pytest.raises(HttpError):
+            execute_with_retry(request.execute, RetryPolicy())
+    assert sleeps == []
+
+
+def test_resolve_acreditacion_root_cachea_rutas_y_negativos(monkeypatch) -> None:
+    service = DriveService()
+    lookups: List[str] = []
+    existing = {
+        ("Acreditaciones", "drive-acreditaciones"): "acreditaciones-root",
+        ("Proyectos 2026", "acreditaciones-root"): "proyectos-2026",
+        ("MY-000-2026", "proyectos-2026"): "my-000-2026",
+    }
+
+    def mock_find_folder_exact_or_contains(
+        folder_name: str,
+        parent_id: str,
+        drive_id: Optional[str] = None,
+        ignore_numeric_prefix: bool = False,
+    ) -> Optional[str]:
+        lookups.append(folder_name)
+        return existing.get((folder_name, parent_id))
+
+    monkeypatch.setattr(
+        service,
+        "find_folder_exact_or_contains",
+        mock_find_folder_exact_or_contains,
+    )
+    parent_ctx = {
+        "parent_drive_id": "drive-acreditaciones",
+        "drive_name": "Acreditaciones",
+        "year": "2026",
+    }
+
+    # El negativo solo se cachea si el listado del padre quedo completo.
+    service._folder_cache.set(
+        ("drive-acreditaciones", "proyectos-2026"),
+        FolderIndex([("MY-000-2026", "my-000-2026")]),
+    )
+
+    first = service.resolve_acreditacion_root("MY-000-2026", parent_ctx=parent_ctx)
+    second = service.resolve_acreditacion_root("MY-000-2026", parent_ctx=parent_ctx)
+    assert first == second
+    assert first["id_carpeta_proyecto"] == "my-000-2026"
+    assert len(lookups) == 3
+
+    assert service.resolve_acreditacion_root("MY-999-2026", parent_ctx=parent_ctx) is None
+    assert service.resolve_acreditacion_root("MY-999-2026", parent_ctx=parent_ctx) is None
+    assert lookups.count("MY-999-2026") == 1
+
+    service.service = FakeDriveApi(files_pages=[make_http_error(404)])
+    assert service.list_folders_in_directory("my-000-2026", "drive-acreditaciones") == []
+    service.resolve_acreditacion_root("MY-000-2026", parent_ctx=parent_ctx)
+    assert lookups.count("MY-000-2026") == 2
+
+
+def test_404_bajo_un_proyecto_solo_invalida_su_ruta() -> None:
+    service = make_drive_service_with_fake_api(
+        FakeDriveApi(files_pages=[make_http_error(404)])
+    )
+    service._shared_drive_cache.set("acreditaciones", "drive-acreditaciones")
+    service._folder_cache.set(
+        ("drive-acreditaciones", "drive-acreditaciones"),
+        FolderIndex([("Acreditaciones", "acreditaciones-root")]),
+    )
+    for codigo in ("MY-000-2026", "MY-001-2026", "MY-002-2026"):
+        service._project_root_cache.set(
+            ("drive-acreditaciones", codigo),
+            {
+                "drive_id": "drive-acreditaciones",
+                "id_carpeta_acreditaciones": "acreditaciones-root",
+                "id_carpeta_proyectos_anio": "proyectos-2026",
+                "id_carpeta_proyecto": codigo.lower(),
+                "codigo_proyecto": codigo,
+            },
+        )
+
+    assert service.list_folders_in_directory("my-000-2026", "drive-acreditaciones") == []
+
+    assert service._project_root_cache.get(("drive-acreditaciones", "MY-000-2026")) is None
+    assert service._project_root_cache.get(("drive-acreditaciones", "MY-001-2026")) is not None
+    assert service._project_root_cache.get(("drive-acreditaciones", "MY-002-2026")) is not None
+    assert service._shared_drive_cache.get("acreditaciones") == "drive-acreditaciones"
+    assert service._folder_cache.peek(("drive-acreditaciones", "drive-acreditaciones")) is not None
+
+    service.service = FakeDriveApi(files_pages=[make_http_error(404)])
+    service.list_folders_in_directory(
+        "drive-acreditaciones",
+        "drive-acreditaciones",
+        force_refresh=True,
+    )
+    assert service._shared_drive_cache.get("acreditaciones") is None
+    assert service._project_root_cache.get(("drive-acreditaciones", "MY-001-2026")) is None
+
+
+def test_resolve_acreditacion_root_no_cachea_negativo_si_listado_falla(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.retry.time.sleep", lambda _seconds: None)
+    fake_api = FakeDriveApi(
+        files_pages=[
+            make_http_error(503),
+            {"files": [{"id": "acreditaciones-root", "name": "Acreditaciones"}]},
+            {"files": [{"id": "proyectos-2026", "name": "Proyectos 2026"}]},
+            {"files": [{"id": "my-000-2026", "name": "MY-000-2026"}]},
+        ]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+    parent_ctx = {
+        "parent_drive_id": "drive-acreditaciones",
+        "drive_name": "Acreditaciones",
+        "year": "2026",
+    }
+
+    assert service.resolve_acreditacion_root("MY-000-2026", parent_ctx=parent_ctx) is None
+    assert service.drive_available()
+
+    project_root = service.resolve_acreditacion_root("MY-000-2026", parent_ctx=parent_ctx)
+    assert project_root is not None
+    assert project_root["id_carpeta_acreditaciones"] == "acreditaciones-root"
+    assert project_root["id_carpeta_proyecto"] == "my-000-2026"
+
+
+def test_drive_service_warm_up_no_reserva_cliente_del_pool(monkeypatch) -> None:
+    service = DriveService()
+    service.pool_size = 1
+    monkeypatch.setattr(service, "_build_client", object)
+    available_during_warm_up: List[int] = []
+
+    def mock_find_shared_drive_by_name(_name: str) -> Optional[str]:
+        available_during_warm_up.append(service.pool_stats()["available"])
+        return None
+
+    monkeypatch.setattr(service, "find_shared_drive_by_name", mock_find_shared_drive_by_name)
+
+    assert service.warm_up(years=["2026"]) == {"drive_id": None, "proyectos": {}}
+    assert available_during_warm_up == [1]
+
+
+def test_drive_service_warm_up_precarga_proyectos_por_anio() -> None:
+    fake_api = FakeBatchDriveApi()
+    fake_api.drives_resource.pages = [
+        {"drives": [{"id": "drive-acreditaciones", "name": "Acreditaciones"}]},
+    ]
+    fake_api.files_resource.pages = [
+        {"files": [{"id": "acreditaciones-root", "name": "Acreditaciones"}]},
+        {
+            "files": [
+                {"id": "proyectos-2025", "name": "Proyectos 2025"},
+                {"id": "proyectos-2026", "name": "Proyectos 2026"},
+            ]
+        },
+        {
+            "files": [
+                {"id": "my-000-2025", "name": "MY-000-2025", "parents": ["proyectos-2025"]},
+                {"id": "my-000-2026", "name": "MY-000-2026", "parents": ["proyectos-2026"]},
+                {"id": "my-001-2026", "name": "MY-001-2026", "parents": ["proyectos-2026"]},
+            ]
+        },
+    ]
+    service = make_drive_service_with_fake_api(fake_api)
+
+    summary = service.warm_up(["2026", "2025"])
+
+    assert summary == {
+        "drive_id": "drive-acreditaciones",
+        "proyectos": {"2026": 2, "2025": 1},
+    }
+    calls_after_warm_up = len(fake_api.calls)
+    root = service.resolve_acreditacion_root("MY-001-2026")
+    assert root is not None
+    assert root["id_carpeta_proyecto"] == "my-001-2026"
+    assert len(fake_api.calls) == calls_after_warm_up
+
+
+def test_lifespan_no_bloquea_health_si_warm_up_falla(monkeypatch) -> None:
+    def failing_warm_up(years: Optional[List[str]] = None) -> None:
+        raise RuntimeError("drive no disponible")
+
+    monkeypatch.setattr(settings, "DRIVE_WARMUP_ENABLED", True)
+    monkeypatch.setattr(drive_service, "warm_up", failing_warm_up)
+
+    with TestClient(app) as lifespan_client:
+        response = lifespan_client.get("/health")
+
+    assert response.status_code == 200
+
+
+class FakeChangesResource(FakeDriveResource):
+    def getStartPageToken(self, **kwargs: Any) -> FakeDriveRequest:
+        self.calls.append(("changes.start", kwargs))
+        return FakeDriveRequest({"startPageToken": "token-1"})
+
+
+class FakeChangesDriveApi(FakeDriveApi):
+    def __init__(self, files_pages: List[Any], changes_pages: List[Any]):
+        super().__init__(files_pages=files_pages)
+        self.changes_resource = FakeChangesResource("changes", changes_pages, self.calls)
+
+    def changes(self) -> FakeChangesResource:
+        return self.changes_resource
+
+
+def test_changes_watcher_invalida_solo_listados_afectados() -> None:
+    fake_api = FakeChangesDriveApi(
+        files_pages=[
+            {"files": [{"id": "folder-a1", "name": "A1"}]},
+            {"files": [{"id": "folder-b1", "name": "B1"}]},
+            {"files": [{"id": "folder-a1", "name": "A1"}, {"id": "folder-a2", "name": "A2"}]},
+        ],
+        changes_pages=[
+            {
+                "changes": [
+                    {
+                        "fileId": "folder-a2",
+                        "file": {
+                            "id": "folder-a2",
+                            "name": "A2",
+                            "mimeType": "application/vnd.google-apps.folder",
+                            "parents": ["parent-a"],
+                        },
+                    },
+                    {
+                        "fileId": "doc-1",
+                        "file": {"id": "doc-1", "mimeType": "application/pdf", "parents": ["parent-b"]},
+                    },
+                ],
+                "newStartPageToken": "token-2",
+            },
+            make_http_error(500),
+        ],
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+    service.retry_policy = RetryPolicy(max_attempts=1)
+    watcher = DriveChangesWatcher(service, "Acreditaciones", drive_id="drive")
+    service.changes_watcher = watcher
+    assert watcher.initialize() is True
+
+    service.list_folders_in_directory("parent-a", "drive")
+    service.list_folders_in_directory("parent-b", "drive")
+
+    assert watcher.poll_once() == 2
+    assert watcher.page_token == "token-2"
+    assert service.list_folders_in_directory("parent-b", "drive") == [("B1", "folder-b1")]
+    assert service.list_folders_in_directory("parent-a", "drive") == [
+        ("A1", "folder-a1"),
+        ("A2", "folder-a2"),
+    ]
+    assert len([call for call in fake_api.calls if call[0] == "files"]) == 3
+
+    # Un poll fallido descarta el cursor y los listados del drive.
+    watcher.poll_once()
+    assert watcher.healthy is False
+    assert watcher.page_token is None
+    assert service.cache_stats()["folders"]["entries"] == 0
+
+
+def test_snapshot_de_carpetas_restaura_listados_tras_reinicio(tmp_path) -> None:
+    snapshot_path = str(tmp_path / "drive_snapshot.sqlite")
+    fake_api = FakeDriveApi(
+        drives_pages=[{"drives": [{"id": "drive", "name": "Acreditaciones"}]}],
+        files_pages=[
+            {"files": [{"id": "folder-2026", "name": "Proyectos 2026"}]},
+            {"files": []},
+        ],
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+    service.find_shared_drive_by_name("Acreditaciones")
+    service.list_folders_in_directory("root", "drive")
+    service.list_folders_in_directory("vacia", "drive")
+    assert service.save_snapshot(snapshot_path) == 2
+
+    restarted_api = FakeDriveApi()
+    restarted = make_drive_service_with_fake_api(restarted_api)
+    assert restarted.load_snapshot(snapshot_path) == 2
+
+    assert restarted.find_shared_drive_by_name("Acreditaciones") == "drive"
+    assert restarted.list_folders_in_directory("root", "drive") == [
+        ("Proyectos 2026", "folder-2026")
+    ]
+    assert restarted.list_folders_in_directory("vacia", "drive") == []
+    assert restarted_api.calls == []
+
+
+def test_snapshot_retoma_cursor_de_cambios_para_validar_listados(tmp_path, monkeypatch) -> None:
+    snapshot_path = str(tmp_path / "drive_snapshot.sqlite")
+    monkeypatch.setattr(settings, "DRIVE_CHANGES_ENABLED", True)
+    service = make_drive_service_with_fake_api(FakeDriveApi())
+    watcher = DriveChangesWatcher(service, "Acreditaciones", drive_id="drive")
+    watcher.page_token = "token-guardado"
+    watcher.healthy = True
+    service.changes_watcher = watcher
+    service._folder_cache.set(("drive", "root"), FolderIndex([("A", "folder-a")]), ttl_seconds=86400)
+    service.save_snapshot(snapshot_path)
+
+    restarted = make_drive_service_with_fake_api(FakeDriveApi())
+    restarted.load_snapshot(snapshot_path)
+    restored = {key: ttl for key, _folders, ttl in restarted._folder_cache.items()}
+    assert restored[("drive", "root")] > settings.DRIVE_FOLDER_CACHE_TTL_SECONDS
+    assert restarted._snapshot_cursor == ("drive", "token-guardado")
+
+
+def test_listado_cacheado_guarda_indice_con_claves_normalizadas() -> None:
+    fake_api = FakeDriveApi(
+        files_pages=[
+            {
+                "files": [
+                    {"id": "folder-empresa", "name": "01 Empresa"},
+                    {"id": "folder-acciona", "name": "Acciona Construcción"},
+                ]
+            }
+        ]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+
+    index = service.get_folder_index("externos", "drive")
+    assert service.get_folder_index("externos", "drive") is index
+    assert index.normalized_names == ["01 empresa", "acciona construccion"]
+    assert index.base_labels == ["empresa", "acciona construccion"]
+    assert "folder-acciona" in index.folder_ids
+
+    normalize_name.cache_clear()
+    assert service.find_folder_by_normalized_name_in_directory(
+        "ACCIONA CONSTRUCCION", "externos", "drive"
+    ) == "folder-acciona"
+    assert service.find_folder_by_normalized_name_in_directory(
+        "acciona construccion", "externos", "drive"
+    ) == "folder-acciona"
+    # Solo se normalizan los nombres buscados; el listado ya trae sus claves.
+    assert normalize_name.cache_info().misses == 2
+    assert len(fake_api.calls) == 1
+
+
+def test_folder_index_contains_con_trigramas_respeta_primer_match() -> None:
+    folders = [
+        ("01 Empresa", "folder-empresa"),
+        ("Acciona Construcción", "folder-acciona"),
+        ("Constructora Acciona Sur", "folder-acciona-sur"),
+        ("NLT", "folder-nlt"),
+        ("02 Trabajadores", "folder-trabajadores"),
+    ]
+    index = FolderIndex(folders)
+
+    def linear_scan(part: str, ignore_numeric_prefix: bool = False) -> Optional[str]:
+        candidates = index.base_labels if ignore_numeric_prefix else index.normalized_names
+        search = normalize_name(part)
+        if ignore_numeric_prefix:
+            search = normalize_base_folder_label(part)
+        for position, candidate in enumerate(candidates):
+            if search in candidate:
+                return folders[position][1]
+        return None
+
+    searches = ["acciona", "ACCIONA SUR", "construc", "nl", "empresa", "01 emp", "xyz", "tora acc"]
+    for search in searches:
+        for ignore_numeric_prefix in (False, True):
+            assert index.find_containing(search, ignore_numeric_prefix) == linear_scan(
+                search, ignore_numeric_prefix
+            )
+
+    assert index.find_containing("acciona") == "folder-acciona"
+    assert index.find_containing("acciona sur") == "folder-acciona-sur"
+    ngrams = index._ngrams_by_normalized
+    index.find_containing("trabajador")
+    assert index._ngrams_by_normalized is ngrams
+
+
+def test_single_flight_coalesce_resoluciones_concurrentes_de_proyecto() -> None:
+    release = threading.Event()
+    started = threading.Event()
+
+    class SlowRequest(FakeDriveRequest):
+        def execute(self) -> Any:
+            started.set()
+            assert release.wait(timeout=5)
+            return super().execute()
+
+    class SlowFilesResource(FakeDriveResource):
+        def list(self, **kwargs: Any) -> FakeDriveRequest:
+            self.calls.append((self.name, kwargs))
+            return SlowRequest(self.pages.pop(0))
+
+    fake_api = FakeDriveApi(
+        drives_pages=[{"drives": [{"id": "drive", "name": "Acreditaciones"}]}],
+        files_pages=[
+            {"files": [{"id": "folder-acreditaciones", "name": "Acreditaciones"}]},
+            {"files": [{"id": "folder-2026", "name": "Proyectos 2026"}]},
+            {"files": [{"id": "folder-my-001", "name": "MY-001-2026"}]},
+        ],
+    )
+    fake_api.files_resource = SlowFilesResource("files", fake_api.files_resource.pages, fake_api.calls)
+    service = make_drive_service_with_fake_api(fake_api)
+    service.find_shared_drive_by_name("Acreditaciones")
+
+    results: List[Optional[Dict[str, str]]] = []
+    threads = [
+        threading.Thread(target=lambda: results.append(service.resolve_acreditacion_root("MY-001-2026")))
+        for _ in range(4)
+    ]
+    threads[0].start()
+    assert started.wait(timeout=5)
+    for thread in threads[1:]:
+        thread.start()
+    while service.cache_stats()["single_flight"]["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert [root["id_carpeta_proyecto"] for root in results] == ["folder-my-001"] * 4
+    assert len([call for call in fake_api.calls if call[0] == "files"]) == 3
+    assert service.cache_stats()["single_flight"]["coalesced"] == 3
+
+
+def test_single_flight_seguidor_respeta_su_presupuesto() -> None:
+    release = threading.Event()
+    started = threading.Event()
+
+    class SlowRequest(FakeDriveRequest):
+        def execute(self) -> Any:
+            started.set()
+            assert release.wait(timeout=5)
+            return super().execute()
+
+    class SlowDrivesResource(FakeDriveResource):
+        def list(self, **kwargs: Any) -> FakeDriveRequest:
+            self.calls.append((self.name, kwargs))
+            return SlowRequest(self.pages.pop(0))
+
+    fake_api = FakeDriveApi()
+    fake_api.drives_resource = SlowDrivesResource(
+        "drives",
+        [{"drives": [{"id": "drive", "name": "Acreditaciones"}]}],
+        fake_api.calls,
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+    # Lider de fondo sin presupuesto (como el watcher al iniciar).
+    leader = threading.Thread(target=service.find_shared_drive_by_name, args=("Acreditaciones",))
+    leader.start()
+    assert started.wait(timeout=5)
+
+    try:
+        with request_budget(0.05):
+            started_at = time.monotonic()
+            assert service.find_shared_drive_by_name("Acreditaciones") is None
+            assert time.monotonic() - started_at < 1
+    finally:
+        release.set()
+        leader.join(timeout=5)
+
+    assert service.find_shared_drive_by_name("Acreditaciones") == "drive"
+
+
+def write_token_file(path: Any, token: str, expires_in_seconds: float) -> None:
+    expiry = datetime.datetime.utcnow() + datetime.timedelta(seconds=expires_in_seconds)
+    path.write_text(
+        json.dumps(
+            {
+                "token": token,
+                "refresh_token": "refresh-prueba",
+                "client_id": "client-id",
+                "client_secret": "client-secret",
+                "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        ),
+        encoding="utf-8",
+    )
+
+
+def test_credential_manager_refresca_antes_de_expirar_y_comparte_entre_workers(
+    tmp_path,
+    monkeypatch,
+) -> None:
+    token_path = tmp_path / "token.json"
+    write_token_file(token_path, "token-viejo", expires_in_seconds=600)
+    refresh_calls: List[str] = []
+
+    def fake_refresh(creds: Credentials, _request: Any) -> None:
+        refresh_calls.append(creds.token)
+        creds.token = "token-nuevo"
+        creds.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    monkeypatch.setattr(Credentials, "refresh", fake_refresh)
+    worker_a, worker_b = (
+        CredentialManager(
+            str(token_path),
+            ["scope"],
+            refresh_margin_seconds=900,
+            request_factory=object,
+        )
+        for _ in range(2)
+    )
+    assert worker_a.get().token == "token-viejo"
+    assert worker_b.get().token == "token-viejo"
+
+    assert worker_a.refresh().token == "token-nuevo"
+    assert json.loads(token_path.read_text(encoding="utf-8"))["token"] == "token-nuevo"
+
+    # El segundo worker adopta el token del archivo en vez de refrescar otra vez.
+    assert worker_b.refresh().token == "token-nuevo"
+    assert refresh_calls == ["token-viejo"]
+    assert worker_b.stats()["adopted"] == 1
+
+
+def test_credential_manager_escribe_en_el_lugar_si_no_puede_renombrar(
+    tmp_path,
+    monkeypatch,
+) -> None:
+    token_path = tmp_path / "token.json"
+    write_token_file(token_path, "token-viejo", expires_in_seconds=-60)
+
+    def fake_refresh(creds: Credentials, _request: Any) -> None:
+        creds.token = "token-nuevo"
+        creds.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    def failing_replace(_src: str, _dst: str) -> None:
+        raise OSError(16, "Device or resource busy")
+
+    monkeypatch.setattr(Credentials, "refresh", fake_refresh)
+    monkeypatch.setattr(os, "replace", failing_replace)
+    manager = CredentialManager(str(token_path), ["scope"], request_factory=object)
+
+    assert manager.get().token == "token-nuevo"
+    assert json.loads(token_path.read_text(encoding="utf-8"))["token"] == "token-nuevo"
+    assert [path.name for path in tmp_path.iterdir()] == ["token.json"]
+
+
+def test_credential_manager_no_inicia_flujo_interactivo_sin_token(tmp_path) -> None:
+    manager = CredentialManager(str(tmp_path / "token.json"), ["scope"])
+
+    with pytest.raises(CredentialsUnavailableError):
+        manager.get()
+
+
+def test_credential_manager_refresca_sin_flock(tmp_path, monkeypatch) -> None:
+    token_path = tmp_path / "token.json"
+    write_token_file(token_path, "token-viejo", expires_in_seconds=-60)
+
+    def fake_refresh(creds: Credentials, _request: Any) -> None:
+        creds.token = "token-nuevo"
+        creds.expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    monkeypatch.setattr(Credentials, "refresh", fake_refresh)
+    monkeypatch.setattr("app.services.credentials.fcntl", None)
+    manager = CredentialManager(str(token_path), ["scope"], request_factory=object)
+
+    assert manager.get().token == "token-nuevo"
+    assert json.loads(token_path.read_text(encoding="utf-8"))["token"] == "token-nuevo"
+
+
+def test_credential_manager_sin_token_avisa_una_sola_vez(tmp_path, caplog) -> None:
+    manager = CredentialManager(
+        str(tmp_path / "token.json"),
+        ["scope"],
+        check_interval_seconds=0.01,
+    )
+
+    with caplog.at_level(logging.WARNING, logger="app.services.credentials"):
+        manager.start()
+        time.sleep(0.1)
+        manager.stop(timeout=1)
+
+    records = [record for record in caplog.records if record.name == "app.services.credentials"]
+    assert len(records) == 1
+    assert "token.json" in records[0].getMessage()
+    assert manager.stats()["failures"] == 0
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_suaviza_rafagas_y_expone_esperas() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(2.0, burst=2, clock=clock, sleep=clock.sleep)
+
+    assert [bucket.acquire() for _ in range(4)] == [0.0, 0.0, 0.5, 0.5]
+    stats = bucket.stats()
+    assert stats["waits"] == 2
+    assert stats["wait_seconds_total"] == 1.0
+    assert stats["tokens"] == 0.0
+
+    clock.now += 10
+    assert bucket.stats()["tokens"] == 2.0
+    with pytest.raises(RateLimitTimeout):
+        bucket.acquire(tokens=5, timeout=0.5)
+    assert bucket.stats()["tokens"] == 2.0
+
+
+def test_token_bucket_comparte_cupo_entre_workers_via_archivo(tmp_path) -> None:
+    clock = FakeClock()
+    state_file = str(tmp_path / "drive-rate-limit.json")
+    worker_a = TokenBucket(1.0, burst=2, state_file=state_file, clock=clock, sleep=clock.sleep)
+    worker_b = TokenBucket(1.0, burst=2, state_file=state_file, clock=clock, sleep=clock.sleep)
+
+    assert worker_a.acquire(tokens=2) == 0.0
+    assert worker_b.acquire() == 1.0
+    assert worker_a.stats()["shared"] is True
+
+
+def test_token_bucket_sin_flock_limita_en_el_proceso(tmp_path, monkeypatch) -> None:
+    # Simula Windows: importar fcntl falla.
+    monkeypatch.setitem(sys.modules, "fcntl", None)
+    clock = FakeClock()
+    state_file = tmp_path / "drive-rate-limit.json"
+    bucket = TokenBucket(1.0, burst=2, state_file=str(state_file), clock=clock, sleep=clock.sleep)
+
+    assert bucket.acquire(tokens=2) == 0.0
+    assert bucket.acquire() == 1.0
+    assert bucket.stats()["shared"] is False
+    assert not state_file.exists()
+
+
+def test_drive_service_consume_cupo_por_intento_y_por_sub_request(monkeypatch) -> None:
+    fake_api = FakeBatchDriveApi()
+    fake_api.files_resource.pages.append({"files": []})
+    service = make_drive_service_with_fake_api(fake_api)
+    service.rate_limiter = TokenBucket(1.0, burst=100)
+
+    service.list_folders_in_directory("parent", "drive")
+    batch = service.new_batch()
+    batch.add(FakeSequenceRequest({"files": []}))
+    batch.add(FakeSequenceRequest({"files": []}))
+    batch.execute()
+
+    stats = service.rate_limit_stats()
+    assert stats["acquired"] == 2
+    assert stats["tokens"] < 98
+
+
+def test_circuit_breaker_abre_prueba_en_half_open_y_cierra() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker("drive.files.list", failure_threshold=2, reset_timeout_seconds=30, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 30
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # Solo una llamada de prueba a la vez.
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.snapshot() == {
+        "state": "closed",
+        "consecutive_failures": 0,
+        "times_opened": 2,
+        "rejected": 2,
+    }
+
+
+def test_circuito_abierto_de_drive_falla_rapido_y_router_omite_drive(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.retry.time.sleep", lambda _seconds: None)
+    fake_api = FakeDriveApi(
+        files_pages=[make_http_error(503), {"files": [{"name": "A", "id": "a"}]}]
+    )
+    service = make_drive_service_with_fake_api(fake_api)
+    service.circuit_breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout_seconds=30)
+
+    assert service.list_folders_in_directory("parent", "drive") == []
+    assert len(fake_api.calls) == 1
+    assert service.drive_available() is False
+
+    # Con el circuito abierto la request no se ejecuta.
+    assert service.list_folders_in_directory("parent", "drive") == []
+    assert service.circuit_breaker_states()["drive.files.list"]["rejected"] == 1
+
+    def fail_if_called(*_args: Any, **_kwargs: Any) -> None:
+        raise AssertionError("Drive no debe consultarse con el circuito abierto")
+
+    monkeypatch.setattr(drive_service, "circuit_breakers", service.circuit_breakers)
+    monkeypatch.setattr(drive_service, "resolve_parent_drive_context", fail_if_called)
+    monkeypatch.setattr(drive_service, "resolve_acreditacion_root", fail_if_called)
+    monkeypatch.setattr(
+        supabase_service,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        bulk_update(fail_if_called),
+    )
+
+    response = client.post(
+        "/asignar-folder",
+        json={
+            "codigo_proyecto": "MY-000-2026",
+            "registros": [
+                {
+                    "id": 1,
+                    "nombre_trabajador": "Empresa",
+                    "categoria_requerimiento": "Empresa",
+                    "empresa_acreditacion": "Myma",
+                }
+            ],
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["resumen"]["sin_drive_folder_id"] == 1
+
+    health = client.get("/health").json()
+    assert health["status"] == "degraded"
+    assert health["circuit_breakers"]["drive.files.list"]["state"] == "open"
+
+
+def test_supabase_tiene_un_circuito_por_tabla() -> None:
+    service, fake_client = make_supabase_service_with_fake_client([])
+    service.circuit_breakers = CircuitBreakerRegistry(failure_threshold=1)
+
+    def fail_execute() -> None:
+        raise httpx.ConnectError("supabase caido")
+
+    fake_client.query.execute = fail_execute  # type: ignore[method-assign]
+
+    assert service.buscar_drive_folder_id_trabajador(1, "Juan") is None
+    assert service.circuit_breakers.is_open("supabase.fct_acreditacion_solicitud_trabajador_manual")
+    assert not service.circuit_breakers.is_open(
+        "supabase.fct_acreditacion_solicitud_conductor_manual"
+    )
+    assert service.circuit_breaker_states()[
+        "supabase.fct_acreditacion_solicitud_trabajador_manual"
+    ]["state"] == "open"
+
+
+def test_supabase_circuito_ignora_errores_de_la_consulta() -> None:
+    service, fake_client = make_supabase_service_with_fake_client([])
+    service.circuit_breakers = CircuitBreakerRegistry(failure_threshold=1)
+    errors: List[Exception] = [
+        APIError({"code": "PGRST202", "message": "Could not find the function"}),
+        APIError({"code": "23505", "message": "duplicate key value"}),
+        APIError({"code": "PGRST001", "message": "Database client error"}),
+    ]
+
+    def fail_execute() -> None:
+        raise errors.pop(0)
+
+    fake_client.query.execute = fail_execute  # type: ignore[method-assign]
+    circuit = "supabase.fct_acreditacion_solicitud_trabajador_manual"
+
+    assert service.buscar_drive_folder_id_trabajador(1, "Juan") is None
+    assert service.buscar_drive_folder_id_trabajador(1, "Juan") is None
+    assert not service.circuit_breakers.is_open(circuit)
+    assert service.buscar_drive_folder_id_trabajador(1, "Juan") is None
+    assert service.circuit_breakers.is_open(circuit)
+
+
+def test_metricas_de_request_cuentan_reintentos_y_cache_hits(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.retry.time.sleep", lambda _seconds: None)
+    fake_api = FakeDriveApi(files_pages=[{"files": [{"name": "A", "id": "a"}]}])
+    service = make_drive_service_with_fake_api(fake_api)
+
+    with collect_request_metrics() as metrics:
+        service._execute_with_retry(FakeSequenceRequest(make_http_error(503), {"ok": True}))
+        service.list_folders_in_directory("parent", "drive")
+        service.list_folders_in_directory("parent", "drive")
+
+    stats = metrics.snapshot()["drive.files.list"]
+    assert (stats.calls, stats.retries, stats.cache_hits, stats.errors) == (2, 1, 1, 0)
+    assert 'drive.files.list;dur=' in metrics.server_timing()
+
+
+def test_asignar_folder_expone_diagnostico_y_server_timing(monkeypatch) -> None:
+    _service, fake_client = make_supabase_service_with_fake_client(
+        [{"drive_folder_id": "folder-trabajador"}]
+    )
+    monkeypatch.setattr(supabase_service, "client", fake_client)
+    monkeypatch.setattr(
+        drive_service,
+        "resolve_parent_drive_context",
+        mock_resolve_parent_drive_context,
+    )
+
+    payload = {
+        "id_proyecto": 1,
+        "codigo_proyecto": "MY-000-2026",
+        "registros": [
+            {
+                "id": 10,
+                "nombre_trabajador": "Juan",
+                "categoria_requerimiento": "Trabajador",
+                "empresa_acreditacion": "Myma",
+            }
+        ],
+    }
+    response = client.post("/asignar-folder?diagnostico=true", json=payload)
+
+    assert response.status_code == 200
+    assert "supabase.brg_acreditacion_solicitud_requerimiento.update;dur=" in (
+        response.headers["server-timing"]
+    )
+    operaciones = {
+        operacion["operacion"]: operacion
+        for operacion in response.json()["diagnostico"]["operaciones"]
+    }
+    assert operaciones["supabase.fct_acreditacion_solicitud_trabajador_manual.select"][
+        "llamadas"
+    ] == 1
+    assert operaciones["supabase.brg_acreditacion_solicitud_requerimiento.update"][
+        "llamadas"
+    ] == 1
+
+    sin_diagnostico = client.post("/asignar-folder", json=payload)
+    assert sin_diagnostico.json()["diagnostico"] is None
+    assert "server-timing" in sin_diagnostico.headers
+
+
+def test_asignar_folder_consulta_conductor_solo_para_nombres_sin_trabajador(monkeypatch) -> None:
+    conductor_lookups: List[List[str]] = []
+
+    def mock_trabajadores(id_proyecto: int, nombres) -> Dict[str, str]:
+        assert id_proyecto == 123
+        assert sorted(nombres) == ["Diego Soto", "Pedro Diaz"]
+        return {"Diego Soto": "folder-trab-diego"}
+
+    def mock_conductores(id_proyecto: int, nombres) -> Dict[str, str]:
+        conductor_lookups.append(list(nombres))
+        return {"Pedro Diaz": "folder-cond-pedro"}
+
+    monkeypatch.setattr(
+        drive_service,
+        "resolve_parent_drive_context",
+        mock_resolve_parent_drive_context,
+    )
+    monkeypatch.setattr(supabase_service, "buscar_drive_folder_ids_trabajadores", mock_trabajadores)
+    monkeypatch.setattr(supabase_service, "buscar_drive_folder_ids_conductores", mock_conductores)
+    monkeypatch.setattr(
+        supabase_service,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        lambda actualizaciones: {registro_id: True for registro_id, _, _ in actualizaciones},
+    )
+
+    payload = {
+        "id_proyecto": 123,
+        "codigo_proyecto": "MY-000-2026",
+        "registros": [
+            {
+                "id": registro_id,
+                "categoria_requerimiento": "Persona",
+                "empresa_acreditacion": "AGQ",
+                "nombre_trabajador": nombre,
+            }
+            for registro_id, nombre in [(1, "Diego Soto"), (2, "Pedro Diaz"), (3, "pedro diaz ")]
+        ],
+    }
+
+    response = client.post("/asignar-folder", json=payload)
+    assert response.status_code == 200
+    finales = [registro["drive_folder_id_final"] for registro in response.json()["registros"]]
+    assert finales == ["folder-trab-diego", "folder-cond-pedro", "folder-cond-pedro"]
+    assert conductor_lookups == [["Pedro Diaz"]]
+
+
+def test_asignar_folder_persiste_parent_de_registros_sin_folder_en_un_update(monkeypatch) -> None:
+    update_batches: List[List[tuple]] = []
+
+    def mock_actualizar_en_bloque(actualizaciones) -> Dict[int, bool]:
+        actualizaciones = list(actualizaciones)
+        update_batches.append(actualizaciones)
+        return {registro_id: registro_id != 3 for registro_id, _, _ in actualizaciones}
+
+    monkeypatch.setattr(
+        drive_service,
+        "resolve_parent_drive_context",
+        mock_resolve_parent_drive_context,
+    )
+    monkeypatch.setattr(
+        supabase_service,
+        "buscar_drive_folder_ids_trabajadores",
+        lambda _id_proyecto, _nombres: {},
+    )
+    monkeypatch.setattr(
+        supabase_service,
+        "buscar_drive_folder_ids_conductores",
+        lambda _id_proyecto, _nombres: {},
+    )
+    monkeypatch.setattr(
+        supabase_service,
+        "actualizar_brg_acreditacion_solicitud_requerimientos",
+        mock_actualizar_en_bloque,
+    )
+
+    payload = {
+        "id_proyecto": 123,
+        "codigo_proyecto": "MY-000-2026",
+        "registros": [
+            {
+                "id": registro_id,
+                "categoria_requerimiento": "Persona",
+                "empresa_acreditacion": "AGQ",
+                "nombre_trabajador": f"Persona {registro_id}",
+            }
+            for registro_id in (1, 2, 3)
+        ],
+    }
+
+    response = client.post("/asignar-folder", json=payload)
+    assert response.status_code == 200
+    assert response.json()["resumen"]["sin_drive_folder_id"] == 3
+    assert update_batches == [
+        [(1, None, "drive-123"), (2, None, "drive-123"), (3, None, "drive-123")]
+    ]